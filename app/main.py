@@ -1,13 +1,39 @@
+import asyncio
+import os
+import time
 from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
 
 from fastapi import FastAPI, HTTPException
 
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 
-from app.routers import journals, passages, vector_ops, langgraph_ops
+from app.routers import journals, passages, vector_ops, langgraph_ops, admin
+from app.services.metrics_service import http_seconds, new_trace_id, start_trace, end_trace, render_metrics
+from app.services.model_registry import warmup, readiness
+from app.services.ollama_client import OllamaUnavailable
+from app.services.passage_sync_service import passage_sync
+from app.services.profiling_service import profiler, PROFILING_ENABLED
+from app.services.storage_service import passage_repository
 
-app = FastAPI()
+# Models to load in the background at startup (comma separated); empty = load each on first use
+WARMUP_MODELS = [name for name in os.getenv("WALT_WARMUP_MODELS", "embeddings,route_prototypes,chat_llm,ner_tokenizer,ner").split(",") if name]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up off the event loop so the API accepts requests (e.g. /journals) immediately;
+    # /ready reports when the models are in memory
+    warmup_task = asyncio.create_task(asyncio.to_thread(warmup, WARMUP_MODELS))
+    # Passage edits are indexed in the background; catch up on anything changed while we were down
+    passage_sync.start()
+    reconcile_task = asyncio.create_task(passage_sync.reconcile(passage_repository.iter_all()))
+    yield
+    warmup_task.cancel()
+    reconcile_task.cancel()
+    await passage_sync.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Setting CORS (Cross Origin Resource Sharing) policy
 origins = ["http://localhost"]
@@ -20,12 +46,75 @@ async def custom_http_exception_handler(request, exception: HTTPException):
         content={"message":exception.detail}
     )
 
+# Trace every request: node, LLM and search spans are collected under its X-Trace-Id
+# (see /admin/traces); with WALT_PROFILING=1, "X-Profile: 1" also samples its stacks
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace_id = request.headers.get("X-Trace-Id") or new_trace_id()
+    token = start_trace(trace_id, request.method, request.url.path)
+    started = time.perf_counter()
+    status = 500
+    stop_profile = profiler.start(trace_id) if PROFILING_ENABLED and request.headers.get("X-Profile") == "1" else None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace_id
+        if stop_profile is not None:
+            # call_next returns once the headers are ready; keep sampling until the body is sent too
+            response.body_iterator = _stop_after_body(response.body_iterator, stop_profile)
+            stop_profile = None
+        return response
+    finally:
+        if stop_profile is not None:
+            stop_profile()
+        seconds = time.perf_counter() - started
+        end_trace(token, seconds, status)
+        # Label by route template, not path, so /documents/{document_id} is one series
+        route = request.scope.get("route")
+        http_seconds.observe(seconds, method=request.method, route=getattr(route, "path", "unmatched"), status=str(status))
+
+async def _stop_after_body(body: AsyncIterator[bytes], stop: Callable[[], None]) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        stop()
+
+# Ollama calls shed by admission control or an open circuit breaker
+@app.exception_handler(OllamaUnavailable)
+async def ollama_unavailable_handler(request, exception: OllamaUnavailable):
+    headers = {"Retry-After": str(max(1, round(exception.retry_after)))} if exception.retry_after is not None else None
+    return JSONResponse(
+        status_code=503,
+        content={"message":str(exception)},
+        headers=headers
+    )
+
 # Import routers
 app.include_router(journals.router)
 app.include_router(passages.router)
 app.include_router(vector_ops.router)
 app.include_router(langgraph_ops.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def read_root():
-    return {"message":"Welcome to AutoHagiography with walt_bot!"}
\ No newline at end of file
+    return {"message":"Welcome to AutoHagiography with walt_bot!"}
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Readiness probe - 503 until every warmup model is loaded without errors
+@app.get("/ready")
+async def ready():
+    models = readiness()
+    is_ready = all(
+        models[name]["loaded"] and not models[name]["error"]
+        for name in WARMUP_MODELS if name in models
+    )
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready":is_ready, "models":models}
+    )
\ No newline at end of file
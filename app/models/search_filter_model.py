@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.services.entity_index import ENTITY_LABELS, normalize_label
+
+class SearchFilterModel(BaseModel):
+    journal_id: Annotated[int, Field(gt=0)] | None = None
+    # e.g. "raw_text_ingestion" (freewriting uploads) or "journal_passage"
+    source: str | None = None
+    # Inclusive bounds on the chunk's created_at
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+    # Entity labels every result must mention, e.g. ["PERSON", "LOC"]
+    entities: list[str] | None = None
+
+    @field_validator("entities")
+    @classmethod
+    def normalize_entities(cls, labels: list[str] | None) -> list[str] | None:
+        if labels is None:
+            return None
+        normalized = [normalize_label(label) for label in labels]
+        if None in normalized:
+            raise ValueError(f"Unknown entity label - expected one of {', '.join(ENTITY_LABELS)}")
+        return normalized
@@ -0,0 +1,77 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.services.checkpoint_service import thread_registry, export_thread, evict_threads
+from app.services.metrics_service import get_trace
+from app.services.ollama_client import ollama_info
+from app.services.profiling_service import profiler
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"]
+)
+
+
+# List conversation threads, most recently used first
+# Thread IDs look like "<graph>:<user_id>:<session_id>", so prefix="chat:alice:" lists one user's chats
+@router.get("/threads")
+async def list_threads(prefix: str = ""):
+    threads = await asyncio.to_thread(thread_registry.list_threads, prefix)
+    return {"count": len(threads), "threads": threads}
+
+
+# Export a thread's latest checkpointed state
+@router.get("/threads/{thread_id}")
+async def get_thread(thread_id: str):
+    exported = await export_thread(thread_id)
+    if exported is None:
+        raise HTTPException(status_code=404, detail="Thread not found!")
+    return exported
+
+
+# Evict a single thread and all of its checkpoints
+@router.delete("/threads/{thread_id}")
+async def delete_thread(thread_id: str):
+    if await asyncio.to_thread(thread_registry.get, thread_id) is None:
+        raise HTTPException(status_code=404, detail="Thread not found - cannot evict!")
+    await evict_threads([thread_id])
+    return {"message": f"Thread {thread_id} evicted successfully!"}
+
+
+# Evict every thread past its TTL or beyond the thread cap right now
+@router.post("/threads/evict")
+async def evict_expired_threads():
+    evicted = await evict_threads()
+    return {"evicted": evicted}
+
+
+
+# Spans (graph nodes, LLM calls, searches, embeddings) of a recent request, by its X-Trace-Id
+@router.get("/traces/{trace_id}")
+async def get_request_trace(trace_id: str):
+    trace = get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found!")
+    return trace
+
+
+# Sampled stacks of a profiled request; format=collapsed returns flamegraph.pl/speedscope input
+@router.get("/profiles/{trace_id}")
+async def get_profile(trace_id: str, format: str = "summary"):
+    if format == "collapsed":
+        collapsed = profiler.collapsed(trace_id)
+        if collapsed is not None:
+            return PlainTextResponse(collapsed)
+    else:
+        summary = profiler.summary(trace_id)
+        if summary is not None:
+            return summary
+    raise HTTPException(status_code=404, detail="Profile not found!")
+
+
+# Admission control per Ollama model: limits, in-flight calls, queue depth, rejections and circuit state
+@router.get("/ollama")
+async def ollama_stats():
+    return ollama_info()
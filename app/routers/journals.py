@@ -1,45 +1,31 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+
 from datetime import datetime
 
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
 from app.models.journal_model import JournalModel
+from app.services.pagination_service import (
+    page_response, export_ndjson, parse_fields, decode_cursor, clamp_limit, date_range, DEFAULT_PAGE_SIZE
+)
+from app.services.storage_service import journal_repository, TitleTakenError
 
 router = APIRouter(
     prefix="/journals",
     tags=["journals"]
 )
 
-# temporary db
-journal_database = {
-    1: JournalModel(
-        id=1,
-        title="Dream Journal",
-        created_at=datetime(2024, 1, 2, 10, 30),  # January 2, 2026, at 10:30 AM
-    ),
-    2: JournalModel(
-        id=2,
-        title="Daily TODO List",
-        created_at=datetime(2025, 1, 7, 11, 15)
-    ),
-    3: JournalModel(
-        id=3,
-        title="Shower Thoughts",
-        created_at=datetime(2025, 11, 12, 8, 30)
-    )
-}
-
-
 # Create/PUT journal -
 @router.post("/", status_code=201)
 async def create_journal(journal: JournalModel):
-    for existing_journal in journal_database.values():
-        if existing_journal.title == journal.title:
-            raise HTTPException(
-                status_code=400, detail="Journal title already taken! Choose another."
-            )
-
-    journal.id = len(journal_database) + 1
-
-    journal_database[journal.id] = journal
+    # The unique title index does the duplicate check; IDs are allocated by the database
+    try:
+        journal = await asyncio.to_thread(journal_repository.create, journal)
+    except TitleTakenError:
+        raise HTTPException(
+            status_code=400, detail="Journal title already taken! Choose another."
+        )
 
     return {
         "message": journal.title + " created successfully!",
@@ -47,17 +33,44 @@ async def create_journal(journal: JournalModel):
     }
 
 
-# Get all journals
+# Get all journals - one page at a time, oldest first; follow the X-Next-Cursor header for the next page
 @router.get("/")
-async def get_all_journals():
+async def get_all_journals(
+        request: Request,
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None
+):
     # TODO: maybe later if db is empty raise an exception
-    return journal_database
+    limit = clamp_limit(limit)
+    projection = parse_fields(fields, JournalModel)
+    created_from_ts, created_to_ts = date_range(created_from, created_to)
+    # One extra row tells us whether there is a next page
+    journals = await asyncio.to_thread(
+        journal_repository.page, limit + 1, decode_cursor(cursor), created_from_ts, created_to_ts
+    )
+    return page_response(request, journals, limit, projection)
+
+# Export every journal as NDJSON
+@router.get("/export")
+async def export_journals(
+        fields: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None
+):
+    projection = parse_fields(fields, JournalModel)
+    created_from_ts, created_to_ts = date_range(created_from, created_to)
+    fetch_page = lambda limit, after: journal_repository.page(limit, after, created_from_ts, created_to_ts)
+    return StreamingResponse(export_ndjson(fetch_page, projection), media_type="application/x-ndjson")
 
 # Get journal by id
 @router.get("/journals/{journal_id}")
 async def get_journal(journal_id: int):
-    if journal_id in journal_database:
-        return journal_database[journal_id]
+    journal = await asyncio.to_thread(journal_repository.get, journal_id)
+    if journal is not None:
+        return journal
     else:
         raise HTTPException(
             status_code=404, detail="Journal ID not found - cannot retrieve!"
@@ -67,8 +80,8 @@ async def get_journal(journal_id: int):
 # DELETE journal by id
 @router.delete("/journals/{journal_id}")
 async def delete_journal(journal_id: int):
-    if journal_id in journal_database:
-        deleted_journal = journal_database.pop(journal_id)
+    deleted_journal = await asyncio.to_thread(journal_repository.delete, journal_id)
+    if deleted_journal is not None:
         return {
             "message": f"Journal {deleted_journal.title} deleted successfully!",
             "deleted_journal": deleted_journal,
@@ -82,12 +95,16 @@ async def delete_journal(journal_id: int):
 # PATCH update journal by id -
 @router.put("/{journal_id}")
 async def update_journal_info(journal_id: int, updated_journal: JournalModel):
-    if journal_id in journal_database:
-        journal_database[journal_id].title = updated_journal.title
-        journal_database[journal_id].updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        journal = await asyncio.to_thread(journal_repository.update_title, journal_id, updated_journal.title)
+    except TitleTakenError:
+        raise HTTPException(
+            status_code=400, detail="Journal title already taken! Choose another."
+        )
+    if journal is not None:
         return {
-            "message": f"{journal_database[journal_id].title} updated successfully!",
-            "updated_journal": journal_database[journal_id],
+            "message": f"{journal.title} updated successfully!",
+            "updated_journal": journal,
         }
     else:
         raise HTTPException(
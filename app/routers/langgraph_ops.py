@@ -1,8 +1,21 @@
+import asyncio
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from typing import Literal
+
 from pydantic import BaseModel
 
+from app.models.search_filter_model import SearchFilterModel
+
 # from app.services.agentic_langgraph_service import agentic_graph
-from app.services.langgraph_service import langgraph
+from app.services.langgraph_service import langgraph, memory_metrics, MEMORY_MAX_TURNS, MEMORY_SUMMARIZE_EVERY
+from app.services.checkpoint_service import (
+    touch_thread, thread_id_for, new_session_id, thread_registry, CHECKPOINT_BACKEND, THREAD_TTL_SECONDS, MAX_THREADS
+)
+from app.services.streaming_service import stream_graph
+from app.services.query_router import query_router
+from app.services.context_service import context_info
 
 router = APIRouter(
     prefix="/langgraph",
@@ -11,27 +24,96 @@ router = APIRouter(
 
 class ChatInputModel(BaseModel):
     input:str
+    # Each (user, session) pair gets its own conversation thread;
+    # omit session_id to start a new session (the generated ID is returned)
+    user_id: str | None = None
+    session_id: str | None = None
+    # Retrieval mode for the passages/freewriting routes; omit for the server default
+    mode: Literal["vector", "lexical", "hybrid"] | None = None
+    # Restrict retrieval by journal, date range, source or entity labels
+    filters: SearchFilterModel | None = None
+
+class RouteFeedbackModel(BaseModel):
+    input:str
+    # The route the query should have taken
+    expected_route: Literal["passages", "freewriting", "all", "chat"]
 
 
 # Endpoint that invokes the graph in the langgraph service
 @router.post("/chat")
-def chat(chat:ChatInputModel):
-    # We're going to add a config object to configure the "thread ID" for our memory
-    # NOTE: I'm just hardcoding this, realistically you'd pull a User ID, Session ID, etc.
-    result = langgraph.invoke(
-        {"query":chat.input},
+async def chat(chat:ChatInputModel):
+    # The config object selects the "thread ID" for our memory - one per user session
+    session_id = chat.session_id or new_session_id()
+    thread_id = thread_id_for("chat", chat.user_id, session_id)
+    await touch_thread(thread_id)
+    result = await langgraph.ainvoke(
+        {"query":chat.input, "mode":chat.mode, "filters":chat.filters.model_dump(exclude_none=True) if chat.filters else None},
         config={
-            "configurable":{"thread_id":"demo_thread"}
+            "configurable":{"thread_id":thread_id}
         }
     )
 
     return {
+        "session_id":session_id,
         "route":result.get("route"),
+        "route_method":result.get("route_method"),
+        "route_confidence":result.get("route_confidence"),
         "answer":result.get("answer"),
+        "degraded":result.get("degraded", False),
         "sources":result.get("docs"),
         "message_memory":result.get("message_memory")
     }
 
+# Streaming variant of /chat - Server-Sent Events with route, sources, tokens, then done
+@router.post("/chat/stream")
+async def chat_stream(chat:ChatInputModel):
+    session_id = chat.session_id or new_session_id()
+    thread_id = thread_id_for("chat", chat.user_id, session_id)
+    await touch_thread(thread_id)
+    events = stream_graph(
+        langgraph,
+        {"query":chat.input, "mode":chat.mode, "filters":chat.filters.model_dump(exclude_none=True) if chat.filters else None},
+        config={"configurable":{"thread_id":thread_id}},
+        answer_nodes={"answer_with_context_node", "general_chat_node"}
+    )
+    return StreamingResponse(events, media_type="text/event-stream", headers={"X-Session-Id": session_id})
+
+# Memory policy and checkpointer observability
+@router.get("/memory/metrics")
+async def memory_policy_metrics():
+    return {
+        "policy": {
+            "max_verbatim_turns": MEMORY_MAX_TURNS,
+            "summarize_every_turns": MEMORY_SUMMARIZE_EVERY
+        },
+        "checkpointer": {
+            "backend": CHECKPOINT_BACKEND,
+            "thread_ttl_seconds": THREAD_TTL_SECONDS,
+            "max_threads": MAX_THREADS,
+            "threads": await asyncio.to_thread(thread_registry.count),
+            "evictions": thread_registry.evictions
+        },
+        **memory_metrics
+    }
+
+# Context assembly: chunks merged and dropped, estimated prompt tokens before and after packing
+@router.get("/context/stats")
+async def context_stats():
+    return context_info()
+
+# Routing decisions, keyword fallbacks and misroute counters
+@router.get("/router/stats")
+async def router_stats():
+    return query_router.info()
+
+# Report the route a query should have taken; counted as a misroute if the router disagrees
+@router.post("/router/feedback")
+async def router_feedback(feedback:RouteFeedbackModel):
+    decision = await query_router.route(feedback.input, record=False)
+    if decision["route"] != feedback.expected_route:
+        query_router.record_misroute(decision["route"], feedback.expected_route)
+    return {**decision, "expected_route":feedback.expected_route, "misrouted":decision["route"] != feedback.expected_route}
+
 # maybe add this later if all else is working
 # And don't forget to add agentic_langgraph_service too if this endpoint is used
 # # Endpoint that invokes the AGENTIC graph in the agentic_langgraph service
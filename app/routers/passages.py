@@ -1,75 +1,25 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+
 from datetime import datetime
 
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
 from starlette import status
 
 from app.models.passage_model import PassageModel
+from app.services.pagination_service import (
+    page_response, export_ndjson, parse_fields, decode_cursor, clamp_limit, date_range, DEFAULT_PAGE_SIZE
+)
 from app.routers.journals import get_journal
+from app.services.passage_sync_service import passage_sync
+from app.services.storage_service import passage_repository
 
 router = APIRouter(
     prefix="/passages",
     tags=["passages"]
 )
 
-# Temporary passage db
-passage_database = {
-    1: PassageModel(
-        id=1,
-        journal_id=1,
-        title="Veni Vidi MEci?",
-        content="Had a dream I was explaining the Roman Empire to my gf but I WAS the Roman Empire. Very demure, very mindful. Woke up feeling powerful.",
-        created_at=datetime(2026, 1, 9, 10,35),
-    ),
-    2: PassageModel(
-        id=2,
-        journal_id=1,
-        title="Nightmare Therapy",
-        content="Dreamed my therapist said 'we're so back' then immediately followed with 'it's so over.' Spent rest of dream in emotional limbo." ,
-        created_at=datetime(2026, 1, 9, 10,37),
-    ),
-    3: PassageModel(
-        id=3,
-        journal_id=1,
-        title="Birds Not What They Seem",
-        content="In my dream, I was a bird identified in the wild. Someone pointed and yelled 'THE BIRDS WORK FOR THE BOURGEOISIE' and I woke up.",
-        created_at=datetime(2026, 1, 9, 10,38),
-    ),
-    4: PassageModel(
-        id=4,
-        journal_id=2,
-        title="TODO Yesterday",
-        content="""-Crash out about minor inconvenience
-        - Touch grass
-        - Respond to texts from 3 weeks ago
-        - Eat hot chip and lie 
-        - Gaslight myself into productivity
-        - Be a professional hater for exactly 1 hour""",
-        created_at=datetime(2026, 1, 9, 10,39),
-    ),
-    5: PassageModel(
-        id=5,
-        journal_id=3,
-        title="My Own Girl",
-        content="If I were a girl's girl but also just a girl, am I technically my own girl? This is the kind of math they don't teach you.",
-        created_at=datetime(2026, 1, 9, 10,40),
-    ),
-    6: PassageModel(
-        id=6,
-        journal_id=3,
-        title="Payments",
-        content="When I was in school the teachers told me practice makes perfect; then they told me nobody’s perfect so I stopped practicing.",
-        created_at=datetime(2026, 1, 9, 10,41),
-    ),
-    7: PassageModel(
-        id=7,
-        journal_id=3,
-        title="Widths",
-        content="A lot of people are afraid of heights. Not me, I’m afraid of widths.",
-        created_at=datetime(2026, 1, 9, 10,42),
-    )
-}
-
-
 # PUT passage -
 @router.post("/journals/{journal_id}/new_passage", status_code=201)
 async def create_passage(passage: PassageModel, journal_id: int):
@@ -77,16 +27,16 @@ async def create_passage(passage: PassageModel, journal_id: int):
 
     # TODO: Maybe try to work on this later
 
-    # for existing_passage in passage_database.keys():
+    # for existing_passage in passage_repository.iter_all():
     #     if existing_passage.id == passage.id:
     #         raise HTTPException(status_code=409, detail="")
 
     journal_id = passage.journal_id
     journal = await get_journal(journal_id)
-    passage.id = len(passage_database) + 1
 
-
-    passage_database[passage.id] = passage
+    # IDs are allocated by the database and never reused
+    passage = await asyncio.to_thread(passage_repository.create, passage)
+    passage_sync.enqueue_upsert(passage.id, passage)
 
     return {
         "message":passage.title + f" in {journal.title} created",
@@ -94,23 +44,72 @@ async def create_passage(passage: PassageModel, journal_id: int):
     }
 
 
-# GET all passages from all journals
+# GET all passages from all journals - one page at a time, oldest first; follow the X-Next-Cursor header
 @router.get("/")
-async def get_all_passages():
-    return passage_database
+async def get_all_passages(
+        request: Request,
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None
+):
+    return await _passage_page(request, None, cursor, limit, fields, created_from, created_to)
+
+
+# GET export - every passage (optionally of one journal) streamed as NDJSON
+@router.get("/export")
+async def export_passages(
+        journal_id: int | None = None,
+        fields: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None
+):
+    projection = parse_fields(fields, PassageModel)
+    created_from_ts, created_to_ts = date_range(created_from, created_to)
+    fetch_page = lambda limit, after: passage_repository.page(limit, after, journal_id, created_from_ts, created_to_ts)
+    return StreamingResponse(export_ndjson(fetch_page, projection), media_type="application/x-ndjson")
+
+
+# GET vector sync queue status
+@router.get("/sync/status")
+async def get_sync_status():
+    return passage_sync.info()
+
+
+# POST reconcile - diff the "passages" vector collection against this store and fix any drift
+@router.post("/sync/reconcile")
+async def reconcile_passages():
+    return await passage_sync.reconcile(passage_repository.iter_all())
 
 
 # GET all passages from journal -
 @router.get("/journals/{journal_id}/passages/")
-async def get_all_passages_from_journal(journal_id: int):
-    journal_passages = {}
-    for key, value in passage_database.items():
-        if value.journal_id == journal_id:
-            journal_passages[key] = value
-    return journal_passages
+async def get_all_passages_from_journal(
+        request: Request,
+        journal_id: int,
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None
+):
+    # Served from the journal_id index rather than a scan of every passage
+    return await _passage_page(request, journal_id, cursor, limit, fields, created_from, created_to)
     # TODO: maybe if the DB is empty, return a 404 (not found) or 204 (no content)
 
 
+async def _passage_page(request, journal_id, cursor, limit, fields, created_from, created_to):
+    limit = clamp_limit(limit)
+    projection = parse_fields(fields, PassageModel)
+    created_from_ts, created_to_ts = date_range(created_from, created_to)
+    # One extra row tells us whether there is a next page
+    passages = await asyncio.to_thread(
+        passage_repository.page, limit + 1, decode_cursor(cursor), journal_id, created_from_ts, created_to_ts
+    )
+    return page_response(request, passages, limit, projection)
+
+
 
 # GET passage by id -
 @router.get("/journals/{journal_id}/passages/{passage_id}")
@@ -119,8 +118,9 @@ async def get_passage(journal_id: int, passage_id: int):
     # TODO check if getting journal may be useful in the future for this method, added journal_id above in case it needs to be passed in
     # journal = await get_journal(journal_id)
 
-    if passage_id in passage_database:
-        return passage_database[passage_id]
+    passage = await asyncio.to_thread(passage_repository.get, passage_id)
+    if passage is not None:
+        return passage
     else:
         raise HTTPException(status_code=404 , detail="Passage not found")
 
@@ -128,13 +128,9 @@ async def get_passage(journal_id: int, passage_id: int):
 # PATCH update passage by id -
 @router.patch("/journals/{journal_id}/passages/{passage_id}")
 async def update_passage(passage_id: int, updated_passage: PassageModel):
-    if passage_id in passage_database:
-        passage_database[passage_id].title = updated_passage.title
-        passage_database[passage_id].content = updated_passage.content
-        passage_database[passage_id].created_at = updated_passage.created_at
-        passage_database[passage_id].updated_at = updated_passage.updated_at
-
-        passage_database[passage_id] = updated_passage
+    updated_passage = await asyncio.to_thread(passage_repository.update, passage_id, updated_passage)
+    if updated_passage is not None:
+        passage_sync.enqueue_upsert(passage_id, updated_passage)
 
         return {
             "message":updated_passage.title,
@@ -146,14 +142,12 @@ async def update_passage(passage_id: int, updated_passage: PassageModel):
 # DELETE passage by id
 @router.delete("/journals/{journal_id}/passages/{passage_id}")
 async def delete_passage(passage_id: int):
-    if passage_id in passage_database:
-
-        passage = passage_database[passage_id]
-        #       if using a real db there would be a: passage.delete()
-        deleted_passage = passage_database.pop(passage_id)
+    deleted_passage = await asyncio.to_thread(passage_repository.delete, passage_id)
+    if deleted_passage is not None:
+        passage_sync.enqueue_delete(passage_id)
 
         return {
-            "message":f"Passage {passage.title} deleted successfully!",
+            "message":f"Passage {deleted_passage.title} deleted successfully!",
             "deleted_passage":deleted_passage
         }
     else:
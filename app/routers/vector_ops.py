@@ -1,9 +1,23 @@
-from typing import Any
-from fastapi import APIRouter, Form
+import asyncio
+from typing import Any, Literal
+from fastapi import APIRouter, Form, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, field_validator
 
-from app.services.vectordb_service import ingest_json_service, search, ingest_text, extract_entities
+from app.services.vectordb_service import (
+    ingest_json_service, asearch, search_many, ingest_document, get_chunks, entity_index, document_index, retrieval_stats,
+    vector_store, RETRIEVAL_MODE, COLLECTION, VECTOR_BACKEND
+)
+from app.models.search_filter_model import SearchFilterModel
+from app.services.entity_index import ENTITY_LABELS, normalize_label
+from app.services.chunking_service import chunking_for
+from app.services.bulk_ingest_service import (
+    bulk_ingest, bulk_ingest_text, iter_ndjson_records, BULK_BATCH_SIZE, BULK_CONCURRENCY
+)
 from app.services.vector_langgraph_service import search_text_graph, ner_search_graph
+from app.services.streaming_service import UploadStreamingResponse, ndjson_line, ndjson_stream, stream_graph
+from app.services.answer_cache import answer_cache
+from app.services.checkpoint_service import touch_thread, thread_id_for, new_session_id
 
 
 router = APIRouter(
@@ -30,28 +44,143 @@ class IngestTextRequest(BaseModel):
     #     # Remove null bytes and other problematic characters
     #     return v.replace('\x00', '').strip()
 
+ChunkStrategy = Literal["recursive", "sentence", "paragraph"]
+
 # model for similarity search request results
 class SearchRequest(BaseModel):
     query: str = ""
     k: int = 3
+    # Used to isolate graph checkpoints per user session
+    user_id: str | None = None
+    session_id: str | None = None
+    # "vector", "lexical" (BM25 only - no embedding call) or "hybrid"; omit for the server default
+    mode: Literal["vector", "lexical", "hybrid"] | None = None
+    # Restrict results by journal, date range, source or entity labels
+    filters: SearchFilterModel | None = None
+
+# model for one query of a batch search
+class BatchSearchQuery(BaseModel):
+    query: str
+    k: int = 3
+    collection: str = COLLECTION
+    mode: Literal["vector", "lexical", "hybrid"] | None = None
+    filters: SearchFilterModel | None = None
+
+class BatchSearchRequest(BaseModel):
+    queries: list[BatchSearchQuery]
+
+# Largest batch accepted by /search-passages/batch
+MAX_BATCH_QUERIES = 1000
+
+def _filters(filters: SearchFilterModel | None) -> dict[str, Any] | None:
+    return filters.model_dump(exclude_none=True) if filters else None
 
 # Endpoint for data ingestion
 @router.post("/ingest-json")
 async def ingest_json_endpoint(passages: list[IngestJson]):
-    count = ingest_json_service([passage.model_dump() for passage in passages])
+    # Embedding and the store write block, so keep them off the event loop
+    count = await asyncio.to_thread(ingest_json_service, [passage.model_dump() for passage in passages])
     return {"ingested": count}
 
+# Endpoint for bulk (NDJSON) ingestion
+@router.post("/ingest-json/bulk")
+async def ingest_json_bulk(
+        request: Request,
+        collection: str = COLLECTION,
+        batch_size: int = BULK_BATCH_SIZE,
+        concurrency: int = BULK_CONCURRENCY
+):
+    """
+    Accept one passage object per line ({"id", "text", "metadata"}), sent as a
+    regular or chunked upload, and ingest it in fixed-size embedding batches.
+    The body is read only as fast as batches are embedded. Progress streams
+    back as NDJSON: a "batch" event per batch, "rejected" and "stream_error"
+    events as they happen, and a closing "summary".
+    """
+    records = iter_ndjson_records(request.stream())
+    events = bulk_ingest(records, collection, max(batch_size, 1), max(concurrency, 1))
+    return UploadStreamingResponse(ndjson_stream(events), media_type="application/x-ndjson")
+
+# Endpoint for bulk raw text ingestion
+@router.post("/ingest-text/bulk")
+async def ingest_text_bulk(
+        request: Request,
+        collection: str = "freewriting",
+        document_id: str | None = None,
+        strategy: ChunkStrategy | None = None,
+        chunk_size: int | None = None,
+        chunk_overlap: int | None = None,
+        batch_size: int = BULK_BATCH_SIZE,
+        concurrency: int = BULK_CONCURRENCY
+):
+    """
+    Accept a (possibly chunked) plain-text body and chunk it into a collection
+    (freewriting by default) as a versioned document, streaming progress as
+    /ingest-json/bulk does. The summary names the document and its version.
+    """
+    chunking = _chunking(collection, strategy, chunk_size, chunk_overlap)
+    events = bulk_ingest_text(
+        request.stream(), collection, document_id, chunking, max(batch_size, 1), max(concurrency, 1)
+    )
+    return UploadStreamingResponse(ndjson_stream(events), media_type="application/x-ndjson")
+
+def _chunking(collection: str, strategy: str | None, chunk_size: int | None, chunk_overlap: int | None) -> dict[str, Any]:
+    try:
+        return chunking_for(collection, strategy=strategy, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
 # Endpoint for similarity search
 @router.post("/search-passages")
 async def passages_similarity_search(request: SearchRequest):
-    return search(request.query, request.k)
+    return await asearch(request.query, request.k, mode=request.mode, filters=_filters(request.filters))
+
+# Endpoint for many similarity searches at once
+@router.post("/search-passages/batch")
+async def passages_batch_search(request: BatchSearchRequest):
+    """
+    Run every query with one batched embedding call and one vector-store
+    lookup per collection. Results stream back as NDJSON in input order,
+    one {"index", "results"} line per query ({"index", "error"} if it failed).
+    """
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+    async def lines():
+        async for index, results in search_many([{**query.model_dump(), "filters": _filters(query.filters)} for query in request.queries]):
+            if isinstance(results, Exception):
+                yield ndjson_line({"index": index, "error": str(results)})
+            else:
+                yield ndjson_line({"index": index, "results": results})
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 # Endpoint for raw text ingestion
 @router.post("/ingest-text")
-async def ingest_raw_text(text: str = Form(...)):
-    """Accept text as form data instead of JSON"""
-    count = ingest_text(text)
-    return {"ingested_chunks": count}
+async def ingest_raw_text(
+        text: str = Form(...),
+        document_id: str | None = Form(None),
+        collection: str = Form("freewriting"),
+        strategy: ChunkStrategy | None = Form(None),
+        chunk_size: int | None = Form(None),
+        chunk_overlap: int | None = Form(None)
+):
+    """
+    Accept text as form data instead of JSON. Sending the same document_id
+    again replaces the document, re-embedding only the chunks that changed.
+    Chunking follows the collection's settings unless overridden here.
+    """
+    chunking = _chunking(collection, strategy, chunk_size, chunk_overlap)
+    report = await asyncio.to_thread(ingest_document, text, document_id, collection, chunking)
+    return {"ingested_chunks": report["embedded"] + report["reused"], **report}
+
+# Version and chunk count of an ingested document
+@router.get("/documents/{document_id}")
+async def get_document(document_id: str, collection: str = "freewriting"):
+    document = await asyncio.to_thread(document_index.get, collection, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
 
 # LangGraph-powered endpoint with LLM response
 @router.post("/search-text")
@@ -60,28 +189,104 @@ async def search_text(request: SearchRequest):
     LangGraph-powered RAG endpoint that retrieves from freewriting collection
     and generates an LLM response based on the results.
     """
+    session_id = request.session_id or new_session_id()
+    thread_id = thread_id_for("freewriting_search", request.user_id, session_id)
+    await touch_thread(thread_id)
     result = await search_text_graph.ainvoke(
-        {"query": request.query, "k": request.k},
-        config={"configurable": {"thread_id": "freewriting_search"}}
+        {"query": request.query, "k": request.k, "mode": request.mode, "filters": _filters(request.filters)},
+        config={"configurable": {"thread_id": thread_id}}
     )
 
     return {
+        "session_id": session_id,
         "answer": result.get("answer"),
+        "degraded": result.get("degraded", False),
         "sources": result.get("docs"),
         "query": request.query
     }
 
+# Streaming variant of /search-text - Server-Sent Events with sources, tokens, then done
+@router.post("/search-text/stream")
+async def search_text_stream(request: SearchRequest):
+    session_id = request.session_id or new_session_id()
+    thread_id = thread_id_for("freewriting_search", request.user_id, session_id)
+    await touch_thread(thread_id)
+    events = stream_graph(
+        search_text_graph,
+        {"query": request.query, "k": request.k, "mode": request.mode, "filters": _filters(request.filters)},
+        config={"configurable": {"thread_id": thread_id}},
+        answer_nodes={"generate"}
+    )
+    return StreamingResponse(events, media_type="text/event-stream", headers={"X-Session-Id": session_id})
+
 # Endpoint tha uses NER to extract entities from the "freewriting" collection
 @router.post("/ner-search-text")
 async def ner_search_text(request: SearchRequest):
     """LangGraph-powered NER search endpoint"""
+    session_id = request.session_id or new_session_id()
+    thread_id = thread_id_for("ner_search", request.user_id, session_id)
+    await touch_thread(thread_id)
     result = await ner_search_graph.ainvoke(
-        {"query": request.query, "k": request.k},
-        config={"configurable": {"thread_id": "ner_search"}}
+        {"query": request.query, "k": request.k, "mode": request.mode, "filters": _filters(request.filters)},
+        config={"configurable": {"thread_id": thread_id}}
     )
 
     return {
+        "session_id": session_id,
         "answer": result.get("answer"),
+        "degraded": result.get("degraded", False),
         "entities": result.get("entities"),
         "query": request.query
-    }
\ No newline at end of file
+    }
+
+# Query the entity index built at ingest time - no NER model involved
+@router.get("/entities/search")
+async def search_by_entity(
+        label: str,
+        entity: str,
+        collection: str = "freewriting",
+        partial: bool = False,
+        include_text: bool = True
+):
+    """
+    All chunks mentioning an entity, e.g. label=PERSON&entity=Whitman.
+    `partial` also matches the entity inside longer names ("Walt Whitman").
+    """
+    normalized = normalize_label(label)
+    if normalized is None:
+        raise HTTPException(status_code=400, detail=f"Unknown entity label - expected one of {', '.join(ENTITY_LABELS)}")
+
+    chunk_ids = await asyncio.to_thread(entity_index.lookup, collection, normalized, entity, partial)
+    if include_text:
+        chunks = await asyncio.to_thread(get_chunks, chunk_ids, collection)
+    else:
+        chunks = [{"id": chunk_id} for chunk_id in chunk_ids]
+    return {"label": normalized, "entity": entity, "count": len(chunk_ids), "chunks": chunks}
+
+# Most mentioned entities in a collection
+@router.get("/entities")
+async def list_entities(collection: str = "freewriting", label: str | None = None, limit: int = 50):
+    normalized = normalize_label(label) if label else None
+    if label and normalized is None:
+        raise HTTPException(status_code=400, detail=f"Unknown entity label - expected one of {', '.join(ENTITY_LABELS)}")
+    return {
+        "entities": await asyncio.to_thread(entity_index.top_entities, collection, normalized, limit),
+        "stats": {**entity_index.stats, "last_error": entity_index.last_error}
+    }
+
+# Searches per retrieval mode, how often vector retrieval fell back to lexical, and the open vector stores
+@router.get("/retrieval/stats")
+async def get_retrieval_stats():
+    stores = {collection: await asyncio.to_thread(store.info) for collection, store in list(vector_store.items())}
+    return {"default_mode": RETRIEVAL_MODE, **retrieval_stats, "vector_backend": VECTOR_BACKEND, "collections": stores}
+
+# Hit/miss counters for the RAG answer cache
+@router.get("/answer-cache")
+async def answer_cache_stats():
+    return answer_cache.info()
+
+# Drop every cached answer
+@router.delete("/answer-cache")
+async def clear_answer_cache():
+    answer_cache.clear()
+    return {"message": "Answer cache cleared!"}
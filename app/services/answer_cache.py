@@ -0,0 +1,178 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from app.services.vectordb_service import EMBEDDING, collection_versions, collection_write_listeners
+
+ANSWER_CACHE_SIZE = 512
+# Semantic mode also serves answers cached for differently-worded but similar queries
+ANSWER_CACHE_SEMANTIC = os.getenv("WALT_ANSWER_CACHE_SEMANTIC", "0") == "1"
+ANSWER_CACHE_SIMILARITY = float(os.getenv("WALT_ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!.")
+
+
+def _collections(collection: str | list[str]) -> tuple[str, ...]:
+    # Answers built from a fan-out search depend on several collections
+    return (collection,) if isinstance(collection, str) else tuple(sorted(collection))
+
+
+def _versions(collections: tuple[str, ...]) -> tuple[int, ...]:
+    return tuple(collection_versions.get(name, 0) for name in collections)
+
+
+def _scope(filters: dict[str, Any] | None) -> str:
+    # Answers retrieved under different search filters must not stand in for each other
+    return json.dumps(filters, sort_keys=True, default=str) if filters else ""
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """
+    LRU cache of generated RAG answers.
+
+    Exact entries are keyed on (graph, normalized query, retrieved doc IDs,
+    version of every collection searched), so any write to one of those
+    collections makes them stale; such entries are also dropped as soon as
+    it is written to. The cache never fails a request: if the query can't be
+    embedded for a semantic lookup, that lookup is a miss.
+    """
+
+    def __init__(self, max_entries: int, semantic: bool, similarity: float):
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity = similarity
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0, "embedding_failures": 0}
+
+    def key(self, graph: str, query: str, doc_ids: list[str], collection: str | list[str]) -> str:
+        versions = [f"{name}@{collection_versions.get(name, 0)}" for name in _collections(collection)]
+        raw = "\0".join([graph, normalize_query(query), *versions, *sorted(doc_ids)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(
+            self,
+            graph: str,
+            query: str,
+            doc_ids: list[str],
+            collection: str | list[str],
+            filters: dict[str, Any] | None = None
+    ) -> str | None:
+        key = self.key(graph, query, doc_ids, collection)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry["answer"]
+
+        if self.semantic:
+            answer = await self._semantic_get(graph, query, collection, _scope(filters))
+            if answer is not None:
+                return answer
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    async def _embed(self, query: str) -> list[float] | None:
+        # The query was just embedded for retrieval, so this is usually an embedding-cache hit
+        try:
+            return await EMBEDDING.aembed_query(query)
+        except Exception:
+            # e.g. OllamaUnavailable with the circuit open; the graph has its own fallback for that
+            with self._lock:
+                self.stats["embedding_failures"] += 1
+            return None
+
+    async def _semantic_get(self, graph: str, query: str, collection: str | list[str], scope: str) -> str | None:
+        query_embedding = await self._embed(query)
+        if query_embedding is None:
+            return None
+        collections = _collections(collection)
+        versions = _versions(collections)
+        best, best_score = None, self.similarity
+
+        with self._lock:
+            for entry in self._entries.values():
+                if (entry["graph"], entry["collections"], entry["versions"], entry["scope"]) != (graph, collections, versions, scope):
+                    continue
+                if entry["query_embedding"] is None:
+                    continue
+                score = _cosine(query_embedding, entry["query_embedding"])
+                if score >= best_score:
+                    best, best_score = entry, score
+            if best is not None:
+                self.stats["semantic_hits"] += 1
+                return best["answer"]
+
+        return None
+
+    async def put(
+            self,
+            graph: str,
+            query: str,
+            doc_ids: list[str],
+            collection: str | list[str],
+            answer: str,
+            filters: dict[str, Any] | None = None
+    ) -> None:
+        collections = _collections(collection)
+        entry = {
+            "graph": graph,
+            "collections": collections,
+            "versions": _versions(collections),
+            "scope": _scope(filters),
+            "answer": answer,
+            # Without an embedding the entry still serves exact lookups
+            "query_embedding": await self._embed(query) if self.semantic else None
+        }
+
+        key = self.key(graph, query, doc_ids, collection)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection: str) -> None:
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if collection in entry["collections"]]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "semantic": self.semantic,
+                "similarity_threshold": self.similarity,
+                "hit_rate": round((lookups - self.stats["misses"]) / lookups, 3) if lookups else 0.0,
+                **self.stats
+            }
+
+
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_SEMANTIC, ANSWER_CACHE_SIMILARITY)
+collection_write_listeners.append(answer_cache.invalidate)
@@ -0,0 +1,256 @@
+import asyncio
+import codecs
+import hashlib
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator
+
+from app.services.vectordb_service import EMBEDDING, upsert_embedded, chunk_text, atag_entities, record_document
+
+# Number of documents sent to the embedding model per request
+BULK_BATCH_SIZE = 64
+# Maximum number of embedding requests in flight at once
+BULK_CONCURRENCY = 4
+# Raw text is buffered up to this many characters before it is chunked
+TEXT_BUFFER_CHARS = 20_000
+
+
+# =========STREAM READERS=========
+
+async def iter_ndjson_records(body: AsyncIterator[bytes]) -> AsyncIterator[dict[str, Any]]:
+    """Parse an NDJSON request body incrementally, one record per line"""
+    buffer = b""
+    line_number = 0
+
+    async for chunk in body:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _parse_line(line, line_number)
+
+    if buffer.strip():
+        yield _parse_line(buffer, line_number + 1)
+
+
+def _parse_line(line: bytes, line_number: int) -> dict[str, Any]:
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as error:
+        return {"error": f"line {line_number}: invalid JSON ({error.msg})"}
+
+    if not isinstance(record, dict) or "id" not in record or "text" not in record:
+        return {"error": f"line {line_number}: expected an object with 'id' and 'text'"}
+
+    return {
+        "id": str(record["id"]),
+        "text": record["text"],
+        "metadata": record.get("metadata") or {}
+    }
+
+
+async def iter_text_passages(
+        body: AsyncIterator[bytes],
+        chunking: dict[str, Any] | None = None,
+        document_id: str | None = None
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Chunk a raw text body as it arrives. The buffer is cut on the last
+    paragraph break, else the last line break, sentence end or space, and
+    only if there is none of those at TEXT_BUFFER_CHARS. Bytes that are
+    not valid UTF-8 raise UnicodeDecodeError rather than being dropped.
+    """
+    # Incremental, so a character split across two network chunks is decoded whole
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    next_index = 0
+    # Shared by every piece, so chunk IDs stay unique across the whole document
+    occurrences: dict[str, int] = {}
+
+    async for chunk in body:
+        buffer += decoder.decode(chunk)
+        while len(buffer) >= TEXT_BUFFER_CHARS:
+            # Keep the trailing (possibly incomplete) paragraph for the next round
+            end, start = _cut_point(buffer)
+            ready, buffer = buffer[:end], buffer[start:]
+            for passage in chunk_text(ready.strip(), next_index, document_id, chunking, occurrences):
+                next_index += 1
+                yield passage
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        for passage in chunk_text(buffer.strip(), next_index, document_id, chunking, occurrences):
+            yield passage
+
+
+def _cut_point(buffer: str) -> tuple[int, int]:
+    """Where to split a full buffer: the end of the text to chunk now and the start of the rest"""
+    for separator in ("\n\n", "\n", ". ", "! ", "? ", " "):
+        cut = buffer.rfind(separator, 0, TEXT_BUFFER_CHARS)
+        if cut > 0:
+            # A sentence keeps its closing punctuation
+            end = cut + 1 if separator.strip() else cut
+            return end, cut + len(separator)
+    return TEXT_BUFFER_CHARS, TEXT_BUFFER_CHARS
+
+
+# =========BATCHED INGESTION=========
+
+async def bulk_ingest(
+        records: AsyncIterator[dict[str, Any]],
+        collection: str,
+        batch_size: int = BULK_BATCH_SIZE,
+        concurrency: int = BULK_CONCURRENCY
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Stream records through fixed-size embedding batches and yield a progress
+    event per batch, followed by a summary event.
+
+    The batch queue holds at most `concurrency` pending batches, so a fast
+    uploader is slowed down to the pace of the embedding model instead of
+    being buffered in memory.
+    """
+    batches: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    events: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+    totals = {"documents": 0, "tokens": 0, "failed_batches": 0, "rejected_records": 0}
+
+    async def produce():
+        batch = []
+        batch_number = 0
+        try:
+            async for record in records:
+                if "error" in record:
+                    totals["rejected_records"] += 1
+                    await events.put({"event": "rejected", "detail": record["error"]})
+                    continue
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    batch_number += 1
+                    await batches.put((batch_number, batch))
+                    batch = []
+            if batch:
+                await batches.put((batch_number + 1, batch))
+        except Exception as error:
+            # e.g. the client disconnected mid-upload or sent invalid UTF-8; report it and drain what we have
+            await events.put({"event": "stream_error", "detail": str(error)})
+        finally:
+            for _ in range(concurrency):
+                await batches.put(None)
+
+    async def consume():
+        while (item := await batches.get()) is not None:
+            batch_number, batch = item
+            await events.put(await _ingest_batch(collection, batch_number, batch, started, totals))
+        await events.put(None)
+
+    tasks = [asyncio.create_task(produce())]
+    tasks += [asyncio.create_task(consume()) for _ in range(concurrency)]
+
+    try:
+        finished_workers = 0
+        while finished_workers < concurrency:
+            event = await events.get()
+            if event is None:
+                finished_workers += 1
+                continue
+            yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "event": "summary",
+        "collection": collection,
+        "ingested": totals["documents"],
+        "failed_batches": totals["failed_batches"],
+        "rejected_records": totals["rejected_records"],
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_s": round(totals["documents"] / elapsed, 2) if elapsed else 0.0,
+        "tokens_per_s": round(totals["tokens"] / elapsed, 2) if elapsed else 0.0
+    }
+
+
+async def bulk_ingest_text(
+        body: AsyncIterator[bytes],
+        collection: str,
+        document_id: str | None = None,
+        chunking: dict[str, Any] | None = None,
+        batch_size: int = BULK_BATCH_SIZE,
+        concurrency: int = BULK_CONCURRENCY
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Bulk-ingest a raw text body as one versioned document. Without a
+    document_id each upload is a new document. Once every batch is written
+    the chunks are recorded as the document's next version and those of
+    the previous version that are gone are deleted; an upload that broke
+    off or lost a batch leaves the stored version as it was.
+    """
+    document_id = document_id or f"doc_{uuid.uuid4().hex}"
+    digest = hashlib.sha256()
+    chunks = []
+    complete = True
+
+    async def hashed(body):
+        async for chunk in body:
+            digest.update(chunk)
+            yield chunk
+
+    async def recorded(passages):
+        async for passage in passages:
+            chunks.append((passage["id"], passage["metadata"]["content_hash"], passage["metadata"]["chunk_index"]))
+            yield passage
+
+    passages = recorded(iter_text_passages(hashed(body), chunking, document_id))
+    async for event in bulk_ingest(passages, collection, batch_size, concurrency):
+        if event["event"] == "stream_error" or "error" in event:
+            complete = False
+        if event["event"] == "summary":
+            event["document_id"] = document_id
+            if complete and chunks:
+                event.update(await asyncio.to_thread(record_document, collection, document_id, digest.hexdigest(), chunks))
+        yield event
+
+
+async def _ingest_batch(collection: str, batch_number: int, batch: list[dict[str, Any]], started: float, totals: dict) -> dict[str, Any]:
+    """Embed and write a single batch, returning its progress event"""
+    # Later duplicates of an id win, mirroring upsert semantics
+    unique = list({passage["id"]: passage for passage in batch}.values())
+    texts = [passage["text"] for passage in unique]
+    # Whitespace tokens are a cheap, model-independent throughput measure
+    tokens = sum(len(text.split()) for text in texts)
+    batch_started = time.perf_counter()
+
+    try:
+        # NER and embedding don't depend on each other, so run them side by side
+        unique, embeddings = await asyncio.gather(atag_entities(unique), EMBEDDING.aembed_documents(texts))
+        await asyncio.to_thread(
+            upsert_embedded,
+            collection,
+            [passage["id"] for passage in unique],
+            texts,
+            embeddings,
+            [passage["metadata"] for passage in unique]
+        )
+    except Exception as error:
+        totals["failed_batches"] += 1
+        return {"event": "batch", "batch": batch_number, "documents": len(unique), "error": str(error)}
+
+    totals["documents"] += len(unique)
+    totals["tokens"] += tokens
+    batch_elapsed = time.perf_counter() - batch_started
+    elapsed = time.perf_counter() - started
+
+    return {
+        "event": "batch",
+        "batch": batch_number,
+        "documents": len(unique),
+        "tokens": tokens,
+        "batch_s": round(batch_elapsed, 3),
+        "total_ingested": totals["documents"],
+        "docs_per_s": round(totals["documents"] / elapsed, 2) if elapsed else 0.0,
+        "tokens_per_s": round(totals["tokens"] / elapsed, 2) if elapsed else 0.0
+    }
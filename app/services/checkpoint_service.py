@@ -0,0 +1,199 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+# "sqlite" persists conversations across restarts, "memory" keeps them in-process only
+CHECKPOINT_BACKEND = os.getenv("WALT_CHECKPOINT_BACKEND", "sqlite")
+CHECKPOINT_PATH = os.getenv("WALT_CHECKPOINT_PATH", "app/checkpoints.sqlite3")
+# Threads idle for longer than this are evicted
+THREAD_TTL_SECONDS = int(os.getenv("WALT_THREAD_TTL_SECONDS", str(7 * 24 * 3600)))
+# Least recently used threads are evicted beyond this count
+MAX_THREADS = int(os.getenv("WALT_MAX_THREADS", "1000"))
+# Eviction is checked at most this often
+EVICTION_INTERVAL_SECONDS = 60
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver usable from async graphs.
+
+    The stock SqliteSaver only implements the sync API; its connection is
+    opened with check_same_thread=False and guarded by a lock, so the async
+    methods here simply run the sync ones on a worker thread.
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+class ThreadRegistry:
+    """
+    Records when each conversation thread was last used, to drive TTL and LRU eviction.
+
+    It shares the checkpoint database with the saver, so the connection is
+    set up like the storage pool's: WAL lets reads run alongside the
+    saver's writes, and a write waits for the lock rather than failing.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_threads: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = _connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS thread_activity ("
+            "thread_id TEXT PRIMARY KEY, created_at REAL NOT NULL, last_seen REAL NOT NULL, turns INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def touch(self, thread_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO thread_activity (thread_id, created_at, last_seen, turns) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(thread_id) DO UPDATE SET last_seen = excluded.last_seen, turns = turns + 1",
+                (thread_id, now, now)
+            )
+            self._db.commit()
+
+    def forget(self, thread_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM thread_activity WHERE thread_id = ?", (thread_id,))
+            self._db.commit()
+
+    def get(self, thread_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT thread_id, created_at, last_seen, turns FROM thread_activity WHERE thread_id = ?",
+                (thread_id,)
+            ).fetchone()
+        return _thread_row(row) if row else None
+
+    def list_threads(self, prefix: str = "") -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT thread_id, created_at, last_seen, turns FROM thread_activity "
+                "WHERE thread_id LIKE ? ESCAPE '\\' ORDER BY last_seen DESC",
+                (prefix.replace("%", r"\%").replace("_", r"\_") + "%",)
+            ).fetchall()
+        return [_thread_row(row) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0]
+
+    def eviction_candidates(self) -> list[str]:
+        """Threads past their TTL, plus the least recently used ones over the thread cap"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [row[0] for row in self._db.execute(
+                "SELECT thread_id FROM thread_activity WHERE last_seen < ?", (cutoff,)
+            )]
+            overflow = [row[0] for row in self._db.execute(
+                "SELECT thread_id FROM thread_activity WHERE last_seen >= ? ORDER BY last_seen DESC LIMIT -1 OFFSET ?",
+                (cutoff, self.max_threads)
+            )]
+        return expired + overflow
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA busy_timeout=30000")
+    return connection
+
+
+def _thread_row(row) -> dict[str, Any]:
+    return {"thread_id": row[0], "created_at": row[1], "last_seen": row[2], "turns": row[3]}
+
+
+def build_checkpointer() -> BaseCheckpointSaver:
+    if CHECKPOINT_BACKEND == "memory":
+        return MemorySaver()
+    if CHECKPOINT_BACKEND == "sqlite":
+        os.makedirs(os.path.dirname(CHECKPOINT_PATH) or ".", exist_ok=True)
+        return ThreadedSqliteSaver(_connect(CHECKPOINT_PATH))
+    raise ValueError(f"Unknown checkpoint backend: {CHECKPOINT_BACKEND}")
+
+
+# Shared by every compiled graph; thread IDs keep their conversations apart
+checkpointer = build_checkpointer()
+thread_registry = ThreadRegistry(
+    CHECKPOINT_PATH if CHECKPOINT_BACKEND == "sqlite" else ":memory:",
+    THREAD_TTL_SECONDS,
+    MAX_THREADS
+)
+_last_eviction = 0.0
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+def thread_id_for(graph_name: str, user_id: str | None, session_id: str) -> str:
+    """Isolated checkpoint thread for one user's session on one graph"""
+    return f"{graph_name}:{user_id or 'anonymous'}:{session_id}"
+
+
+async def export_thread(thread_id: str) -> dict[str, Any] | None:
+    """Latest checkpointed state of a thread, or None if it has no checkpoints"""
+    checkpoint_tuple = await checkpointer.aget_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+    if checkpoint_tuple is None:
+        return None
+
+    values = checkpoint_tuple.checkpoint.get("channel_values", {})
+    return {
+        "thread_id": thread_id,
+        "checkpoint_id": checkpoint_tuple.checkpoint.get("id"),
+        "activity": await asyncio.to_thread(thread_registry.get, thread_id),
+        # Internal channels (branch markers, start/end) are not part of the conversation
+        "state": {key: value for key, value in values.items() if not key.startswith(("branch:", "__"))}
+    }
+
+
+async def evict_threads(thread_ids: list[str] | None = None) -> list[str]:
+    """Delete the given threads' checkpoints, or every eviction candidate when none are given"""
+    if thread_ids is None:
+        thread_ids = await asyncio.to_thread(thread_registry.eviction_candidates)
+
+    for thread_id in thread_ids:
+        await checkpointer.adelete_thread(thread_id)
+        await asyncio.to_thread(thread_registry.forget, thread_id)
+        thread_registry.evictions += 1
+
+    return thread_ids
+
+
+async def touch_thread(thread_id: str) -> None:
+    """Mark a thread as active, and periodically evict expired threads"""
+    global _last_eviction
+
+    await asyncio.to_thread(thread_registry.touch, thread_id)
+
+    if time.monotonic() - _last_eviction > EVICTION_INTERVAL_SECONDS:
+        _last_eviction = time.monotonic()
+        await evict_threads()
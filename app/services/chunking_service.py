@@ -0,0 +1,179 @@
+import os
+import re
+from functools import lru_cache
+from typing import Any
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# "recursive" (character splitter, the original behaviour), "sentence" (whole sentences packed
+# up to the chunk size) or "paragraph" (whole paragraphs packed, sentences only inside long ones)
+CHUNK_STRATEGIES = ("recursive", "sentence", "paragraph")
+
+DEFAULT_CHUNKING = {
+    "strategy": os.getenv("WALT_CHUNK_STRATEGY", "recursive"),
+    "chunk_size": int(os.getenv("WALT_CHUNK_SIZE", "500")),
+    "chunk_overlap": int(os.getenv("WALT_CHUNK_OVERLAP", "100"))
+}
+
+# Splits end after sentence punctuation (optionally closed by a quote or bracket) or at a line break
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+|\s*\n\s*")
+_PARAGRAPH_BOUNDARY = re.compile(r"\s*\n\s*\n\s*")
+
+
+def parse_collection_chunking(raw: str) -> dict[str, dict[str, Any]]:
+    """Parse "collection=strategy:size:overlap,..." (size and overlap optional)"""
+    settings = {}
+    for entry in filter(None, (part.strip() for part in raw.split(","))):
+        collection, _, spec = entry.partition("=")
+        strategy, *numbers = spec.split(":")
+        config = {"strategy": strategy}
+        if numbers:
+            config["chunk_size"] = int(numbers[0])
+        if len(numbers) > 1:
+            config["chunk_overlap"] = int(numbers[1])
+        settings[collection.strip()] = config
+    return settings
+
+
+# Per-collection overrides of DEFAULT_CHUNKING, e.g. WALT_CHUNKING="freewriting=sentence:600:120"
+COLLECTION_CHUNKING = parse_collection_chunking(os.getenv("WALT_CHUNKING", ""))
+
+
+def chunking_for(collection: str, **overrides: Any) -> dict[str, Any]:
+    """The chunking settings for a collection, with any request-level overrides (None = not set)"""
+    config = {**DEFAULT_CHUNKING, **COLLECTION_CHUNKING.get(collection, {})}
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    if config["strategy"] not in CHUNK_STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy: {config['strategy']}")
+    if config["chunk_size"] <= 0 or not 0 <= config["chunk_overlap"] < config["chunk_size"]:
+        raise ValueError("chunk_overlap must be at least 0 and smaller than chunk_size")
+    return config
+
+
+def chunker_name(config: dict[str, Any]) -> str:
+    """Short label stored with each chunk, e.g. "sentence/500/100" """
+    return f"{config['strategy']}/{config['chunk_size']}/{config['chunk_overlap']}"
+
+
+# =========SPAN PACKING=========
+# The sentence and paragraph chunkers work on (start, end) spans of the original text,
+# so chunk text and overlap are exact substrings rather than re-joined pieces
+
+def _spans(text: str, boundary: re.Pattern, start: int = 0, end: int | None = None) -> list[tuple[int, int]]:
+    end = len(text) if end is None else end
+    spans = []
+    position = start
+    for match in boundary.finditer(text, start, end):
+        if match.start() > position:
+            spans.append((position, match.start()))
+        position = match.end()
+    if position < end:
+        spans.append((position, end))
+    return [(left, right) for left, right in spans if text[left:right].strip()]
+
+
+def _hard_split(text: str, span: tuple[int, int], size: int) -> list[tuple[int, int]]:
+    """Cut a span longer than `size` at the last space that keeps each piece within it"""
+    start, end = span
+    pieces = []
+    while end - start > size:
+        cut = text.rfind(" ", start + 1, start + size)
+        cut = cut if cut > start else start + size
+        pieces.append((start, cut))
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        pieces.append((start, end))
+    return pieces
+
+
+def _pack(text: str, spans: list[tuple[int, int]], size: int, overlap: int) -> list[str]:
+    """Greedily pack consecutive spans into chunks of at most `size` characters"""
+    chunks = []
+    current: list[tuple[int, int]] = []
+    for span in spans:
+        if current and span[1] - current[0][0] > size:
+            chunks.append(text[current[0][0]:current[-1][1]])
+            # Repeat the trailing spans that fit in the overlap at the start of the next chunk
+            carried: list[tuple[int, int]] = []
+            for previous in reversed(current):
+                if current[-1][1] - previous[0] > overlap:
+                    break
+                carried.insert(0, previous)
+            current = carried if carried and span[1] - carried[0][0] <= size else []
+        current.append(span)
+    if current:
+        chunks.append(text[current[0][0]:current[-1][1]])
+    return chunks
+
+
+# =========STRATEGIES=========
+
+class RecursiveChunker:
+    """LangChain's recursive character splitter: paragraphs, then lines, then words"""
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", " ", ""]
+        )
+
+    def split(self, text: str) -> list[str]:
+        return self._splitter.split_text(text)
+
+
+class SentenceChunker:
+    """Whole sentences packed up to chunk_size; the overlap repeats whole trailing sentences"""
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def sentence_spans(self, text: str, start: int = 0, end: int | None = None) -> list[tuple[int, int]]:
+        return [
+            piece
+            for span in _spans(text, _SENTENCE_BOUNDARY, start, end)
+            for piece in _hard_split(text, span, self.chunk_size)
+        ]
+
+    def split(self, text: str) -> list[str]:
+        return _pack(text, self.sentence_spans(text), self.chunk_size, self.chunk_overlap)
+
+
+class ParagraphChunker:
+    """
+    Whole paragraphs packed up to chunk_size, so chunks end on the writer's own
+    topic boundaries. Only paragraphs longer than a chunk are broken up, at
+    sentence boundaries; chunk_overlap applies inside those.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = chunk_size
+        self._sentences = SentenceChunker(chunk_size, chunk_overlap)
+
+    def split(self, text: str) -> list[str]:
+        chunks = []
+        paragraphs: list[tuple[int, int]] = []
+        for span in _spans(text, _PARAGRAPH_BOUNDARY):
+            if span[1] - span[0] <= self.chunk_size:
+                paragraphs.append(span)
+                continue
+            chunks += _pack(text, paragraphs, self.chunk_size, 0)
+            paragraphs = []
+            chunks += _pack(text, self._sentences.sentence_spans(text, *span), self.chunk_size, self._sentences.chunk_overlap)
+        return chunks + _pack(text, paragraphs, self.chunk_size, 0)
+
+
+CHUNKERS = {"recursive": RecursiveChunker, "sentence": SentenceChunker, "paragraph": ParagraphChunker}
+
+
+@lru_cache(maxsize=32)
+def get_chunker(strategy: str, chunk_size: int, chunk_overlap: int):
+    """Chunkers are stateless once built, so one instance per configuration is shared"""
+    return CHUNKERS[strategy](chunk_size, chunk_overlap)
+
+
+def split_text(text: str, config: dict[str, Any]) -> list[str]:
+    return get_chunker(config["strategy"], config["chunk_size"], config["chunk_overlap"]).split(text)
@@ -0,0 +1,213 @@
+import asyncio
+import os
+import threading
+from typing import Any
+
+import numpy as np
+
+from app.services.vectordb_service import EMBEDDING, get_embeddings
+
+# Prompt budget for retrieved text, in (estimated) tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("WALT_CONTEXT_TOKEN_BUDGET", "1000"))
+# MMR trade-off: 1.0 ranks by relevance alone, lower values penalise near-duplicates harder
+CONTEXT_MMR_LAMBDA = float(os.getenv("WALT_CONTEXT_MMR_LAMBDA", "0.7"))
+# Rough chars-per-token for Mistral on English prose; no tokenizer is loaded just to count
+CHARS_PER_TOKEN = 4
+# Neighbouring chunks are only joined when the end of one really is the start of the next
+MIN_MERGE_OVERLAP = 20
+
+# Observed by /langgraph/context/stats
+context_stats = {
+    "assembled": 0,
+    "candidate_chunks": 0,
+    "merged_chunks": 0,
+    "dropped_chunks": 0,
+    "candidate_tokens": 0,
+    "packed_tokens": 0,
+    "rerank_fallbacks": 0
+}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`"""
+    for length in range(min(len(left), len(right)), MIN_MERGE_OVERLAP - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+# =========MERGE=========
+
+def merge_adjacent(docs: list[dict[str, Any]], collection: str | list[str]) -> list[dict[str, Any]]:
+    """
+    Join chunks that were split from the same text with overlap.
+
+    Chunks whose chunk_index values are consecutive are merged when the
+    overlap the splitter repeated is actually found, so the shared text
+    is sent once. Each unit keeps the IDs it was built from, the collection
+    they live in and the best retrieval rank among them.
+    """
+    units = []
+    for rank, doc in enumerate(docs):
+        metadata = doc.get("metadata") or {}
+        units.append({
+            "ids": [doc["id"]],
+            "text": doc["text"],
+            "collection": doc.get("collection", collection),
+            "group": (doc.get("collection", collection), metadata.get("source"), metadata.get("document_id")),
+            "chunk_index": metadata.get("chunk_index"),
+            "rank": rank
+        })
+
+    indexed = sorted(
+        (unit for unit in units if isinstance(unit["chunk_index"], int)),
+        key=lambda unit: (str(unit["group"]), unit["chunk_index"])
+    )
+    merged_away = set()
+    previous = None
+    for unit in indexed:
+        if (previous is not None and previous["group"] == unit["group"]
+                and unit["chunk_index"] == previous["last_index"] + 1):
+            overlap = _overlap(previous["text"], unit["text"])
+            if overlap:
+                previous["ids"].extend(unit["ids"])
+                previous["text"] += unit["text"][overlap:]
+                previous["rank"] = min(previous["rank"], unit["rank"])
+                previous["last_index"] = unit["chunk_index"]
+                merged_away.add(id(unit))
+                continue
+        unit["last_index"] = unit["chunk_index"]
+        previous = unit
+
+    return sorted((unit for unit in units if id(unit) not in merged_away), key=lambda unit: unit["rank"])
+
+
+# =========RERANK=========
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _unit_vectors(units: list[dict[str, Any]]) -> list[np.ndarray | None]:
+    """Mean of each unit's stored chunk vectors; None when any of them is missing"""
+    stored: dict[tuple[str, str], Any] = {}
+    for collection in {unit["collection"] for unit in units}:
+        ids = [doc_id for unit in units if unit["collection"] == collection for doc_id in unit["ids"]]
+        stored.update({(collection, doc_id): vector for doc_id, vector in get_embeddings(ids, collection).items()})
+
+    vectors = []
+    for unit in units:
+        parts = [stored.get((unit["collection"], doc_id)) for doc_id in unit["ids"]]
+        if any(part is None for part in parts):
+            vectors.append(None)
+        else:
+            vectors.append(_normalize(np.mean(np.asarray(parts, dtype=np.float32), axis=0)))
+    return vectors
+
+
+def mmr_order(query_vector: np.ndarray, vectors: list[np.ndarray | None], mmr_lambda: float) -> list[int]:
+    """
+    Maximal marginal relevance: repeatedly take the unit most similar to the
+    query and least similar to what was already taken. Units without a
+    vector keep their retrieval order after the reranked ones.
+    """
+    candidates = [index for index, vector in enumerate(vectors) if vector is not None]
+    if not candidates:
+        return list(range(len(vectors)))
+
+    matrix = np.stack([vectors[index] for index in candidates])
+    relevance = matrix @ query_vector
+    # Highest similarity of each candidate to anything already selected
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    remaining = list(range(len(candidates)))
+    order = []
+    while remaining:
+        scores = [
+            mmr_lambda * relevance[position] - (1 - mmr_lambda) * (redundancy[position] if order else 0.0)
+            for position in remaining
+        ]
+        best = remaining.pop(int(np.argmax(scores)))
+        order.append(candidates[best])
+        redundancy = np.maximum(redundancy, matrix @ matrix[best])
+
+    return order + [index for index, vector in enumerate(vectors) if vector is None]
+
+
+# =========PACK=========
+
+def pack(units: list[dict[str, Any]], budget: int) -> list[dict[str, Any]]:
+    """
+    Take units in order while they fit the budget. The best unit always goes
+    in, cut down to the budget if it is too long on its own.
+    """
+    packed = []
+    used = 0
+    for unit in units:
+        tokens = estimate_tokens(unit["text"])
+        if used + tokens <= budget:
+            packed.append(unit)
+            used += tokens
+        elif not packed and budget > 0:
+            packed.append({**unit, "text": unit["text"][:budget * CHARS_PER_TOKEN]})
+            used = budget
+    return packed
+
+
+async def assemble_context(
+        query: str,
+        docs: list[dict[str, Any]],
+        collection: str | list[str],
+        budget: int = CONTEXT_TOKEN_BUDGET,
+        mmr_lambda: float = CONTEXT_MMR_LAMBDA
+) -> dict[str, Any]:
+    """
+    Turn retrieved chunks into the text that goes into the prompt:
+    merge overlapping neighbours, rerank by MMR over the stored embeddings,
+    then pack the best units into `budget` tokens. If the query or chunk
+    vectors cannot be read, units keep their retrieval order.
+    """
+    units = merge_adjacent(docs, collection)
+
+    try:
+        query_vector, vectors = await asyncio.gather(
+            EMBEDDING.aembed_query(query),
+            asyncio.to_thread(_unit_vectors, units)
+        )
+        order = mmr_order(_normalize(np.asarray(query_vector, dtype=np.float32)), vectors, mmr_lambda)
+        ranked = [units[index] for index in order]
+        reranked = True
+    except Exception:
+        ranked = units
+        reranked = False
+
+    packed = pack(ranked, budget)
+    text = "\n\n".join(unit["text"] for unit in packed)
+
+    with _stats_lock:
+        context_stats["assembled"] += 1
+        context_stats["candidate_chunks"] += len(docs)
+        context_stats["merged_chunks"] += len(docs) - len(units)
+        context_stats["dropped_chunks"] += len(units) - len(packed)
+        context_stats["candidate_tokens"] += sum(estimate_tokens(doc["text"]) for doc in docs)
+        context_stats["packed_tokens"] += estimate_tokens(text)
+        if not reranked and units:
+            context_stats["rerank_fallbacks"] += 1
+
+    return {"text": text, "ids": [doc_id for unit in packed for doc_id in unit["ids"]], "tokens": estimate_tokens(text)}
+
+
+def context_info() -> dict[str, Any]:
+    with _stats_lock:
+        candidate = context_stats["candidate_tokens"]
+        return {
+            "token_budget": CONTEXT_TOKEN_BUDGET,
+            "mmr_lambda": CONTEXT_MMR_LAMBDA,
+            "token_reduction": 1 - context_stats["packed_tokens"] / candidate if candidate else 0.0,
+            **context_stats
+        }
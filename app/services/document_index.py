@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+
+class DocumentIndex:
+    """
+    Which chunks make up each ingested document, in SQLite.
+
+    A document is stored as a version number plus one row per chunk
+    (chunk ID, content hash, position). Re-ingesting a document diffs the
+    new chunks against these rows, and the content hashes double as a
+    dedup index: a chunk whose text is already stored anywhere in the
+    collection reuses that chunk's vector instead of being embedded again.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, document_id TEXT NOT NULL, version INTEGER NOT NULL, "
+            "content_hash TEXT NOT NULL, chunk_count INTEGER NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (collection, document_id))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS document_chunks ("
+            "collection TEXT NOT NULL, document_id TEXT NOT NULL, chunk_id TEXT NOT NULL, "
+            "content_hash TEXT NOT NULL, chunk_index INTEGER NOT NULL, "
+            "PRIMARY KEY (collection, chunk_id))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS document_chunks_document ON document_chunks (collection, document_id)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS document_chunks_content ON document_chunks (collection, content_hash)"
+        )
+        self._db.commit()
+
+    def get(self, collection: str, document_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version, content_hash, chunk_count, updated_at FROM documents WHERE collection = ? AND document_id = ?",
+                (collection, document_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "document_id": document_id,
+            "collection": collection,
+            "version": row[0],
+            "content_hash": row[1],
+            "chunks": row[2],
+            "updated_at": row[3]
+        }
+
+    def chunks(self, collection: str, document_id: str) -> dict[str, tuple[str, int]]:
+        """Chunk ID -> (content hash, chunk index) for the document's current version"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT chunk_id, content_hash, chunk_index FROM document_chunks WHERE collection = ? AND document_id = ?",
+                (collection, document_id)
+            ).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def find_content(self, collection: str, content_hashes: list[str]) -> dict[str, str]:
+        """Content hash -> ID of some stored chunk with that text, for the hashes that are stored"""
+        found = {}
+        with self._lock:
+            for content_hash in set(content_hashes):
+                row = self._db.execute(
+                    "SELECT chunk_id FROM document_chunks WHERE collection = ? AND content_hash = ? LIMIT 1",
+                    (collection, content_hash)
+                ).fetchone()
+                if row is not None:
+                    found[content_hash] = row[0]
+        return found
+
+    def replace(
+            self,
+            collection: str,
+            document_id: str,
+            version: int,
+            content_hash: str,
+            chunks: list[tuple[str, str, int]]
+    ) -> None:
+        """Record a document version as its (chunk ID, content hash, chunk index) rows"""
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM document_chunks WHERE collection = ? AND document_id = ?",
+                    (collection, document_id)
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO document_chunks (collection, document_id, chunk_id, content_hash, chunk_index) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(collection, document_id, chunk_id, chunk_hash, index) for chunk_id, chunk_hash, index in chunks]
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO documents (collection, document_id, version, content_hash, chunk_count, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (collection, document_id, version, content_hash, len(chunks), time.time())
+                )
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.metrics_service import embedding_seconds, timed
+from app.services.model_registry import LazyModel
+from app.services.ollama_client import ModelGate
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of an embedding model.
+
+    Vectors are keyed by (model name, sha256 of the full text) and stored as
+    float32 blobs in SQLite, with an in-memory LRU tier for hot entries.
+    Only texts that miss both tiers are sent to the wrapped model, in a
+    single batched call, admitted through `gate` when one is given.
+    """
+
+    def __init__(
+            self,
+            embeddings: Embeddings | LazyModel,
+            model_name: str,
+            path: str,
+            hot_size: int = 4096,
+            gate: ModelGate | None = None
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.gate = gate
+        self.hot_size = hot_size
+        self._hot: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hot_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._db.commit()
+
+    def model(self) -> Embeddings:
+        # A LazyModel defers building the wrapped client until something actually misses
+        return self.embeddings.get() if isinstance(self.embeddings, LazyModel) else self.embeddings
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    # =========CACHE TIERS=========
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        cold = []
+
+        with self._lock:
+            for key in keys:
+                if key in self._hot:
+                    self._hot.move_to_end(key)
+                    found[key] = self._hot[key]
+                    self.stats["hot_hits"] += 1
+                else:
+                    cold.append(key)
+
+            # SQLite caps the number of bound parameters, so query in slices
+            for start in range(0, len(cold), 500):
+                batch = cold[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+                    self._remember(key, found[key])
+                    self.stats["disk_hits"] += 1
+
+        return found
+
+    def _store(self, entries: dict[str, list[float]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in entries.items()]
+            )
+            self._db.commit()
+            for key, vector in entries.items():
+                self._remember(key, vector)
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._hot[key] = vector
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def _misses(self, texts: list[str], found: dict[str, list[float]]) -> dict[str, str]:
+        """Map each uncached key to its text, collapsing duplicate texts"""
+        missing = {}
+        for text in texts:
+            key = self.key(text)
+            if key not in found:
+                missing[key] = text
+        with self._lock:
+            self.stats["misses"] += len(missing)
+        return missing
+
+    # =========EMBEDDINGS INTERFACE=========
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self.key(text) for text in texts]
+        found = self._lookup(keys)
+        missing = self._misses(texts, found)
+
+        if missing:
+            with timed(embedding_seconds, "embedding", "documents", call="documents"):
+                if self.gate is None:
+                    vectors = self.model().embed_documents(list(missing.values()))
+                else:
+                    vectors = self.gate.call(self.model().embed_documents, list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self.key(text) for text in texts]
+        found = await asyncio.to_thread(self._lookup, keys)
+        missing = self._misses(texts, found)
+
+        if missing:
+            with timed(embedding_seconds, "embedding", "documents", call="adocuments"):
+                if self.gate is None:
+                    vectors = await self.model().aembed_documents(list(missing.values()))
+                else:
+                    vectors = await self.gate.acall(self.model().aembed_documents, list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._store, computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
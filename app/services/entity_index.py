@@ -0,0 +1,136 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any
+
+ENTITY_LABELS = ("PERSON", "ORG", "LOC", "DATE", "OTHER")
+# Model tag names accepted as aliases of the labels above
+LABEL_ALIASES = {"PER": "PERSON", "ORGANIZATION": "ORG", "LOCATION": "LOC", "MISC": "OTHER"}
+# Run NER when chunks are written, so queries only look entities up
+INDEX_ENTITIES_AT_INGEST = os.getenv("WALT_INDEX_ENTITIES", "1") == "1"
+
+
+# =========CHUNK METADATA=========
+# Chroma only stores scalar metadata, so the grouped entities are kept as a
+# JSON string plus one boolean per label (usable in `where` filters)
+
+def entity_metadata(entities: dict[str, list[str]]) -> dict[str, Any]:
+    metadata: dict[str, Any] = {"entities": json.dumps(entities)}
+    for label in ENTITY_LABELS:
+        metadata[f"has_{label.lower()}"] = bool(entities.get(label))
+    return metadata
+
+
+def entities_from_metadata(metadata: dict[str, Any] | None) -> dict[str, list[str]] | None:
+    """The precomputed entities of a chunk, or None if it was ingested without them"""
+    raw = (metadata or {}).get("entities")
+    if not isinstance(raw, str):
+        return None
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+
+
+def normalize_label(label: str) -> str | None:
+    label = label.upper()
+    label = LABEL_ALIASES.get(label, label)
+    return label if label in ENTITY_LABELS else None
+
+
+def merge_entities(groups: list[dict[str, list[str]]]) -> dict[str, list[str]]:
+    """Union several grouped-entity dicts, keeping first-seen order"""
+    merged: dict[str, list[str]] = {label: [] for label in ENTITY_LABELS}
+    for group in groups:
+        for label, values in group.items():
+            merged.setdefault(label, []).extend(values)
+    return {label: list(dict.fromkeys(values)) for label, values in merged.items()}
+
+
+# =========INVERTED INDEX=========
+
+class EntityIndex:
+    """
+    Inverted index from (collection, label, entity) to chunk IDs, in SQLite.
+
+    Entities are matched case-insensitively. Rewriting a chunk replaces its
+    rows, so the index follows upserts.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_entities ("
+            "collection TEXT NOT NULL, chunk_id TEXT NOT NULL, label TEXT NOT NULL, "
+            "entity TEXT NOT NULL, entity_norm TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS chunk_entities_lookup ON chunk_entities (collection, label, entity_norm)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS chunk_entities_chunk ON chunk_entities (collection, chunk_id)"
+        )
+        self._db.commit()
+        self.stats = {"indexed_chunks": 0, "ner_failures": 0}
+        self.last_error: str | None = None
+
+    def replace(self, collection: str, entities_by_chunk: dict[str, dict[str, list[str]]]) -> None:
+        rows = [
+            (collection, chunk_id, label, entity, entity.lower())
+            for chunk_id, entities in entities_by_chunk.items()
+            for label, values in entities.items()
+            for entity in values
+        ]
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM chunk_entities WHERE collection = ? AND chunk_id = ?",
+                [(collection, chunk_id) for chunk_id in entities_by_chunk]
+            )
+            self._db.executemany(
+                "INSERT INTO chunk_entities (collection, chunk_id, label, entity, entity_norm) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+            self.stats["indexed_chunks"] += len(entities_by_chunk)
+
+    def remove(self, collection: str, chunk_ids: list[str]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM chunk_entities WHERE collection = ? AND chunk_id = ?",
+                [(collection, chunk_id) for chunk_id in chunk_ids]
+            )
+            self._db.commit()
+
+    def lookup(self, collection: str, label: str, entity: str, partial: bool = False) -> list[str]:
+        """Chunk IDs mentioning the entity; `partial` also matches it inside longer names"""
+        if partial:
+            condition, value = "entity_norm LIKE ? ESCAPE '\\'", f"%{_escape_like(entity.lower())}%"
+        else:
+            condition, value = "entity_norm = ?", entity.lower()
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT DISTINCT chunk_id FROM chunk_entities WHERE collection = ? AND label = ? AND {condition}",
+                (collection, label, value)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def top_entities(self, collection: str, label: str | None = None, limit: int = 50) -> list[dict[str, Any]]:
+        """Most frequently mentioned entities, counted by number of chunks"""
+        query = "SELECT label, MIN(entity), COUNT(DISTINCT chunk_id) AS chunks FROM chunk_entities WHERE collection = ?"
+        params: list[Any] = [collection]
+        if label:
+            query += " AND label = ?"
+            params.append(label)
+        query += " GROUP BY label, entity_norm ORDER BY chunks DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [{"label": row[0], "entity": row[1], "chunks": row[2]} for row in rows]
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -1,24 +1,58 @@
 from typing import TypedDict, Any, Annotated
 
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from langchain_ollama import ChatOllama
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, RemoveMessage
 from langgraph.graph import StateGraph, add_messages
 
-from app.services.vectordb_service import search
+from app.services.answer_cache import answer_cache
+from app.services.checkpoint_service import checkpointer
+from app.services.context_service import assemble_context
+from app.services.metrics_service import ainvoke_llm, instrument
+from app.services.model_registry import lazy_model
+from app.services.ollama_client import (
+    OllamaUnavailable, RETRIEVAL_FALLBACK, CHAT_CONCURRENCY, chat_ollama, model_gate, retrieval_only_answer
+)
+from app.services.query_router import query_router
+from app.services.vectordb_service import asearch, asearch_collections
 
 # define the LLM
-llm = ChatOllama(
-    model="mistral",
-    temperature=0.2
-)
+CHAT_MODEL = "mistral"
+llm = lazy_model("chat_llm", lambda: chat_ollama(CHAT_MODEL, temperature=0.2))
+# Every call to the chat model waits here for a slot (see ollama_client)
+chat_gate = model_gate(CHAT_MODEL, CHAT_CONCURRENCY)
+
+# Memory policy: the last MEMORY_MAX_TURNS exchanges stay verbatim in the prompt,
+# older ones are folded into a running summary once MEMORY_SUMMARIZE_EVERY extra turns pile up
+MEMORY_MAX_TURNS = 6
+MEMORY_SUMMARIZE_EVERY = 4
+MEMORY_SUMMARY_MAX_CHARS = 1500
+
+# Observed by /langgraph/memory/metrics
+memory_metrics = {
+    "summarizations": 0,
+    "messages_summarized": 0,
+    "last_prompt_chars": 0,
+    "max_prompt_chars": 0
+}
+
+# Which collection(s) each retrieval route searches; "all" fans out over both at once
+ROUTE_COLLECTIONS = {"passages": "passages", "freewriting": "freewriting", "all": ["passages", "freewriting"]}
 
 class GraphState(TypedDict, total=False):
     query: str
     route: str
+    # How the route was picked ("embedding" or a keyword fallback) and the prototype similarity
+    route_method: str
+    route_confidence: float | None
+    # Retrieval mode ("vector", "lexical" or "hybrid"); None uses the server default
+    mode: str | None
+    # Metadata filters applied inside the vector-store query (see vectordb_service.metadata_where)
+    filters: dict[str, Any] | None
     docs: list[dict[str, Any]]
     answer: str
+    # True when the answer is the retrieved context because the chat model was unavailable
+    degraded: bool
     message_memory: Annotated[list[BaseMessage], add_messages]
+    summary: str
 
 # =========NODE DEFINITIONS=========
 
@@ -26,38 +60,55 @@ class GraphState(TypedDict, total=False):
 
 # Route Node
 
-def route_node(state: GraphState) -> GraphState:
+async def route_node(state: GraphState) -> GraphState:
 
-    query = state.get("query", "").lower()
+    decision = await query_router.route(state.get("query", ""))
 
+    # this return adds the route to State
+    return {"route":decision["route"],
+            "route_method":decision["method"],
+            "route_confidence":decision["confidence"]
+            }
 
-    if any(word in query for word in ["passage", "passages", "archive", "archives", "history"]):
-        return {"route":"passages"} # this return adds the route to State
+async def extract_passages_node(state: GraphState) -> GraphState:
 
-    if any(word in query for word in ["freewrite", "freewriting", "free writing", "free write", "free writings"]):
-        return {"route":"freewriting"}
+    query = state.get("query", "")
+    results = await asearch(query, k=5, collection=ROUTE_COLLECTIONS["passages"], mode=state.get("mode"), filters=state.get("filters"))
+    if not results:
+        query_router.record_empty_retrieval("passages")
 
-    return {"route":"chat"}
+    return {"docs":results}
 
-def extract_passages_node(state: GraphState) -> GraphState:
 
-    query = state.get("query", "")
-    results = search(query, k=5, collection="passages")
+async def extract_text_node(state: GraphState) -> GraphState:
 
+    query = state.get("query", "")
+    results = await asearch(query, k=10, collection=ROUTE_COLLECTIONS["freewriting"], mode=state.get("mode"), filters=state.get("filters"))
+    if not results:
+        query_router.record_empty_retrieval("freewriting")
     return {"docs":results}
 
-
-def extract_text_node(state: GraphState) -> GraphState:
+async def extract_all_node(state: GraphState) -> GraphState:
 
     query = state.get("query", "")
-    results = search(query, k=10, collection="freewriting")
+    results = await asearch_collections(query, k=10, collections=ROUTE_COLLECTIONS["all"], mode=state.get("mode"), filters=state.get("filters"))
+    if not results:
+        query_router.record_empty_retrieval("all")
     return {"docs":results}
 
-def answer_with_context_node(state: GraphState) -> GraphState:
+async def answer_with_context_node(state: GraphState) -> GraphState:
 
     query = state.get("query", "")
     docs = state.get("docs", [])
-    combined_docs = "\n\n".join(passage["text"] for passage in docs)
+    collection = ROUTE_COLLECTIONS.get(state.get("route"), "")
+    doc_ids = [passage["id"] for passage in docs]
+
+    cached = await answer_cache.get("chat", query, doc_ids, collection, state.get("filters"))
+    if cached is not None:
+        return {"answer":cached, "degraded":False}
+
+    # Overlap removed, near-duplicates reranked away, trimmed to the token budget
+    combined_docs = (await assemble_context(query, docs, collection))["text"]
 
     prompt = (
         f"You are a writing assistant named Walt Bot."
@@ -72,11 +123,24 @@ def answer_with_context_node(state: GraphState) -> GraphState:
         f"Answer: "
     )
 
-    response = llm.invoke(prompt)
+    try:
+        response = await chat_gate.acall(ainvoke_llm, llm.get(), prompt)
+    except OllamaUnavailable:
+        if not RETRIEVAL_FALLBACK:
+            raise
+        # Not cached, so the real answer is generated once the model is back
+        return {"answer":retrieval_only_answer(combined_docs), "degraded":True}
+    await answer_cache.put("chat", query, doc_ids, collection, response.content, state.get("filters"))
+
+    return {"answer":response.content, "degraded":False}
+
+def format_memory(messages: list[BaseMessage]) -> str:
+    speakers = {"human": "User", "ai": "Walt Bot"}
+    return "\n".join(f"{speakers.get(message.type, message.type)}: {message.content}" for message in messages)
 
-    return {"answer":response}
+async def general_chat_node(state: GraphState) -> GraphState:
 
-def general_chat_node(state: GraphState) -> GraphState:
+    recent_memory = state.get("message_memory", [])[-2 * MEMORY_MAX_TURNS:]
 
     prompt = (
         f"""You are a writing assistant named Walt Bot.
@@ -84,32 +148,70 @@ def general_chat_node(state: GraphState) -> GraphState:
         You don't do writing for them unless they specifically ask you, but you provide information that helps guide them to do it themselves.
         You speak in a poetic, but very accurate and concise way.
         Your style of writing is reminiscent of Walt Whitman, Lon Milo DuQuette, and Carl Sagan.
-        You have context from previous interactions: \n{state.get('message_memory')}
+        Summary of the earlier conversation: \n{state.get('summary') or 'None yet.'}
+        You have context from previous interactions: \n{format_memory(recent_memory)}
         Answer the User's Query to the best of your ability.
         User Query:\n{state.get('query','')}
         Answer: """
     )
 
-    result = llm.invoke(prompt).content
+    memory_metrics["last_prompt_chars"] = len(prompt)
+    memory_metrics["max_prompt_chars"] = max(memory_metrics["max_prompt_chars"], len(prompt))
+
+    # No retrieved context to fall back on, so an unavailable model fails the request
+    result = (await chat_gate.acall(ainvoke_llm, llm.get(), prompt)).content
 
     return {"answer":result,
+            "degraded":False,
             "message_memory": [
                 HumanMessage(content=state.get("query")),
                 AIMessage(content=result)
             ]
             }
 
+async def summarize_memory_node(state: GraphState) -> GraphState:
+    """Roll the turns that fell out of the verbatim window into the running summary"""
+
+    messages = state.get("message_memory", [])
+    if len(messages) <= 2 * (MEMORY_MAX_TURNS + MEMORY_SUMMARIZE_EVERY):
+        return {}
+
+    overflow = messages[:-2 * MEMORY_MAX_TURNS]
+
+    prompt = (
+        f"Condense the conversation below into a brief summary (under 150 words) that keeps "
+        f"facts about the writer, their projects and any requests that are still open.\n\n"
+        f"Existing summary:\n{state.get('summary') or 'None'}\n\n"
+        f"New conversation:\n{format_memory(overflow)}\n\n"
+        f"Summary: "
+    )
+
+    try:
+        summary = (await chat_gate.acall(ainvoke_llm, llm.get(), prompt)).content[:MEMORY_SUMMARY_MAX_CHARS]
+    except OllamaUnavailable:
+        # The overflow stays in memory and is summarized on a later turn
+        return {}
+
+    memory_metrics["summarizations"] += 1
+    memory_metrics["messages_summarized"] += len(overflow)
+
+    return {"summary": summary,
+            "message_memory": [RemoveMessage(id=message.id) for message in overflow]
+            }
+
 # ==========END OF NODE DEFINITIONS==========
 
 def build_graph():
 
     build = StateGraph(GraphState)
 
-    build.add_node("route", route_node)
-    build.add_node("extract_passages", extract_passages_node)
-    build.add_node("extract_text", extract_text_node)
-    build.add_node("answer_with_context_node", answer_with_context_node)
-    build.add_node("general_chat_node", general_chat_node)
+    build.add_node("route", instrument("chat", "route", route_node))
+    build.add_node("extract_passages", instrument("chat", "extract_passages", extract_passages_node))
+    build.add_node("extract_text", instrument("chat", "extract_text", extract_text_node))
+    build.add_node("extract_all", instrument("chat", "extract_all", extract_all_node))
+    build.add_node("answer_with_context_node", instrument("chat", "answer_with_context_node", answer_with_context_node))
+    build.add_node("general_chat_node", instrument("chat", "general_chat_node", general_chat_node))
+    build.add_node("summarize_memory", instrument("chat", "summarize_memory", summarize_memory_node))
 
     build.set_entry_point("route")
 
@@ -120,17 +222,20 @@ def build_graph():
         {
             "passages":"extract_passages",
             "freewriting":"extract_text",
+            "all":"extract_all",
             "chat":"general_chat_node"
         }
     )
 
     build.add_edge("extract_passages", "answer_with_context_node")
     build.add_edge("extract_text", "answer_with_context_node")
+    build.add_edge("extract_all", "answer_with_context_node")
+    build.add_edge("general_chat_node", "summarize_memory")
 
     build.set_finish_point("answer_with_context_node")
-    build.set_finish_point("general_chat_node")
+    build.set_finish_point("summarize_memory")
 
-    return build.compile(checkpointer=MemorySaver())
+    return build.compile(checkpointer=checkpointer)
 
 # make a single graph instance (singleton) - ensure only one instance of the graph exists
 langgraph = build_graph()
\ No newline at end of file
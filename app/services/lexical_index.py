@@ -0,0 +1,92 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index over one collection.
+
+    Documents are added, replaced and removed one at a time, so the index is
+    kept up to date by the same calls that write to Chroma instead of being
+    rebuilt. Only term statistics are held here; texts stay in Chroma.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[str, int]] = {}
+        self._lengths: dict[str, int] = {}
+        # Forward index, so replacing or removing a document only touches its own postings
+        self._doc_terms: dict[str, tuple[str, ...]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @contextmanager
+    def loading(self):
+        """Hold off searches and writes while the index is being filled from the store"""
+        with self._lock:
+            yield self
+
+    def upsert(self, doc_id: str, text: str) -> None:
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            for term, count in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            length = sum(terms.values())
+            self._doc_terms[doc_id] = tuple(terms)
+            self._lengths[doc_id] = length
+            self._total_length += length
+
+    def delete(self, doc_id: str) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._doc_terms.pop(doc_id):
+            del self._postings[term][doc_id]
+            if not self._postings[term]:
+                del self._postings[term]
+
+    def search(self, query: str, k: int, allowed: set[str] | None = None) -> list[tuple[str, float]]:
+        """Top-k (doc ID, BM25 score) pairs, best first, among the `allowed` IDs if given"""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._lengths)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores: dict[str, float] = {}
+            for term in terms:
+                docs = self._postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, frequency in docs.items():
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    norm = frequency + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,263 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable
+
+# Default bucket bounds, in seconds / tokens / documents
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+DOC_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+# Rough chars-per-token, for models that don't report their own usage
+CHARS_PER_TOKEN = 4
+# Finished traces kept for /admin/traces
+MAX_TRACES = 256
+
+
+# =========PROMETHEUS METRICS=========
+# A minimal in-process registry rendered in the Prometheus text exposition format
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _le(bound: float | str) -> str:
+    return 'le="' + (bound if isinstance(bound, str) else f"{bound:g}") + '"'
+
+
+class Counter:
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Gauge:
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., sum, count]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, key, _le(bound))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, _le('+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {series[-2]:g}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+node_seconds = Histogram("walt_graph_node_seconds", "Wall time of each LangGraph node", ("graph", "node"))
+node_errors = Counter("walt_graph_node_errors_total", "Exceptions raised by LangGraph nodes", ("graph", "node", "error"))
+node_docs = Histogram("walt_graph_node_docs", "Documents retrieved by a node", ("graph", "node"), DOC_BUCKETS)
+prompt_tokens = Histogram("walt_llm_prompt_tokens", "Prompt tokens per LLM call", ("graph", "node"), TOKEN_BUCKETS)
+completion_tokens = Histogram("walt_llm_completion_tokens", "Completion tokens per LLM call", ("graph", "node"), TOKEN_BUCKETS)
+llm_seconds = Histogram("walt_llm_seconds", "Wall time of each LLM call", ("graph", "node"))
+embedding_seconds = Histogram("walt_embedding_seconds", "Wall time of embedding model calls (cache misses only)", ("call",))
+retrieval_seconds = Histogram("walt_retrieval_seconds", "Wall time of a search, embedding included", ("mode", "collection"))
+http_seconds = Histogram("walt_http_request_seconds", "Wall time of HTTP requests", ("method", "route", "status"))
+ollama_in_flight = Gauge("walt_ollama_in_flight", "Ollama calls running", ("model",))
+ollama_queue_depth = Gauge("walt_ollama_queue_depth", "Ollama calls waiting for a slot", ("model",))
+ollama_circuit_open = Gauge("walt_ollama_circuit_open", "1 while the model's circuit breaker is open", ("model",))
+ollama_rejections = Counter("walt_ollama_rejections_total", "Ollama calls rejected without being sent", ("model", "reason"))
+
+registry = [
+    node_seconds, node_errors, node_docs, prompt_tokens, completion_tokens,
+    llm_seconds, embedding_seconds, retrieval_seconds, http_seconds,
+    ollama_in_flight, ollama_queue_depth, ollama_circuit_open, ollama_rejections
+]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in registry for line in metric.render()) + "\n"
+
+
+# =========TRACES=========
+# A trace collects the spans (nodes, LLM calls, searches) of one HTTP request
+
+_current_trace: contextvars.ContextVar[dict[str, Any] | None] = contextvars.ContextVar("walt_trace", default=None)
+_current_node: contextvars.ContextVar[tuple[str, str] | None] = contextvars.ContextVar("walt_node", default=None)
+recent_traces: OrderedDict[str, dict[str, Any]] = OrderedDict()
+_traces_lock = threading.Lock()
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def start_trace(trace_id: str, method: str, path: str) -> contextvars.Token:
+    trace = {"trace_id": trace_id, "method": method, "path": path, "started_at": time.time(), "seconds": None, "spans": []}
+    with _traces_lock:
+        recent_traces[trace_id] = trace
+        while len(recent_traces) > MAX_TRACES:
+            recent_traces.popitem(last=False)
+    return _current_trace.set(trace)
+
+
+def end_trace(token: contextvars.Token, seconds: float, status: int) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["seconds"] = round(seconds, 6)
+        trace["status"] = status
+    _current_trace.reset(token)
+
+
+def get_trace(trace_id: str) -> dict[str, Any] | None:
+    with _traces_lock:
+        return recent_traces.get(trace_id)
+
+
+def _record_span(kind: str, name: str, seconds: float, **fields: Any) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["spans"].append({
+            "kind": kind,
+            "name": name,
+            "offset_s": round(time.time() - trace["started_at"] - seconds, 6),
+            "seconds": round(seconds, 6),
+            **{key: value for key, value in fields.items() if value is not None}
+        })
+
+
+@contextmanager
+def timed(histogram: Histogram, kind: str, name: str, **labels: str):
+    """Time a block into `histogram` and, inside a traced request, as a span"""
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as raised:
+        error = type(raised).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        histogram.observe(seconds, **labels)
+        _record_span(kind, name, seconds, error=error, **labels)
+
+
+# =========GRAPH NODES=========
+
+def instrument(graph: str, node: str, function: Callable) -> Callable:
+    """
+    Wrap a LangGraph node to record its wall time, errors and the number of
+    documents it returned (from a "docs" or "passages" update). LLM calls
+    made inside it are attributed to it by record_llm_call.
+    """
+    @functools.wraps(function)
+    async def wrapper(state):
+        context = _current_node.set((graph, node))
+        started = time.perf_counter()
+        error = None
+        update = None
+        try:
+            update = function(state)
+            if inspect.isawaitable(update):
+                update = await update
+            return update
+        except Exception as raised:
+            error = type(raised).__name__
+            node_errors.inc(graph=graph, node=node, error=error)
+            raise
+        finally:
+            _current_node.reset(context)
+            seconds = time.perf_counter() - started
+            node_seconds.observe(seconds, graph=graph, node=node)
+            docs = None
+            if isinstance(update, dict):
+                retrieved = update.get("docs", update.get("passages"))
+                if isinstance(retrieved, list):
+                    docs = len(retrieved)
+                    node_docs.observe(docs, graph=graph, node=node)
+            _record_span("node", f"{graph}.{node}", seconds, docs=docs, error=error)
+
+    return wrapper
+
+
+def record_llm_call(prompt: str, response: Any, seconds: float) -> None:
+    """
+    Count an LLM call's tokens against the node it ran in. Ollama reports
+    usage on the message; when it is missing, both sides are estimated.
+    """
+    graph, node = _current_node.get() or ("none", "none")
+    usage = getattr(response, "usage_metadata", None) or {}
+    content = getattr(response, "content", response)
+    prompt_count = usage.get("input_tokens") or -(-len(prompt) // CHARS_PER_TOKEN)
+    completion_count = usage.get("output_tokens") or -(-len(str(content)) // CHARS_PER_TOKEN)
+    prompt_tokens.observe(prompt_count, graph=graph, node=node)
+    completion_tokens.observe(completion_count, graph=graph, node=node)
+    llm_seconds.observe(seconds, graph=graph, node=node)
+    _record_span("llm", f"{graph}.{node}", seconds, prompt_tokens=prompt_count, completion_tokens=completion_count)
+
+
+async def ainvoke_llm(model: Any, prompt: str) -> Any:
+    """model.ainvoke(prompt), recorded by record_llm_call"""
+    started = time.perf_counter()
+    response = await model.ainvoke(prompt)
+    record_llm_call(prompt, response, time.perf_counter() - started)
+    return response
@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Any, Callable
+
+
+class LazyModel:
+    """
+    Holder for a model or model client that is only built on first use.
+
+    Callers fetch the real object with `get()` at the point of use. (It is
+    deliberately not a transparent proxy: LangGraph inspects node closures
+    with getattr, which would otherwise load every model at import time.)
+    `warm` optionally exercises the model (e.g. one tiny inference) so the
+    first real request doesn't pay for weight loading.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], warm: Callable[[Any], Any] | None = None):
+        self.name = name
+        self._factory = factory
+        self._warm = warm
+        self._instance = None
+        self._lock = threading.Lock()
+        self.load_seconds: float | None = None
+        self.warm_seconds: float | None = None
+        self.error: str | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> Any:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    try:
+                        self._instance = self._factory()
+                    except Exception as error:
+                        self.error = str(error)
+                        raise
+                    self.load_seconds = time.perf_counter() - started
+                    self.error = None
+        return self._instance
+
+    def warmup(self) -> None:
+        instance = self.get()
+        if self._warm is not None:
+            started = time.perf_counter()
+            self._warm(instance)
+            self.warm_seconds = time.perf_counter() - started
+
+    def reset(self) -> None:
+        """Drop the instance so the next get() builds a fresh one"""
+        with self._lock:
+            self._instance = None
+
+    def override(self, instance: Any) -> None:
+        """Swap in a ready-made instance (used by benchmarks to plug in fakes)"""
+        with self._lock:
+            self._instance = instance
+            self.load_seconds = 0.0
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "warm_seconds": round(self.warm_seconds, 3) if self.warm_seconds is not None else None,
+            "error": self.error
+        }
+
+
+models: dict[str, LazyModel] = {}
+
+
+def lazy_model(name: str, factory: Callable[[], Any], warm: Callable[[Any], Any] | None = None) -> LazyModel:
+    """Register a lazily-built model; registering an existing name returns the existing entry"""
+    if name not in models:
+        models[name] = LazyModel(name, factory, warm)
+    return models[name]
+
+
+def warmup(names: list[str] | None = None) -> dict[str, dict[str, Any]]:
+    """Load (and warm) the named models, or all of them; failures are recorded, not raised"""
+    for name in names if names is not None else list(models):
+        if name not in models:
+            continue
+        try:
+            models[name].warmup()
+        except Exception as error:
+            models[name].error = str(error)
+    return readiness()
+
+
+def readiness() -> dict[str, dict[str, Any]]:
+    return {name: model.info() for name, model in models.items()}
@@ -0,0 +1,264 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from app.services.model_registry import lazy_model
+
+NER_MODEL = "dslim/bert-base-NER"
+# BERT sees at most 512 tokens, two of which are [CLS] and [SEP]
+NER_MAX_TOKENS = 510
+# Consecutive windows overlap so entities on a boundary are seen whole at least once
+NER_STRIDE_TOKENS = 64
+# Requests arriving within this window share one forward pass
+NER_BATCH_WINDOW_MS = 5
+NER_MAX_BATCH = 32
+# Worker processes running the model; 0 runs it on a single in-process thread instead
+NER_WORKERS = int(os.getenv("WALT_NER_WORKERS", "1"))
+
+
+# =========WORKER SIDE=========
+
+_worker_pipeline = None
+
+
+def load_ner_pipeline():
+    # transformers (and torch) are imported here so processes that never run NER don't pay for them
+    from transformers import pipeline
+
+    # Use aggregation_strategy instead of grouped_entities
+    return pipeline("ner", model=NER_MODEL, aggregation_strategy="simple")
+
+
+def _init_worker() -> None:
+    global _worker_pipeline
+    _worker_pipeline = load_ner_pipeline()
+
+
+def _run_batch(segments: list[str]) -> list[list[dict[str, Any]]]:
+    """One batched forward pass over several segments (runs inside a worker)"""
+    results = _worker_pipeline(segments, batch_size=len(segments))
+    # A single input comes back unwrapped
+    if segments and results and isinstance(results[0], dict):
+        results = [results]
+    return [
+        [
+            {
+                "entity_group": entity.get("entity_group", ""),
+                "start": int(entity["start"]),
+                "end": int(entity["end"]),
+                "score": float(entity.get("score", 0.0))
+            }
+            for entity in entities
+        ]
+        for entities in results
+    ]
+
+
+def _build_pool() -> Executor:
+    if NER_WORKERS <= 0:
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="ner", initializer=_init_worker)
+    # spawn, not fork: forking a process that already imported torch/tokenizers can deadlock
+    return ProcessPoolExecutor(
+        max_workers=NER_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    )
+
+
+def _warm_pool(pool: Executor) -> None:
+    # One tiny batch per worker forces each of them to load the model
+    futures = [pool.submit(_run_batch, ["Walt Whitman"]) for _ in range(max(NER_WORKERS, 1))]
+    for future in futures:
+        future.result()
+
+
+ner_pool = lazy_model("ner", _build_pool, warm=_warm_pool)
+ner_tokenizer = lazy_model("ner_tokenizer", lambda: _load_tokenizer())
+
+
+def _load_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(NER_MODEL)
+
+
+# =========SEGMENTATION=========
+
+def segment_text(text: str) -> list[tuple[int, str]]:
+    """
+    Split text into windows of at most NER_MAX_TOKENS tokens, overlapping by
+    NER_STRIDE_TOKENS. Returns (character offset, segment text) pairs so
+    entity offsets can be mapped back onto the original text.
+    """
+    offsets = ner_tokenizer.get()(text, return_offsets_mapping=True, add_special_tokens=False)["offset_mapping"]
+    if not offsets:
+        return []
+
+    segments = []
+    start = 0
+    while True:
+        end = min(start + NER_MAX_TOKENS, len(offsets))
+        # Don't cut a word into pieces: back off while the next token continues the current word
+        while start + 1 < end < len(offsets) and offsets[end][0] == offsets[end - 1][1]:
+            end -= 1
+
+        char_start, char_end = offsets[start][0], offsets[end - 1][1]
+        segments.append((char_start, text[char_start:char_end]))
+
+        if end >= len(offsets):
+            return segments
+        start = max(end - NER_STRIDE_TOKENS, start + 1)
+
+
+# =========MICRO-BATCHING=========
+
+class NERBatcher:
+    """Collects segments for a few milliseconds and sends them to the pool as one batch"""
+
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.stats = {"segments": 0, "batches": 0}
+
+    async def submit(self, segment: str) -> list[dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A loop that closed mid-window leaves a timer that will never fire; start over on this one
+            self._loop, self._timer, self._pending = loop, None, []
+        future = loop.create_future()
+        self._pending.append((segment, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        self.stats["segments"] += len(batch)
+        self.stats["batches"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            pool = await asyncio.to_thread(ner_pool.get)
+            results = await loop.run_in_executor(pool, _run_batch, [segment for segment, _ in batch])
+        except Exception as error:
+            if isinstance(error, BrokenExecutor):
+                # A worker died (e.g. out of memory); start a fresh pool for the next batch
+                ner_pool.reset()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+ner_batcher = NERBatcher(NER_BATCH_WINDOW_MS, NER_MAX_BATCH)
+
+
+# =========ENTITY EXTRACTION=========
+
+def _merge_segments(text: str, segments: list[tuple[int, str]], results: list[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    """Map per-segment entities back onto the full text, dropping duplicates from window overlaps"""
+    seen = set()
+    merged = []
+    for (offset, _), entities in zip(segments, results):
+        for entity in entities:
+            start, end = entity["start"] + offset, entity["end"] + offset
+            if (start, end) in seen:
+                continue
+            seen.add((start, end))
+            merged.append({**entity, "start": start, "end": end, "word": text[start:end]})
+    merged.sort(key=lambda entity: entity["start"])
+    return merged
+
+
+def group_entities(entities_list: list[dict[str, Any]]) -> dict:
+    """Bucket raw NER output into the PERSON/ORG/LOC/DATE/OTHER shape the API returns"""
+
+    entities = {
+        "PERSON": [],
+        "ORG": [],
+        "LOC": [],
+        "DATE": [],
+        "OTHER": []
+    }
+
+    for entity in entities_list:
+        entity_type = entity.get("entity_group", "")
+        entity_text = entity.get("word", "")
+
+        if entity_type in ["PER", "PERSON"]:
+            entities["PERSON"].append(entity_text)
+        elif entity_type in ["ORG", "ORGANIZATION"]:
+            entities["ORG"].append(entity_text)
+        elif entity_type in ["LOC", "LOCATION"]:
+            entities["LOC"].append(entity_text)
+        elif entity_type in ["DATE"]:
+            entities["DATE"].append(entity_text)
+        else:
+            entities["OTHER"].append(f"{entity_text} ({entity_type})")
+
+    # Remove duplicates while preserving order
+    for key in entities:
+        entities[key] = list(dict.fromkeys(entities[key]))
+
+    return entities
+
+
+def extract_entities(text: str) -> dict:
+    """Extract named entities from the whole text (blocking; for sync callers)"""
+    segments = segment_text(text)
+    if not segments:
+        return group_entities([])
+    try:
+        results = ner_pool.get().submit(_run_batch, [segment for _, segment in segments]).result()
+    except BrokenExecutor:
+        ner_pool.reset()
+        raise
+    return group_entities(_merge_segments(text, segments, results))
+
+
+def extract_entities_many(texts: list[str]) -> list[dict]:
+    """Extract entities from several texts, sending their segments to the pool in shared batches"""
+    segmented = [segment_text(text) for text in texts]
+    flat = [segment for segments in segmented for _, segment in segments]
+    pool = ner_pool.get()
+    try:
+        futures = [
+            pool.submit(_run_batch, flat[start:start + NER_MAX_BATCH])
+            for start in range(0, len(flat), NER_MAX_BATCH)
+        ]
+        results = [result for future in futures for result in future.result()]
+    except BrokenExecutor:
+        ner_pool.reset()
+        raise
+
+    grouped = []
+    position = 0
+    for text, segments in zip(texts, segmented):
+        grouped.append(group_entities(_merge_segments(text, segments, results[position:position + len(segments)])))
+        position += len(segments)
+    return grouped
+
+
+async def aextract_entities(text: str) -> dict:
+    """Extract named entities from the whole text, sharing forward passes with concurrent requests"""
+    segments = await asyncio.to_thread(segment_text, text)
+    results = await asyncio.gather(*(ner_batcher.submit(segment) for _, segment in segments))
+    return group_entities(_merge_segments(text, segments, list(results)))
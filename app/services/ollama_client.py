@@ -0,0 +1,321 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+import httpx
+from langchain_ollama import ChatOllama, OllamaEmbeddings
+
+from app.services.metrics_service import ollama_circuit_open, ollama_in_flight, ollama_queue_depth, ollama_rejections
+
+# Unset uses the Ollama client's default (localhost:11434)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL") or None
+# Per HTTP call to Ollama, once admitted
+OLLAMA_TIMEOUT_SECONDS = float(os.getenv("WALT_OLLAMA_TIMEOUT_SECONDS", "120"))
+# Calls in flight per model; Ollama itself serves OLLAMA_NUM_PARALLEL at a time
+CHAT_CONCURRENCY = int(os.getenv("WALT_OLLAMA_CHAT_CONCURRENCY", "2"))
+EMBEDDING_CONCURRENCY = int(os.getenv("WALT_OLLAMA_EMBEDDING_CONCURRENCY", "4"))
+# Calls allowed to wait for a slot per model, and how long each may wait, before being rejected
+MAX_QUEUE = int(os.getenv("WALT_OLLAMA_MAX_QUEUE", "32"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("WALT_OLLAMA_QUEUE_TIMEOUT_SECONDS", "30"))
+# Consecutive failures that open a model's circuit, and how long it stays open before a probe call
+BREAKER_FAILURES = int(os.getenv("WALT_OLLAMA_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("WALT_OLLAMA_BREAKER_RESET_SECONDS", "30"))
+# Answer RAG queries with the retrieved passages when the chat model is unavailable (0 = fail with 503)
+RETRIEVAL_FALLBACK = os.getenv("WALT_OLLAMA_FALLBACK", "1") == "1"
+
+
+class OllamaUnavailable(Exception):
+    """
+    A model call was rejected (queue full, queue deadline passed, circuit open)
+    or failed; the original error of a failed call is chained as __cause__
+    """
+
+    def __init__(self, model: str, reason: str, retry_after: float | None = None):
+        super().__init__(f"Model {model} is unavailable ({reason})")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted", "probe")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False
+        # The one call let through to test a half-open circuit
+        self.probe = False
+
+
+class ModelGate:
+    """
+    Admission control for one Ollama model, shared by sync and async callers.
+
+    At most `max_concurrency` calls run at once; up to `max_queue` more wait
+    in FIFO order for at most `queue_timeout` seconds, and anything beyond
+    that is rejected at once rather than slowing every request down. A
+    circuit breaker opens after `breaker_failures` consecutive failed calls
+    and rejects calls without queueing them until `breaker_reset` seconds
+    have passed; then a single probe call decides whether it closes again.
+    """
+
+    def __init__(
+            self,
+            model: str,
+            max_concurrency: int,
+            max_queue: int = MAX_QUEUE,
+            queue_timeout: float = QUEUE_TIMEOUT_SECONDS,
+            breaker_failures: int = BREAKER_FAILURES,
+            breaker_reset: float = BREAKER_RESET_SECONDS
+    ):
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: deque[_Waiter] = deque()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+            "rejected_circuit_open": 0,
+            "max_queue_depth": 0,
+            "circuit_opened": 0
+        }
+
+    # =========CIRCUIT BREAKER=========
+
+    def _circuit_state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.breaker_reset:
+            return "open"
+        return "half_open"
+
+    def _check_circuit(self) -> bool:
+        """Under the lock: reject while open; once half open, let exactly one probe through (True)"""
+        state = self._circuit_state()
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        retry_after = self.breaker_reset - (time.monotonic() - self._opened_at) if state == "open" else self.breaker_reset
+        self._reject("circuit_open", max(0.0, retry_after))
+
+    def _record(self, succeeded: bool, probe: bool) -> None:
+        with self._lock:
+            if probe:
+                self._probing = False
+            if succeeded:
+                self.stats["succeeded"] += 1
+                self._failures = 0
+                self._opened_at = None
+            else:
+                self.stats["failed"] += 1
+                self._failures += 1
+                # A failed probe re-opens the circuit for another full reset period
+                if self._failures >= self.breaker_failures or self._opened_at is not None:
+                    if self._opened_at is None:
+                        self.stats["circuit_opened"] += 1
+                    self._opened_at = time.monotonic()
+            ollama_circuit_open.set(0 if self._opened_at is None else 1, model=self.model)
+
+    # =========ADMISSION=========
+
+    def _reject(self, reason: str, retry_after: float | None = None):
+        self.stats[f"rejected_{reason}"] += 1
+        ollama_rejections.inc(model=self.model, reason=reason)
+        raise OllamaUnavailable(self.model, reason, retry_after)
+
+    def _publish(self) -> None:
+        ollama_in_flight.set(self._in_flight, model=self.model)
+        ollama_queue_depth.set(len(self._waiters), model=self.model)
+
+    def _enter(self, waiter: _Waiter) -> bool:
+        """Under the lock: take a free slot (True) or join the queue (False)"""
+        waiter.probe = self._check_circuit()
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            self.stats["admitted"] += 1
+            self._publish()
+            return True
+        if len(self._waiters) >= self.max_queue:
+            if waiter.probe:
+                self._probing = False
+            self._reject("queue_full", self.queue_timeout)
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiters))
+        self._publish()
+        return False
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """Under the lock, after a wait ended: True if the slot was handed over meanwhile"""
+        if waiter.granted:
+            return True
+        self._waiters.remove(waiter)
+        if waiter.probe:
+            self._probing = False
+        self._publish()
+        return False
+
+    def _release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter, so in_flight stays the same
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                self.stats["admitted"] += 1
+            else:
+                waiter = None
+                self._in_flight -= 1
+            self._publish()
+        if waiter is not None:
+            waiter.wake()
+
+    def _acquire(self) -> bool:
+        """Wait for a slot; True when the call is the half-open probe"""
+        event = threading.Event()
+        waiter = _Waiter(event.set)
+        with self._lock:
+            if self._enter(waiter):
+                return waiter.probe
+        event.wait(self.queue_timeout)
+        with self._lock:
+            if not self._give_up(waiter):
+                self._reject("deadline", self.queue_timeout)
+        return waiter.probe
+
+    async def _aacquire(self) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant(future: asyncio.Future = future) -> None:
+            if not future.done():
+                future.set_result(None)
+
+        waiter = _Waiter(lambda: loop.call_soon_threadsafe(grant))
+        with self._lock:
+            if self._enter(waiter):
+                return waiter.probe
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as stopped:
+            with self._lock:
+                granted = self._give_up(waiter)
+                if not granted and isinstance(stopped, asyncio.TimeoutError):
+                    self._reject("deadline", self.queue_timeout)
+            if granted:
+                # The slot arrived as we stopped waiting; pass it on
+                self._release()
+                if waiter.probe:
+                    self._record_cancelled()
+            raise
+        return waiter.probe
+
+    def _record_cancelled(self) -> None:
+        # The caller went away; that says nothing about the backend, but the probe must be freed
+        with self._lock:
+            self._probing = False
+
+    # =========CALLS=========
+
+    def call(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking model call once admitted"""
+        probe = self._acquire()
+        try:
+            result = function(*args)
+        except Exception as error:
+            self._record(False, probe)
+            raise OllamaUnavailable(self.model, f"call failed: {type(error).__name__}: {error}") from error
+        finally:
+            self._release()
+        self._record(True, probe)
+        return result
+
+    async def acall(self, function: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Await a model call once admitted"""
+        probe = await self._aacquire()
+        try:
+            result = await function(*args)
+        except Exception as error:
+            self._record(False, probe)
+            raise OllamaUnavailable(self.model, f"call failed: {type(error).__name__}: {error}") from error
+        except asyncio.CancelledError:
+            if probe:
+                self._record_cancelled()
+            raise
+        finally:
+            self._release()
+        self._record(True, probe)
+        return result
+
+    def info(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "queue_timeout_s": self.queue_timeout,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiters),
+                "circuit": self._circuit_state(),
+                "consecutive_failures": self._failures,
+                **self.stats
+            }
+
+
+# =========SHARED CLIENTS=========
+
+gates: dict[str, ModelGate] = {}
+
+
+def model_gate(model: str, max_concurrency: int) -> ModelGate:
+    """The gate of one model; asking again for the same model returns the same gate"""
+    if model not in gates:
+        gates[model] = ModelGate(model, max_concurrency)
+    return gates[model]
+
+
+def _client_kwargs(model: str, max_concurrency: int) -> dict[str, Any]:
+    # One keep-alive pool per model client, sized to its gate; warmup calls bypass the gate and may wait here
+    gate = model_gate(model, max_concurrency)
+    return {
+        "timeout": httpx.Timeout(OLLAMA_TIMEOUT_SECONDS, connect=5.0),
+        "limits": httpx.Limits(max_connections=gate.max_concurrency + 1, max_keepalive_connections=gate.max_concurrency + 1)
+    }
+
+
+def chat_ollama(model: str, **kwargs: Any) -> ChatOllama:
+    return ChatOllama(model=model, base_url=OLLAMA_BASE_URL, client_kwargs=_client_kwargs(model, CHAT_CONCURRENCY), **kwargs)
+
+
+def ollama_embeddings(model: str) -> OllamaEmbeddings:
+    return OllamaEmbeddings(model=model, base_url=OLLAMA_BASE_URL, client_kwargs=_client_kwargs(model, EMBEDDING_CONCURRENCY))
+
+
+def ollama_info() -> dict[str, Any]:
+    return {
+        "base_url": OLLAMA_BASE_URL,
+        "retrieval_fallback": RETRIEVAL_FALLBACK,
+        "models": {model: gate.info() for model, gate in gates.items()}
+    }
+
+
+def retrieval_only_answer(context: str) -> str:
+    """What a RAG node answers when RETRIEVAL_FALLBACK is on and the chat model is unavailable"""
+    if not context:
+        return "The language model is unavailable right now, and nothing relevant was retrieved for your query."
+    return f"The language model is unavailable right now, so here is what I found for your query:\n\n{context}"
@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, Iterable
+
+from app.models.passage_model import PassageModel
+from app.services.vectordb_service import (
+    EMBEDDING, atag_entities, delete_embedded, get_vector_store, upsert_embedded
+)
+
+# Journal passages are searched by the chat graph's "passages" route
+PASSAGE_COLLECTION = "passages"
+PASSAGE_SOURCE = "journal_passage"
+# Edits to the same passage within this window collapse into a single write
+SYNC_DEBOUNCE_SECONDS = 0.5
+SYNC_BATCH_SIZE = 64
+# A failed batch is retried after this delay, doubling on each failure in a row up to the cap
+SYNC_RETRY_SECONDS = 1.0
+SYNC_RETRY_MAX_SECONDS = 60.0
+
+
+def passage_doc_id(passage_id: int) -> str:
+    return f"passage_{passage_id}"
+
+
+def passage_text(passage: PassageModel) -> str:
+    return f"{passage.title}\n\n{passage.content}" if passage.title else passage.content
+
+
+def passage_hash(passage: PassageModel) -> str:
+    """Hash of everything that ends up in the vector entry, to detect stale or unchanged documents"""
+    raw = "\0".join([passage_text(passage), str(passage.journal_id), passage.created_at.isoformat()])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def passage_metadata(passage_id: int, passage: PassageModel) -> dict[str, Any]:
+    return {
+        "passage_id": passage_id,
+        "journal_id": passage.journal_id,
+        "title": passage.title or "",
+        "created_at": passage.created_at.isoformat(),
+        "created_at_ts": passage.created_at.timestamp(),
+        "content_hash": passage_hash(passage),
+        "source": PASSAGE_SOURCE
+    }
+
+
+class PassageSyncQueue:
+    """
+    Background queue that keeps the passages collection in step with the passage store.
+
+    Writes only record the latest state of a passage (None = deleted) and
+    return immediately; a worker task picks the pending changes up after a
+    short debounce, skips passages whose content hash is already stored,
+    and embeds the rest in batches. Changes from a failed batch stay
+    pending and are retried with exponential backoff.
+    """
+
+    def __init__(
+            self,
+            collection: str,
+            debounce_seconds: float,
+            batch_size: int,
+            retry_seconds: float = SYNC_RETRY_SECONDS,
+            retry_max_seconds: float = SYNC_RETRY_MAX_SECONDS
+    ):
+        self.collection = collection
+        self.debounce = debounce_seconds
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._pending: dict[int, PassageModel | None] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._sync_lock: asyncio.Lock | None = None
+        self._worker: asyncio.Task | None = None
+        self._retry: asyncio.TimerHandle | None = None
+        # Flushes in a row that had a failed batch
+        self._failed_rounds = 0
+        self.stats = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "upserted": 0,
+            "deleted": 0,
+            "unchanged": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "retries_scheduled": 0
+        }
+        self.last_error: str | None = None
+        self.last_sync_at: float | None = None
+
+    # =========PRODUCER SIDE=========
+
+    def enqueue_upsert(self, passage_id: int, passage: PassageModel) -> None:
+        self._enqueue(passage_id, passage.model_copy())
+
+    def enqueue_delete(self, passage_id: int) -> None:
+        self._enqueue(passage_id, None)
+
+    def _enqueue(self, passage_id: int, passage: PassageModel | None) -> None:
+        if passage_id in self._pending:
+            self.stats["coalesced"] += 1
+        self._pending[passage_id] = passage
+        self.stats["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # =========WORKER=========
+
+    def start(self) -> None:
+        """Start the worker on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._sync_lock = asyncio.Lock()
+        self._worker = asyncio.create_task(self._run())
+        if self._pending:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Give rapid successive edits a chance to coalesce
+            await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> dict[str, int]:
+        """Write every pending change now"""
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            pending, self._pending = self._pending, {}
+            upserts = {passage_id: passage for passage_id, passage in pending.items() if passage is not None}
+            deletes = [passage_id for passage_id, passage in pending.items() if passage is None]
+            written = {"upserted": 0, "deleted": 0, "unchanged": 0}
+            failed_batches = self.stats["failed_batches"]
+
+            if deletes:
+                try:
+                    await asyncio.to_thread(delete_embedded, self.collection, [passage_doc_id(passage_id) for passage_id in deletes])
+                    written["deleted"] += len(deletes)
+                except Exception as error:
+                    self._failed(error, {passage_id: None for passage_id in deletes})
+
+            items = list(upserts.items())
+            for start in range(0, len(items), self.batch_size):
+                batch = dict(items[start:start + self.batch_size])
+                try:
+                    upserted, unchanged = await self._upsert_batch(batch)
+                    written["upserted"] += upserted
+                    written["unchanged"] += unchanged
+                except Exception as error:
+                    self._failed(error, batch)
+
+            for key, value in written.items():
+                self.stats[key] += value
+            self.last_sync_at = time.time()
+            if self.stats["failed_batches"] > failed_batches:
+                self._schedule_retry()
+            else:
+                self._failed_rounds = 0
+            return written
+
+    def _schedule_retry(self) -> None:
+        """Wake the worker again after a backoff, so failed changes don't wait for the next edit"""
+        self._failed_rounds += 1
+        if self._wakeup is None:
+            return
+        delay = min(self.retry_seconds * 2 ** (self._failed_rounds - 1), self.retry_max_seconds)
+        if self._retry is not None:
+            self._retry.cancel()
+        self._retry = asyncio.get_running_loop().call_later(delay, self._wakeup.set)
+        self.stats["retries_scheduled"] += 1
+
+    async def _upsert_batch(self, batch: dict[int, PassageModel]) -> tuple[int, int]:
+        doc_ids = {passage_id: passage_doc_id(passage_id) for passage_id in batch}
+        stored = await asyncio.to_thread(self._stored_hashes, list(doc_ids.values()))
+        changed = {
+            passage_id: passage for passage_id, passage in batch.items()
+            if stored.get(doc_ids[passage_id]) != passage_hash(passage)
+        }
+        if not changed:
+            return 0, len(batch)
+
+        records = [
+            {"id": doc_ids[passage_id], "text": passage_text(passage), "metadata": passage_metadata(passage_id, passage)}
+            for passage_id, passage in changed.items()
+        ]
+        texts = [record["text"] for record in records]
+        records, embeddings = await asyncio.gather(atag_entities(records), EMBEDDING.aembed_documents(texts))
+        await asyncio.to_thread(
+            upsert_embedded,
+            self.collection,
+            [record["id"] for record in records],
+            texts,
+            embeddings,
+            [record["metadata"] for record in records]
+        )
+        self.stats["batches"] += 1
+        return len(changed), len(batch) - len(changed)
+
+    def _failed(self, error: Exception, changes: dict[int, PassageModel | None]) -> None:
+        self.stats["failed_batches"] += 1
+        self.last_error = str(error)
+        # Retried after a backoff (see _schedule_retry), unless the passage was edited again meanwhile
+        for passage_id, passage in changes.items():
+            self._pending.setdefault(passage_id, passage)
+
+    def _stored_hashes(self, doc_ids: list[str] | None = None) -> dict[str, str]:
+        if doc_ids is None:
+            found = get_vector_store(self.collection).get(where={"source": PASSAGE_SOURCE}, include=("metadatas",))
+        else:
+            found = get_vector_store(self.collection).get(ids=doc_ids, include=("metadatas",))
+        return {
+            doc_id: (metadata or {}).get("content_hash")
+            for doc_id, metadata in zip(found["ids"], found["metadatas"])
+        }
+
+    # =========RECONCILE=========
+
+    async def reconcile(self, source: Iterable[PassageModel]) -> dict[str, int]:
+        """
+        Diff the collection against the passage store by content hash and queue
+        whatever is missing, stale or orphaned, then write it.
+        """
+        stored = await asyncio.to_thread(self._stored_hashes)
+        # The source may be a lazy read of the whole store, so walk it off the event loop
+        missing, stale, orphaned = await asyncio.to_thread(self._diff, source, stored)
+
+        for passage in missing + stale:
+            self.enqueue_upsert(passage.id, passage)
+        for passage_id in orphaned:
+            self.enqueue_delete(passage_id)
+
+        written = await self.flush()
+        return {"missing": len(missing), "stale": len(stale), "orphaned": len(orphaned), **written}
+
+    @staticmethod
+    def _diff(source: Iterable[PassageModel], stored: dict[str, str]) -> tuple[list, list, list[int]]:
+        missing, stale = [], []
+        seen = set()
+        for passage in source:
+            doc_id = passage_doc_id(passage.id)
+            seen.add(doc_id)
+            if doc_id not in stored:
+                missing.append(passage)
+            elif stored[doc_id] != passage_hash(passage):
+                stale.append(passage)
+        orphaned = [int(doc_id.removeprefix("passage_")) for doc_id in stored if doc_id not in seen]
+        return missing, stale, orphaned
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "collection": self.collection,
+            "pending": len(self._pending),
+            "running": self._worker is not None and not self._worker.done(),
+            "last_sync_at": self.last_sync_at,
+            "last_error": self.last_error,
+            "failed_rounds": self._failed_rounds,
+            **self.stats
+        }
+
+
+passage_sync = PassageSyncQueue(PASSAGE_COLLECTION, SYNC_DEBOUNCE_SECONDS, SYNC_BATCH_SIZE)
@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable
+
+# Off unless enabled: a request is profiled only when this is on and it sends "X-Profile: 1"
+PROFILING_ENABLED = os.getenv("WALT_PROFILING", "0") == "1"
+PROFILE_INTERVAL_SECONDS = float(os.getenv("WALT_PROFILE_INTERVAL_MS", "5")) / 1000
+# Finished profiles kept for /admin/profiles
+MAX_PROFILES = 32
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for one request at a time.
+
+    A background thread snapshots every thread's stack each interval and
+    counts identical stacks, so the cost to the profiled request is a few
+    microseconds per sample. Profiles are kept as collapsed stacks
+    ("thread;outer;...;inner count" lines), the input format of
+    flamegraph.pl and speedscope. Executor and worker threads are included,
+    which covers Chroma and embedding calls run off the event loop.
+    """
+
+    def __init__(self, interval: float, max_profiles: int):
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self.profiles: OrderedDict[str, dict] = OrderedDict()
+        # One profile at a time keeps the overhead bounded and the samples attributable
+        self._busy = threading.Lock()
+
+    @contextmanager
+    def profile(self, profile_id: str):
+        stop = self.start(profile_id)
+        try:
+            yield stop is not None
+        finally:
+            if stop is not None:
+                stop()
+
+    def start(self, profile_id: str) -> Callable[[], None] | None:
+        """
+        Start sampling and return the function that stops it and keeps the
+        profile (safe to call more than once), or None while another
+        profile is running.
+        """
+        if not self._busy.acquire(blocking=False):
+            return None
+        stacks: Counter[str] = Counter()
+        finished = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(stacks, finished), name="walt-profiler", daemon=True)
+        started = time.perf_counter()
+        sampler.start()
+        stopping = threading.Lock()
+
+        def stop() -> None:
+            with stopping:
+                if finished.is_set():
+                    return
+                finished.set()
+            sampler.join()
+            self._busy.release()
+            self._keep(profile_id, {
+                "profile_id": profile_id,
+                "seconds": round(time.perf_counter() - started, 6),
+                "interval_s": self.interval,
+                "samples": sum(stacks.values()),
+                "stacks": stacks
+            })
+
+        return stop
+
+    def _sample(self, stacks: Counter, stop: threading.Event) -> None:
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks[";".join([names.get(ident, str(ident)), *reversed(frames)])] += 1
+
+    def _keep(self, profile_id: str, profile: dict) -> None:
+        self.profiles[profile_id] = profile
+        while len(self.profiles) > self.max_profiles:
+            self.profiles.popitem(last=False)
+
+    def collapsed(self, profile_id: str) -> str | None:
+        profile = self.profiles.get(profile_id)
+        if profile is None:
+            return None
+        return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+    def summary(self, profile_id: str, top: int = 25) -> dict | None:
+        """Sample counts per innermost frame, the quickest look at where the time went"""
+        profile = self.profiles.get(profile_id)
+        if profile is None:
+            return None
+        leaves: Counter[str] = Counter()
+        for stack, count in profile["stacks"].items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            **{key: value for key, value in profile.items() if key != "stacks"},
+            "top_frames": [{"frame": frame, "samples": count} for frame, count in leaves.most_common(top)]
+        }
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_SECONDS, MAX_PROFILES)
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import threading
+from typing import Any
+
+import numpy as np
+
+from app.services.model_registry import lazy_model
+from app.services.vectordb_service import EMBEDDING
+
+# Example queries for each route; a query goes to the route of its most similar example
+ROUTE_PROTOTYPES = {
+    "passages": [
+        "What did I write in my journal about my dreams?",
+        "Find the journal entry where I talked about school",
+        "Show me passages from my dream journal",
+        "What have I written in my archives about fear?",
+        "Which of my journal passages mention birds?",
+        "Look through my past entries for anything about therapy",
+        "What was on my TODO list?",
+    ],
+    "freewriting": [
+        "What themes come up in my freewriting?",
+        "Summarize what I wrote in my free writing session",
+        "Find the part of my freewrite about the ocean",
+        "What characters appear in my freewriting?",
+        "In my raw writing, where did I describe the city?",
+        "What did I free write about yesterday?",
+    ],
+    "all": [
+        "Across everything I've written, what do I say about dreams?",
+        "Search both my journal and my freewriting for my mother",
+        "Compare my journal entries with my freewriting about school",
+        "Everywhere I have written about birds",
+        "In all of my writing, what themes keep coming back?",
+    ],
+    "chat": [
+        "How do I write a better opening line?",
+        "Give me advice on overcoming writer's block",
+        "What is a good structure for a short story?",
+        "Tell me about the history of the sonnet",
+        "Hello, how are you today?",
+        "What makes dialogue feel natural?",
+        "Can you explain what a metaphor is?",
+    ],
+}
+
+# Below this cosine similarity (or this margin over the runner-up route) the keyword rules decide instead
+ROUTER_MIN_SIMILARITY = float(os.getenv("WALT_ROUTER_MIN_SIMILARITY", "0.6"))
+ROUTER_MIN_MARGIN = float(os.getenv("WALT_ROUTER_MIN_MARGIN", "0.02"))
+
+ROUTE_KEYWORDS = {
+    "passages": ["passage", "passages", "archive", "archives", "history"],
+    "freewriting": ["freewrite", "freewriting", "free writing", "free write", "free writings"],
+}
+
+
+def keyword_route(query: str) -> str:
+    """The original substring rules - free, but easily fooled"""
+    query = query.lower()
+    matched = [route for route, words in ROUTE_KEYWORDS.items() if any(word in query for word in words)]
+    if len(matched) > 1:
+        return "all"
+    return matched[0] if matched else "chat"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _build_prototypes() -> dict[str, Any]:
+    labels = [route for route, examples in ROUTE_PROTOTYPES.items() for _ in examples]
+    examples = [example for route_examples in ROUTE_PROTOTYPES.values() for example in route_examples]
+    # Goes through the embedding cache, so restarts reuse the stored vectors
+    matrix = _normalize(np.asarray(EMBEDDING.embed_documents(examples), dtype=np.float32))
+    return {"labels": labels, "matrix": matrix}
+
+
+# Prototype vectors are computed once (at startup warmup, or on first use)
+route_prototypes = lazy_model("route_prototypes", _build_prototypes)
+
+
+class QueryRouter:
+    """
+    Routes a query by cosine similarity to the route prototypes.
+
+    The query embedding is the one retrieval needs anyway, so for retrieval
+    routes this costs a cached lookup. Low-confidence decisions, or any
+    failure to embed, fall back to the keyword rules.
+    """
+
+    def __init__(self, min_similarity: float, min_margin: float):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._lock = threading.Lock()
+        self.stats: dict[str, Any] = {
+            "routed": {route: 0 for route in ROUTE_PROTOTYPES},
+            "embedding_decisions": 0,
+            "low_confidence_fallbacks": 0,
+            "error_fallbacks": 0,
+            # A retrieval route that found nothing wasted a retrieval (and usually a long generation)
+            "empty_retrievals": {route: 0 for route in ROUTE_PROTOTYPES if route != "chat"},
+            # Reported through feedback: "<predicted>-><expected>" counts
+            "misroutes": {}
+        }
+
+    async def route(self, query: str, record: bool = True) -> dict[str, Any]:
+        try:
+            prototypes = await asyncio.to_thread(route_prototypes.get)
+            query_vector = _normalize(np.asarray(await EMBEDDING.aembed_query(query), dtype=np.float32))
+        except Exception:
+            return self._decided(keyword_route(query), None, "keyword_error_fallback", record)
+
+        similarities = prototypes["matrix"] @ query_vector
+        best: dict[str, float] = {}
+        for label, similarity in zip(prototypes["labels"], similarities.tolist()):
+            best[label] = max(best.get(label, -1.0), similarity)
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        route, confidence = ranked[0]
+        margin = confidence - ranked[1][1] if len(ranked) > 1 else confidence
+        if confidence < self.min_similarity or margin < self.min_margin:
+            return self._decided(keyword_route(query), confidence, "keyword_low_confidence", record)
+        return self._decided(route, confidence, "embedding", record)
+
+    def _decided(self, route: str, confidence: float | None, method: str, record: bool) -> dict[str, Any]:
+        if not record:
+            return {"route": route, "confidence": confidence, "method": method}
+        with self._lock:
+            self.stats["routed"][route] += 1
+            if method == "embedding":
+                self.stats["embedding_decisions"] += 1
+            elif method == "keyword_low_confidence":
+                self.stats["low_confidence_fallbacks"] += 1
+            else:
+                self.stats["error_fallbacks"] += 1
+        return {"route": route, "confidence": confidence, "method": method}
+
+    def record_empty_retrieval(self, route: str) -> None:
+        with self._lock:
+            self.stats["empty_retrievals"][route] = self.stats["empty_retrievals"].get(route, 0) + 1
+
+    def record_misroute(self, predicted: str, expected: str) -> None:
+        key = f"{predicted}->{expected}"
+        with self._lock:
+            self.stats["misroutes"][key] = self.stats["misroutes"].get(key, 0) + 1
+
+    def info(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "min_similarity": self.min_similarity,
+                "min_margin": self.min_margin,
+                "prototypes_loaded": route_prototypes.loaded,
+                "misroutes_total": sum(self.stats["misroutes"].values()),
+                **self.stats
+            }
+
+
+query_router = QueryRouter(ROUTER_MIN_SIMILARITY, ROUTER_MIN_MARGIN)
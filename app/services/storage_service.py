@@ -0,0 +1,361 @@
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator
+
+from app.models.journal_model import JournalModel
+from app.models.passage_model import PassageModel
+
+# Journals and passages live here; the Chroma collections are derived from it
+STORAGE_PATH = os.getenv("WALT_STORAGE_PATH", "app/walt.sqlite3")
+STORAGE_POOL_SIZE = 4
+
+
+class TitleTakenError(Exception):
+    """Raised when a journal title is already used by another journal"""
+
+
+# =========CONNECTION POOL=========
+
+class ConnectionPool:
+    """
+    Fixed set of SQLite connections shared across threads.
+
+    Repository methods are blocking; async callers run them with
+    asyncio.to_thread, and each call borrows its own connection. WAL mode
+    lets readers proceed while a write is in progress.
+    """
+
+    def __init__(self, path: str, size: int):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Every ":memory:" connection is its own database, so share a single one
+        size = 1 if path == ":memory:" else size
+        self._connections: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._connections.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; the work done with it is committed as one transaction"""
+        connection = self._connections.get()
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self._connections.put(connection)
+
+
+def _timestamp(value: datetime) -> float:
+    return value.timestamp()
+
+
+def _parse(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+# =========REPOSITORIES=========
+
+class JournalRepository:
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        with pool.connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS journals ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                "created_at TEXT NOT NULL, created_ts REAL NOT NULL, updated_at TEXT)"
+            )
+            db.execute("CREATE UNIQUE INDEX IF NOT EXISTS journals_title ON journals (title)")
+            db.execute("CREATE INDEX IF NOT EXISTS journals_created ON journals (created_ts, id)")
+
+    def create(self, journal: JournalModel, keep_id: bool = False) -> JournalModel:
+        """Insert a journal; its ID is allocated by the database unless keep_id is set"""
+        try:
+            with self.pool.connection() as db:
+                cursor = db.execute(
+                    "INSERT INTO journals (id, title, created_at, created_ts, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (journal.id if keep_id else None, journal.title, _iso(journal.created_at),
+                     _timestamp(journal.created_at), _iso(journal.updated_at))
+                )
+        except sqlite3.IntegrityError as error:
+            raise TitleTakenError(journal.title) from error
+        journal.id = cursor.lastrowid
+        return journal
+
+    def get(self, journal_id: int) -> JournalModel | None:
+        with self.pool.connection() as db:
+            row = db.execute(
+                "SELECT id, title, created_at, updated_at FROM journals WHERE id = ?", (journal_id,)
+            ).fetchone()
+        return _journal(row) if row else None
+
+    def page(
+            self,
+            limit: int,
+            after: tuple[float, int] | None = None,
+            created_from: float | None = None,
+            created_to: float | None = None
+    ) -> list[JournalModel]:
+        """Journals in (created_at, id) order, starting after the `after` position"""
+        where, params = _page_filter(after, created_from, created_to)
+        with self.pool.connection() as db:
+            rows = db.execute(
+                f"SELECT id, title, created_at, updated_at FROM journals {where} ORDER BY created_ts, id LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [_journal(row) for row in rows]
+
+    def update_title(self, journal_id: int, title: str) -> JournalModel | None:
+        try:
+            with self.pool.connection() as db:
+                updated = db.execute(
+                    "UPDATE journals SET title = ?, updated_at = ? WHERE id = ?",
+                    (title, datetime.now().isoformat(timespec="seconds"), journal_id)
+                ).rowcount
+        except sqlite3.IntegrityError as error:
+            raise TitleTakenError(title) from error
+        return self.get(journal_id) if updated else None
+
+    def delete(self, journal_id: int) -> JournalModel | None:
+        with self.pool.connection() as db:
+            row = db.execute(
+                "DELETE FROM journals WHERE id = ? RETURNING id, title, created_at, updated_at", (journal_id,)
+            ).fetchone()
+        return _journal(row) if row else None
+
+    def count(self) -> int:
+        with self.pool.connection() as db:
+            return db.execute("SELECT COUNT(*) FROM journals").fetchone()[0]
+
+
+class PassageRepository:
+
+    COLUMNS = "id, journal_id, title, content, created_at, updated_at"
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        with pool.connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS passages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, journal_id INTEGER NOT NULL, title TEXT, "
+                "content TEXT NOT NULL, created_at TEXT NOT NULL, created_ts REAL NOT NULL, updated_at TEXT)"
+            )
+            # Listing a journal's passages is a range scan in creation order
+            db.execute("CREATE INDEX IF NOT EXISTS passages_journal ON passages (journal_id, created_ts, id)")
+            db.execute("CREATE INDEX IF NOT EXISTS passages_created ON passages (created_ts, id)")
+
+    def create(self, passage: PassageModel, keep_id: bool = False) -> PassageModel:
+        """Insert a passage; its ID is allocated by the database unless keep_id is set"""
+        with self.pool.connection() as db:
+            cursor = db.execute(
+                "INSERT INTO passages (id, journal_id, title, content, created_at, created_ts, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (passage.id if keep_id else None, passage.journal_id, passage.title, passage.content,
+                 _iso(passage.created_at), _timestamp(passage.created_at), _iso(passage.updated_at))
+            )
+        passage.id = cursor.lastrowid
+        return passage
+
+    def get(self, passage_id: int) -> PassageModel | None:
+        with self.pool.connection() as db:
+            row = db.execute(f"SELECT {self.COLUMNS} FROM passages WHERE id = ?", (passage_id,)).fetchone()
+        return _passage(row) if row else None
+
+    def page(
+            self,
+            limit: int,
+            after: tuple[float, int] | None = None,
+            journal_id: int | None = None,
+            created_from: float | None = None,
+            created_to: float | None = None
+    ) -> list[PassageModel]:
+        """Passages in (created_at, id) order, optionally of one journal, starting after the `after` position"""
+        where, params = _page_filter(after, created_from, created_to, journal_id)
+        with self.pool.connection() as db:
+            rows = db.execute(
+                f"SELECT {self.COLUMNS} FROM passages {where} ORDER BY created_ts, id LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [_passage(row) for row in rows]
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[PassageModel]:
+        """Every passage, read in ID order a batch at a time"""
+        last_id = 0
+        while True:
+            with self.pool.connection() as db:
+                rows = db.execute(
+                    f"SELECT {self.COLUMNS} FROM passages WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _passage(row)
+            last_id = rows[-1][0]
+
+    def update(self, passage_id: int, passage: PassageModel) -> PassageModel | None:
+        with self.pool.connection() as db:
+            updated = db.execute(
+                "UPDATE passages SET journal_id = ?, title = ?, content = ?, created_at = ?, created_ts = ?, updated_at = ? "
+                "WHERE id = ?",
+                (passage.journal_id, passage.title, passage.content, _iso(passage.created_at),
+                 _timestamp(passage.created_at), _iso(passage.updated_at), passage_id)
+            ).rowcount
+        if not updated:
+            return None
+        passage.id = passage_id
+        return passage
+
+    def delete(self, passage_id: int) -> PassageModel | None:
+        with self.pool.connection() as db:
+            row = db.execute(
+                f"DELETE FROM passages WHERE id = ? RETURNING {self.COLUMNS}", (passage_id,)
+            ).fetchone()
+        return _passage(row) if row else None
+
+    def count(self) -> int:
+        with self.pool.connection() as db:
+            return db.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+
+
+def _page_filter(
+        after: tuple[float, int] | None,
+        created_from: float | None,
+        created_to: float | None,
+        journal_id: int | None = None
+) -> tuple[str, list[Any]]:
+    """WHERE clause for a keyset page; every condition is served by a (.., created_ts, id) index"""
+    clauses, params = [], []
+    if journal_id is not None:
+        clauses.append("journal_id = ?")
+        params.append(journal_id)
+    if after is not None:
+        clauses.append("(created_ts, id) > (?, ?)")
+        params.extend(after)
+    if created_from is not None:
+        clauses.append("created_ts >= ?")
+        params.append(created_from)
+    if created_to is not None:
+        # Inclusive, like the created_to search filter
+        clauses.append("created_ts <= ?")
+        params.append(created_to)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+# Rows come from our own writes, so skip re-validating them
+def _journal(row: tuple[Any, ...]) -> JournalModel:
+    return JournalModel.model_construct(
+        id=row[0], title=row[1], created_at=_parse(row[2]), updated_at=_parse(row[3])
+    )
+
+
+def _passage(row: tuple[Any, ...]) -> PassageModel:
+    return PassageModel.model_construct(
+        id=row[0], journal_id=row[1], title=row[2], content=row[3],
+        created_at=_parse(row[4]), updated_at=_parse(row[5])
+    )
+
+
+# =========SEED DATA=========
+# A fresh database starts with the sample journals and passages
+
+SEED_JOURNALS = [
+    JournalModel(
+        id=1,
+        title="Dream Journal",
+        created_at=datetime(2024, 1, 2, 10, 30),  # January 2, 2026, at 10:30 AM
+    ),
+    JournalModel(
+        id=2,
+        title="Daily TODO List",
+        created_at=datetime(2025, 1, 7, 11, 15)
+    ),
+    JournalModel(
+        id=3,
+        title="Shower Thoughts",
+        created_at=datetime(2025, 11, 12, 8, 30)
+    )
+]
+
+SEED_PASSAGES = [
+    PassageModel(
+        id=1,
+        journal_id=1,
+        title="Veni Vidi MEci?",
+        content="Had a dream I was explaining the Roman Empire to my gf but I WAS the Roman Empire. Very demure, very mindful. Woke up feeling powerful.",
+        created_at=datetime(2026, 1, 9, 10,35),
+    ),
+    PassageModel(
+        id=2,
+        journal_id=1,
+        title="Nightmare Therapy",
+        content="Dreamed my therapist said 'we're so back' then immediately followed with 'it's so over.' Spent rest of dream in emotional limbo." ,
+        created_at=datetime(2026, 1, 9, 10,37),
+    ),
+    PassageModel(
+        id=3,
+        journal_id=1,
+        title="Birds Not What They Seem",
+        content="In my dream, I was a bird identified in the wild. Someone pointed and yelled 'THE BIRDS WORK FOR THE BOURGEOISIE' and I woke up.",
+        created_at=datetime(2026, 1, 9, 10,38),
+    ),
+    PassageModel(
+        id=4,
+        journal_id=2,
+        title="TODO Yesterday",
+        content="""-Crash out about minor inconvenience
+        - Touch grass
+        - Respond to texts from 3 weeks ago
+        - Eat hot chip and lie 
+        - Gaslight myself into productivity
+        - Be a professional hater for exactly 1 hour""",
+        created_at=datetime(2026, 1, 9, 10,39),
+    ),
+    PassageModel(
+        id=5,
+        journal_id=3,
+        title="My Own Girl",
+        content="If I were a girl's girl but also just a girl, am I technically my own girl? This is the kind of math they don't teach you.",
+        created_at=datetime(2026, 1, 9, 10,40),
+    ),
+    PassageModel(
+        id=6,
+        journal_id=3,
+        title="Payments",
+        content="When I was in school the teachers told me practice makes perfect; then they told me nobody’s perfect so I stopped practicing.",
+        created_at=datetime(2026, 1, 9, 10,41),
+    ),
+    PassageModel(
+        id=7,
+        journal_id=3,
+        title="Widths",
+        content="A lot of people are afraid of heights. Not me, I’m afraid of widths.",
+        created_at=datetime(2026, 1, 9, 10,42),
+    )
+]
+
+
+def seed_if_empty(journals: JournalRepository, passages: PassageRepository) -> None:
+    if journals.count() == 0 and passages.count() == 0:
+        for journal in SEED_JOURNALS:
+            journals.create(journal.model_copy(), keep_id=True)
+        for passage in SEED_PASSAGES:
+            passages.create(passage.model_copy(), keep_id=True)
+
+
+storage_pool = ConnectionPool(STORAGE_PATH, STORAGE_POOL_SIZE)
+journal_repository = JournalRepository(storage_pool)
+passage_repository = PassageRepository(storage_pool)
+seed_if_empty(journal_repository, passage_repository)
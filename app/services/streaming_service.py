@@ -0,0 +1,85 @@
+import json
+from typing import Any, AsyncIterator
+
+from langchain_core.messages import AIMessageChunk
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def ndjson_line(data: Any) -> str:
+    return json.dumps(data, default=str) + "\n"
+
+
+async def ndjson_stream(events: AsyncIterator[Any]) -> AsyncIterator[str]:
+    async for event in events:
+        yield ndjson_line(event)
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    A streaming response for endpoints that keep reading the request body
+    while they respond, e.g. to report progress on an upload.
+
+    StreamingResponse listens for the client disconnecting by reading
+    receive() alongside the body, and on ASGI servers before spec 2.4
+    that takes the upload's body messages away from request.stream().
+    This response leaves the listener out. The body reader still notices a
+    disconnect itself, as ClientDisconnect.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+async def stream_graph(graph, inputs: dict[str, Any], config: dict[str, Any], answer_nodes: set[str]) -> AsyncIterator[str]:
+    """
+    Run a compiled graph and yield SSE events as its state fills in:
+    `route` and `sources` as soon as the routing/retrieval nodes finish,
+    `token` for every chunk generated inside one of `answer_nodes`, and a
+    final `done` event carrying the complete answer.
+    """
+    answer = None
+    degraded = False
+    streamed = False
+
+    try:
+        async for mode, chunk in graph.astream(inputs, config=config, stream_mode=["updates", "messages"]):
+            if mode == "messages":
+                message, metadata = chunk
+                # Only generated chunks - finished messages written to state are skipped
+                if (isinstance(message, AIMessageChunk) and message.content
+                        and metadata.get("langgraph_node") in answer_nodes):
+                    streamed = True
+                    yield sse_event("token", message.content)
+                continue
+
+            for node, update in chunk.items():
+                if not update:
+                    continue
+                if "route" in update:
+                    yield sse_event("route", update["route"])
+                if "docs" in update:
+                    yield sse_event("sources", update["docs"])
+                if node in answer_nodes and "answer" in update:
+                    answer = update["answer"]
+                    degraded = update.get("degraded", False)
+                    # Cached answers are not generated, so send them as a single token
+                    if not streamed and answer:
+                        yield sse_event("token", answer)
+    except Exception as error:
+        # Headers are already sent, so report failures in-band
+        yield sse_event("error", str(error))
+        return
+
+    yield sse_event("done", {"answer": answer, "degraded": degraded})
@@ -0,0 +1,462 @@
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+# Deleted or overwritten rows are compacted away once they make up this share of a NumPy store...
+COMPACT_RATIO = float(os.getenv("WALT_NUMPY_COMPACT_RATIO", "0.25"))
+# ...and number at least this many
+COMPACT_MIN_ROWS = 256
+# SQLite's default limit on bound parameters per statement is 999
+SQL_BATCH = 900
+# Metadata keys the NumPy backend indexes, so filtering on them does not scan every chunk
+INDEXED_METADATA = ("journal_id", "source", "created_at_ts")
+_WHERE_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_METADATA_KEY = re.compile(r"^\w+$")
+
+
+def _chunks(values: list[Any], size: int = SQL_BATCH):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def _metadata_field(key: str) -> str:
+    if not _METADATA_KEY.match(key):
+        raise ValueError(f"Unsupported metadata key: {key!r}")
+    return f"json_extract(metadata, '$.{key}')"
+
+
+def _where_sql(where: dict[str, Any]) -> tuple[str, list[Any]]:
+    """
+    Translate a Chroma `where` filter into a SQL condition on the chunks
+    table: {"key": value}, {"key": {"$gte": value}} and the other comparison
+    operators, "$in", and "$and" / "$or" of those.
+    """
+    clauses, parameters = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(part) for part in condition]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            parameters.extend(value for _, values in parts for value in values)
+            continue
+        field = _metadata_field(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator == "$in":
+                clauses.append(f"{field} IN ({','.join('?' * len(value))})")
+                parameters.extend(value)
+            elif operator in _WHERE_OPERATORS:
+                clauses.append(f"{field} {_WHERE_OPERATORS[operator]} ?")
+                parameters.append(value)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+    return " AND ".join(clauses) or "1", parameters
+
+
+def _result(found: dict[str, Any], include: tuple[str, ...]) -> dict[str, Any]:
+    return {"ids": found["ids"], **{key: found[key] for key in include}}
+
+
+# =========CHROMA=========
+
+class ChromaBackend:
+    """
+    A Chroma collection behind the vector-store interface the service uses:
+    upsert/delete/update_metadata/get/query/query_many/count, with
+    Chroma `where` filters. Scores are Chroma's
+    squared L2 distances, lower is closer.
+    """
+
+    name = "chroma"
+
+    def __init__(self, collection: str, persist_directory: str, embeddings: Embeddings):
+        self.store = Chroma(collection_name=collection, persist_directory=persist_directory, embedding_function=embeddings)
+
+    def upsert(self, ids: list[str], texts: list[str], embeddings: list[list[float]], metadatas: list[dict[str, Any] | None]) -> None:
+        # Chroma rejects empty metadata dicts, but accepts None
+        self.store._collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=[metadata or None for metadata in metadatas])
+
+    def delete(self, ids: list[str]) -> None:
+        self.store._collection.delete(ids=ids)
+
+    def update_metadata(self, ids: list[str], metadatas: list[dict[str, Any]]) -> None:
+        """Merge keys into the stored metadata"""
+        self.store._collection.update(ids=ids, metadatas=metadatas)
+
+    def get(
+            self,
+            ids: list[str] | None = None,
+            where: dict[str, Any] | None = None,
+            include: tuple[str, ...] = ("documents", "metadatas"),
+            limit: int | None = None,
+            offset: int | None = None
+    ) -> dict[str, Any]:
+        return _result(self.store.get(ids=ids, where=where, include=list(include), limit=limit, offset=offset), include)
+
+    def query(self, embedding: list[float], k: int, where: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+        return self.query_many([embedding], [k], where)[0]
+
+    def query_many(
+            self,
+            embeddings: list[list[float]],
+            ks: list[int],
+            where: dict[str, Any] | None = None
+    ) -> list[list[dict[str, Any]]]:
+        """The top k of each query embedding among the chunks matching `where`, from a single Chroma query"""
+        most = max(ks, default=0)
+        if most <= 0:
+            return [[] for _ in ks]
+        found = self.store._collection.query(
+            query_embeddings=embeddings, n_results=most, where=where or None, include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                {"id": doc_id, "text": text, "metadata": metadata, "score": distance}
+                for doc_id, text, metadata, distance in zip(ids, documents, metadatas, distances)
+            ][:k]
+            for k, ids, documents, metadatas, distances in zip(ks, found["ids"], found["documents"], found["metadatas"], found["distances"])
+        ]
+
+    def count(self) -> int:
+        return self.store._collection.count()
+
+    def info(self) -> dict[str, Any]:
+        return {"backend": self.name, "count": self.count()}
+
+
+# =========NUMPY=========
+
+class NumpyBackend:
+    """
+    Exact in-process vector search over a memory-mapped float32 matrix.
+
+    Vectors are L2-normalized and appended to a single flat file, whose
+    tail doubles as the append log: an upsert appends rows and maps the
+    grown file, so a search is one matmul over every row followed by an
+    argpartition for the top k. Texts, metadata and the row of each ID
+    live in SQLite next to it. Deleting or overwriting an ID only
+    tombstones its old row; once tombstones pass COMPACT_RATIO the live
+    rows are copied into a new file generation, which replaces the old
+    one in the same SQLite transaction that renumbers the rows.
+
+    Scores are squared L2 distances between the normalized vectors
+    (2 - 2 * cosine), the scale of Chroma's default metric, so both
+    backends rank and score alike for normalized embeddings.
+    """
+
+    name = "numpy"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, "chunks.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, row INTEGER NOT NULL, document TEXT, metadata TEXT)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        for key in INDEXED_METADATA:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS chunks_{key} ON chunks ({_metadata_field(key)})")
+        self._db.commit()
+        self.stats = {"searches": 0, "appended_rows": 0, "compactions": 0}
+        self._load()
+
+    # =========FILES=========
+
+    def _meta(self, key: str) -> str | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _file(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors.{generation}.f32")
+
+    def _load(self) -> None:
+        dimension = self._meta("dimension")
+        self._dimension = int(dimension) if dimension else None
+        self._generation = int(self._meta("generation") or 0)
+        # Left behind by a compaction that did not commit, or not yet removed after one that did
+        for stale in glob.glob(os.path.join(self.path, "vectors.*.f32")):
+            if stale != self._file(self._generation):
+                os.remove(stale)
+
+        rows = 0
+        if self._dimension and os.path.exists(self._file(self._generation)):
+            row_bytes = self._dimension * 4
+            size = os.path.getsize(self._file(self._generation))
+            # A partial row is an append that was cut short
+            if size % row_bytes:
+                os.truncate(self._file(self._generation), size - size % row_bytes)
+            rows = size // row_bytes
+
+        # Rows past the last committed one were appended but never committed, so they stay dead
+        self._row_ids: list[str | None] = [None] * rows
+        self._rows: dict[str, int] = {}
+        for doc_id, row in self._db.execute("SELECT id, row FROM chunks"):
+            if row < rows:
+                self._row_ids[row] = doc_id
+                self._rows[doc_id] = row
+        self._live = np.zeros(rows, dtype=bool)
+        self._live[list(self._rows.values())] = True
+        self._matrix: np.ndarray | None = None
+
+    def _view(self) -> np.ndarray:
+        """Under the lock: the matrix of every row, mapped again after appends"""
+        rows = len(self._row_ids)
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            if rows == 0:
+                self._matrix = np.empty((0, self._dimension or 0), dtype=np.float32)
+            else:
+                self._matrix = np.memmap(self._file(self._generation), dtype=np.float32, mode="r", shape=(rows, self._dimension))
+        return self._matrix
+
+    # =========WRITES=========
+
+    def upsert(self, ids: list[str], texts: list[str], embeddings: list[list[float]], metadatas: list[dict[str, Any] | None]) -> None:
+        # The last of repeated IDs wins
+        latest = {doc_id: position for position, doc_id in enumerate(ids)}
+        positions = list(latest.values())
+        if not positions:
+            return
+        vectors = _normalize(np.asarray([embeddings[position] for position in positions], dtype=np.float32))
+
+        with self._lock:
+            if self._dimension is None:
+                self._dimension = vectors.shape[1]
+                self._set_meta("dimension", self._dimension)
+            elif vectors.shape[1] != self._dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the collection's {self._dimension}")
+
+            start = len(self._row_ids)
+            with open(self._file(self._generation), "ab") as log:
+                log.write(vectors.tobytes())
+            self._db.executemany(
+                "INSERT INTO chunks (id, row, document, metadata) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET row = excluded.row, document = excluded.document, metadata = excluded.metadata",
+                [
+                    (ids[position], start + offset, texts[position], json.dumps(metadatas[position]) if metadatas[position] else None)
+                    for offset, position in enumerate(positions)
+                ]
+            )
+            self._db.commit()
+
+            for offset, position in enumerate(positions):
+                self._retire(ids[position])
+                self._row_ids.append(ids[position])
+                self._rows[ids[position]] = start + offset
+            # A new array rather than a resize, so searches holding the old one are unaffected
+            self._live = np.concatenate([self._live, np.ones(len(positions), dtype=bool)])
+            self.stats["appended_rows"] += len(positions)
+            self._maybe_compact()
+
+    def _retire(self, doc_id: str) -> None:
+        row = self._rows.pop(doc_id, None)
+        if row is not None:
+            self._live[row] = False
+            self._row_ids[row] = None
+
+    def delete(self, ids: list[str]) -> None:
+        with self._lock:
+            for batch in _chunks(ids):
+                self._db.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._db.commit()
+            for doc_id in ids:
+                self._retire(doc_id)
+            self._maybe_compact()
+
+    def update_metadata(self, ids: list[str], metadatas: list[dict[str, Any]]) -> None:
+        """Merge keys into the stored metadata (None removes a key, as in Chroma)"""
+        with self._lock:
+            stored = {doc_id: metadata for doc_id, _, metadata, _ in self._select(ids)}
+            updates = []
+            for doc_id, changes in zip(ids, metadatas):
+                if doc_id not in stored:
+                    continue
+                merged = {**(stored[doc_id] or {}), **changes}
+                merged = {key: value for key, value in merged.items() if value is not None}
+                updates.append((json.dumps(merged) if merged else None, doc_id))
+            self._db.executemany("UPDATE chunks SET metadata = ? WHERE id = ?", updates)
+            self._db.commit()
+
+    def _maybe_compact(self) -> None:
+        dead = len(self._row_ids) - len(self._rows)
+        if dead >= COMPACT_MIN_ROWS and dead >= COMPACT_RATIO * len(self._row_ids):
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the live rows into a new file generation, dropping tombstones"""
+        with self._lock:
+            live_rows = np.flatnonzero(self._live)
+            generation = self._generation + 1
+            matrix = self._view()
+            with open(self._file(generation), "wb") as target:
+                for batch in np.array_split(live_rows, max(1, len(live_rows) // 65536)):
+                    target.write(np.ascontiguousarray(matrix[batch]).tobytes())
+
+            row_ids = [self._row_ids[row] for row in live_rows]
+            self._db.executemany("UPDATE chunks SET row = ? WHERE id = ?", [(row, doc_id) for row, doc_id in enumerate(row_ids)])
+            self._set_meta("generation", generation)
+            # The renumbered rows and the new generation commit together; until then the old file stays valid
+            self._db.commit()
+
+            old_file = self._file(self._generation)
+            self._generation = generation
+            self._row_ids = row_ids
+            self._rows = {doc_id: row for row, doc_id in enumerate(row_ids)}
+            self._live = np.ones(len(row_ids), dtype=bool)
+            self._matrix = None
+            # Searches still holding the old mapping keep reading it until they finish
+            os.remove(old_file)
+            self.stats["compactions"] += 1
+
+    # =========READS=========
+
+    def _select(self, ids: list[str], where: dict[str, Any] | None = None) -> list[tuple[str, str | None, dict[str, Any] | None, int]]:
+        condition, parameters = _where_sql(where) if where else ("1", [])
+        found = []
+        for batch in _chunks(ids, SQL_BATCH - len(parameters)):
+            found.extend(self._db.execute(
+                f"SELECT id, document, metadata, row FROM chunks WHERE id IN ({','.join('?' * len(batch))}) AND {condition}",
+                [*batch, *parameters]
+            ))
+        return [(doc_id, text, json.loads(metadata) if metadata else None, row) for doc_id, text, metadata, row in found]
+
+    def get(
+            self,
+            ids: list[str] | None = None,
+            where: dict[str, Any] | None = None,
+            include: tuple[str, ...] = ("documents", "metadatas"),
+            limit: int | None = None,
+            offset: int | None = None
+    ) -> dict[str, Any]:
+        with self._lock:
+            if ids is not None:
+                rows = self._select(ids, where)
+            else:
+                condition, parameters = _where_sql(where) if where else ("1", [])
+                sql = f"SELECT id, document, metadata, row FROM chunks WHERE {condition} ORDER BY row LIMIT ? OFFSET ?"
+                rows = [
+                    (doc_id, text, json.loads(metadata) if metadata else None, row)
+                    for doc_id, text, metadata, row in self._db.execute(sql, [*parameters, -1 if limit is None else limit, offset or 0])
+                ]
+            matrix = self._view() if "embeddings" in include else None
+
+        found = {
+            "ids": [row[0] for row in rows],
+            "documents": [row[1] for row in rows],
+            "metadatas": [row[2] for row in rows],
+            "embeddings": [np.array(matrix[row[3]]) for row in rows] if matrix is not None else None
+        }
+        return _result(found, include)
+
+    def query(self, embedding: list[float], k: int, where: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+        return self.query_many([embedding], [k], where)[0]
+
+    def query_many(
+            self,
+            embeddings: list[list[float]],
+            ks: list[int],
+            where: dict[str, Any] | None = None
+    ) -> list[list[dict[str, Any]]]:
+        """
+        The top k of each query embedding, scored against every row in one
+        matmul. With a `where` filter, SQLite picks the matching rows first
+        and only those are scored, so the cost follows the filter's matches
+        rather than the collection size.
+        """
+        with self._lock:
+            # A consistent snapshot: appends swap in new arrays, compaction a new mapping
+            matrix = self._view()
+            live = self._live
+            row_ids = self._row_ids
+            live_count = len(self._rows)
+            candidates = None
+            if where:
+                condition, parameters = _where_sql(where)
+                candidates = np.sort(np.fromiter(
+                    (row for (row,) in self._db.execute(f"SELECT row FROM chunks WHERE {condition}", parameters)), dtype=np.int64
+                ))
+            self.stats["searches"] += len(embeddings)
+        ks = [min(k, live_count if candidates is None else len(candidates)) for k in ks]
+        if max(ks, default=0) <= 0:
+            return [[] for _ in ks]
+
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if candidates is None:
+            # One pass over the matrix for the whole batch, rather than one per query
+            similarities = queries @ matrix.T
+            if live_count < matrix.shape[0]:
+                similarities[:, ~live] = -np.inf
+        else:
+            # Only live rows are stored in SQLite, so no tombstone mask is needed
+            similarities = queries @ matrix[candidates].T
+
+        ranked = []
+        for scores, k in zip(similarities, ks):
+            if k <= 0:
+                ranked.append([])
+                continue
+            if k < len(scores):
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            rows = top if candidates is None else candidates[top]
+            ranked.append([(row_ids[row], float(scores[position])) for row, position in zip(rows, top) if row_ids[row] is not None])
+
+        with self._lock:
+            stored = {
+                doc_id: (text, metadata)
+                for doc_id, text, metadata, _ in self._select(list({doc_id for hits in ranked for doc_id, _ in hits}))
+            }
+        return [
+            [
+                {"id": doc_id, "text": stored[doc_id][0], "metadata": stored[doc_id][1], "score": max(0.0, 2.0 - 2.0 * similarity)}
+                for doc_id, similarity in hits if doc_id in stored
+            ]
+            for hits in ranked
+        ]
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def info(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "count": len(self._rows),
+                "rows": len(self._row_ids),
+                "dead_rows": len(self._row_ids) - len(self._rows),
+                "dimension": self._dimension,
+                "generation": self._generation,
+                **self.stats
+            }
+
+
+VECTOR_BACKENDS = {"chroma": ChromaBackend, "numpy": NumpyBackend}
+
+
+def copy_collection(source: ChromaBackend | NumpyBackend, target: ChromaBackend | NumpyBackend, batch: int = 1000) -> int:
+    """Copy every document with its stored vector, e.g. to move a collection to the other backend"""
+    copied = 0
+    while True:
+        found = source.get(include=("documents", "metadatas", "embeddings"), limit=batch, offset=copied)
+        if not found["ids"]:
+            return copied
+        target.upsert(found["ids"], found["documents"], [list(vector) for vector in found["embeddings"]], found["metadatas"])
+        copied += len(found["ids"])
@@ -1,48 +1,70 @@
 from typing import TypedDict, Any
-from langchain_ollama import ChatOllama
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, END
 
-from app.services.vectordb_service import search
+from app.services.answer_cache import answer_cache
+from app.services.checkpoint_service import checkpointer
+from app.services.context_service import assemble_context
+from app.services.entity_index import entities_from_metadata, merge_entities
+from app.services.metrics_service import ainvoke_llm, instrument
+from app.services.model_registry import lazy_model
+from app.services.ner_service import aextract_entities
+from app.services.ollama_client import (
+    OllamaUnavailable, RETRIEVAL_FALLBACK, CHAT_CONCURRENCY, chat_ollama, model_gate, retrieval_only_answer
+)
+from app.services.vectordb_service import asearch
 
 
 # Define the LLM
-llm = ChatOllama(
-    model="mistral",
-    temperature=0.2
-)
+CHAT_MODEL = "mistral"
+llm = lazy_model("chat_llm", lambda: chat_ollama(CHAT_MODEL, temperature=0.2))
+# Shared with the chat graph: one gate per model
+chat_gate = model_gate(CHAT_MODEL, CHAT_CONCURRENCY)
 
 class SearchTextState(TypedDict, total=False):
     query: str
     k: int
+    # Retrieval mode ("vector", "lexical" or "hybrid"); None uses the server default
+    mode: str | None
+    # Metadata filters applied inside the vector-store query (see vectordb_service.metadata_where)
+    filters: dict[str, Any] | None
     docs: list[dict[str, Any]]
     answer: str
+    # True when the answer is the retrieved context because the chat model was unavailable
+    degraded: bool
 
 class NERSearchState(TypedDict, total=False):
     query: str
     k: int
+    mode: str | None
+    filters: dict[str, Any] | None
     passages: list
     combined_text: str
     entities: dict
     answer: str
+    degraded: bool
 
 # =========NODE DEFINITIONS=========
 
-def retrieve_freewriting_node(state: SearchTextState) -> SearchTextState:
+async def retrieve_freewriting_node(state: SearchTextState) -> SearchTextState:
     """Retrieve documents from the freewriting collection"""
     query = state.get("query", "")
     k = state.get("k", 3)
 
-    results = search(query, k=k, collection="freewriting")
+    results = await asearch(query, k=k, collection="freewriting", mode=state.get("mode"), filters=state.get("filters"))
     return {"docs": results}
 
-def generate_answer_node(state: SearchTextState) -> SearchTextState:
+async def generate_answer_node(state: SearchTextState) -> SearchTextState:
     """Generate answer based on retrieved documents"""
     query = state.get("query", "")
     docs = state.get("docs", [])
+    doc_ids = [passage["id"] for passage in docs]
+
+    cached = await answer_cache.get("search_text", query, doc_ids, "freewriting", state.get("filters"))
+    if cached is not None:
+        return {"answer": cached, "degraded": False}
 
-    # Combine document texts
-    combined_docs = "\n\n".join(passage["text"] for passage in docs) if docs else "No relevant information found."
+    # Merge, rerank and pack the documents into the context token budget
+    combined_docs = (await assemble_context(query, docs, "freewriting"))["text"] if docs else "No relevant information found."
 
     prompt = (
         f"You are a writing assistant named Walt Bot."
@@ -57,17 +79,23 @@ def generate_answer_node(state: SearchTextState) -> SearchTextState:
         f"Answer: "
     )
 
-    response = llm.invoke(prompt)
+    try:
+        response = await chat_gate.acall(ainvoke_llm, llm.get(), prompt)
+    except OllamaUnavailable:
+        if not RETRIEVAL_FALLBACK:
+            raise
+        return {"answer": retrieval_only_answer(combined_docs if docs else ""), "degraded": True}
     answer = response.content if hasattr(response, 'content') else str(response)
+    await answer_cache.put("search_text", query, doc_ids, "freewriting", answer, state.get("filters"))
 
-    return {"answer": answer}
+    return {"answer": answer, "degraded": False}
 
 # NER node definitions
-def retrieve_passages_node(state: NERSearchState) -> NERSearchState:
+async def retrieve_passages_node(state: NERSearchState) -> NERSearchState:
     """Retrieve passages from freewriting collection"""
     query = state.get("query", "")
     k = state.get("k", 3)
-    result = search(query, k=k, collection="freewriting")
+    result = await asearch(query, k=k, collection="freewriting", mode=state.get("mode"), filters=state.get("filters"))
     return {"passages": result}
 
 def combine_text_node(state: NERSearchState) -> NERSearchState:
@@ -76,14 +104,23 @@ def combine_text_node(state: NERSearchState) -> NERSearchState:
     combined_text = "\n\n".join(passage["text"] for passage in passages)
     return {"combined_text": combined_text}
 
-def extract_entities_node(state: NERSearchState) -> NERSearchState:
-    """Extract named entities from combined text"""
-    from app.services.vectordb_service import extract_entities
-    combined_text = state.get("combined_text", "")
-    entities = extract_entities(combined_text)
-    return {"entities": entities}
-
-def generate_ner_answer_node(state: NERSearchState) -> NERSearchState:
+async def extract_entities_node(state: NERSearchState) -> NERSearchState:
+    """Look up the entities precomputed at ingest; only passages ingested without them go through NER"""
+    passages = state.get("passages", [])
+    groups = []
+    untagged = []
+    for passage in passages:
+        entities = entities_from_metadata(passage.get("metadata"))
+        if entities is None:
+            untagged.append(passage["text"])
+        else:
+            groups.append(entities)
+
+    if untagged:
+        groups.append(await aextract_entities("\n\n".join(untagged)))
+    return {"entities": merge_entities(groups)}
+
+async def generate_ner_answer_node(state: NERSearchState) -> NERSearchState:
     """Generate answer based on extracted entities"""
     query = state.get("query", "")
     entities = state.get("entities", {})
@@ -95,10 +132,17 @@ def generate_ner_answer_node(state: NERSearchState) -> NERSearchState:
         f"User query: {query}"
     )
 
-    response = llm.invoke(prompt)
+    try:
+        response = await chat_gate.acall(ainvoke_llm, llm.get(), prompt)
+    except OllamaUnavailable:
+        if not RETRIEVAL_FALLBACK:
+            raise
+        # The entities are what the model would have answered from
+        found = "\n".join(f"{label}: {', '.join(names)}" for label, names in entities.items() if names)
+        return {"answer": retrieval_only_answer(found), "degraded": True}
     answer = response.content if hasattr(response, 'content') else str(response)
 
-    return {"answer": answer}
+    return {"answer": answer, "degraded": False}
 
 # ==========BUILD GRAPH==========
 
@@ -107,8 +151,8 @@ def build_search_text_graph():
     workflow = StateGraph(SearchTextState)
 
     # Add nodes
-    workflow.add_node("retrieve", retrieve_freewriting_node)
-    workflow.add_node("generate", generate_answer_node)
+    workflow.add_node("retrieve", instrument("search_text", "retrieve", retrieve_freewriting_node))
+    workflow.add_node("generate", instrument("search_text", "generate", generate_answer_node))
 
     # Define flow
     workflow.set_entry_point("retrieve")
@@ -116,7 +160,7 @@ def build_search_text_graph():
     workflow.add_edge("generate", END)
 
     # Compile with memory (optional, to track state across calls)
-    return workflow.compile(checkpointer=MemorySaver())
+    return workflow.compile(checkpointer=checkpointer)
 
 # Create singleton instance
 search_text_graph = build_search_text_graph()
@@ -127,10 +171,10 @@ def build_ner_search_graph():
     workflow = StateGraph(NERSearchState)
 
     # Add nodes
-    workflow.add_node("retrieve", retrieve_passages_node)
-    workflow.add_node("combine", combine_text_node)
-    workflow.add_node("extract_entities", extract_entities_node)
-    workflow.add_node("generate", generate_ner_answer_node)
+    workflow.add_node("retrieve", instrument("ner", "retrieve", retrieve_passages_node))
+    workflow.add_node("combine", instrument("ner", "combine", combine_text_node))
+    workflow.add_node("extract_entities", instrument("ner", "extract_entities", extract_entities_node))
+    workflow.add_node("generate", instrument("ner", "generate", generate_ner_answer_node))
 
     # Define flow
     workflow.set_entry_point("retrieve")
@@ -139,7 +183,7 @@ def build_ner_search_graph():
     workflow.add_edge("extract_entities", "generate")
     workflow.add_edge("generate", END)
 
-    return workflow.compile(checkpointer=MemorySaver())
+    return workflow.compile(checkpointer=checkpointer)
 
 # Create singleton instance
 ner_search_graph = build_ner_search_graph()
\ No newline at end of file
@@ -1,94 +1,769 @@
+import asyncio
 import hashlib
-from typing import Any
-
-from transformers import pipeline
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
-from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-from app.routers import passages
+import heapq
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, AsyncIterator, Callable
+
+
+from app.services.chunking_service import chunker_name, chunking_for, split_text
+from app.services.document_index import DocumentIndex
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.lexical_index import BM25Index
+from app.services.metrics_service import retrieval_seconds, timed
+from app.services.entity_index import EntityIndex, INDEX_ENTITIES_AT_INGEST, entity_metadata, entities_from_metadata, normalize_label
+from app.services.model_registry import lazy_model
+from app.services.ner_service import aextract_entities, extract_entities_many
+from app.services.ollama_client import EMBEDDING_CONCURRENCY, model_gate, ollama_embeddings
+from app.services.vector_backends import VECTOR_BACKENDS, ChromaBackend, NumpyBackend
 
 PERSIST_DIRECTORY = "app/chroma_store"
 COLLECTION = "passage_archive"
-EMBEDDING = OllamaEmbeddings(model="nomic-embed-text")
-
-
-vector_store: dict[str, Chroma] = {}
-
-
-def get_vector_store(collection:str = COLLECTION) -> Chroma:
+# "chroma" or "numpy" (exact search over a memory-mapped matrix, see vector_backends); collections are not shared between them
+VECTOR_BACKEND = os.getenv("WALT_VECTOR_BACKEND", "chroma")
+NUMPY_STORE_DIRECTORY = os.path.join(PERSIST_DIRECTORY, "numpy")
+EMBEDDING_MODEL = "nomic-embed-text"
+# The Ollama client is only created on first use (or at warmup)
+embedding_model = lazy_model(
+    "embeddings",
+    lambda: ollama_embeddings(EMBEDDING_MODEL),
+    warm=lambda model: model.embed_query("warmup")
+)
+# Every embedding (ingest and query) goes through the content-addressed cache
+EMBEDDING = CachedEmbeddings(
+    embedding_model,
+    model_name=EMBEDDING_MODEL,
+    path=os.path.join(PERSIST_DIRECTORY, "embedding_cache.sqlite3"),
+    gate=model_gate(EMBEDDING_MODEL, EMBEDDING_CONCURRENCY)
+)
+# Entities found at ingest time, so entity queries never touch the NER model
+entity_index = EntityIndex(os.path.join(PERSIST_DIRECTORY, "entity_index.sqlite3"))
+# Chunks and versions of every document ingested through ingest_document
+document_index = DocumentIndex(os.path.join(PERSIST_DIRECTORY, "document_index.sqlite3"))
+# Re-ingesting a document is a read-diff-write, so versions of one document must not interleave
+_document_lock = threading.Lock()
+
+
+vector_store: dict[str, ChromaBackend | NumpyBackend] = {}
+# Stores are opened from several threads (search pool, sync queue); opening two at once races
+_vector_store_lock = threading.Lock()
+
+# Bumped on every write to a collection; listeners (e.g. the answer cache) are told which collection changed
+collection_versions: dict[str, int] = {}
+collection_write_listeners: list[Callable[[str], None]] = []
+
+# BM25 index per collection, loaded from the vector store on first use and then kept in step with every write
+lexical_indexes: dict[str, BM25Index] = {}
+_lexical_lock = threading.Lock()
+LEXICAL_LOAD_BATCH = 5000
+
+# "vector" (embeddings), "lexical" (BM25, no embedding call) or "hybrid" (both, fused by reciprocal rank)
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+RETRIEVAL_MODE = os.getenv("WALT_RETRIEVAL_MODE", "hybrid")
+RRF_K = 60
+# Each retriever contributes this many candidates per requested result to the fusion
+HYBRID_CANDIDATES = 3
+# Vector retrieval slower than this is abandoned in favour of lexical results
+VECTOR_TIMEOUT_SECONDS = float(os.getenv("WALT_VECTOR_TIMEOUT_SECONDS", "5"))
+retrieval_stats = {"vector": 0, "lexical": 0, "hybrid": 0, "lexical_fallbacks": 0, "filtered": 0}
+
+# Bounded pool that keeps blocking vector-store calls off the event loop
+SEARCH_WORKERS = 8
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="vector-search")
+# Queries per embedding call and per vector-store lookup in search_many
+SEARCH_MANY_BATCH = int(os.getenv("WALT_SEARCH_MANY_BATCH", "64"))
+
+
+def get_vector_store(collection:str = COLLECTION) -> ChromaBackend | NumpyBackend:
 
     if collection not in vector_store:
-        vector_store[collection] = Chroma(
-            collection_name=collection,
-            persist_directory=PERSIST_DIRECTORY,
-            embedding_function=EMBEDDING
-        )
+        with _vector_store_lock:
+            if collection not in vector_store:
+                if VECTOR_BACKEND not in VECTOR_BACKENDS:
+                    raise ValueError(f"Unknown vector backend: {VECTOR_BACKEND}")
+                if VECTOR_BACKEND == "numpy":
+                    vector_store[collection] = NumpyBackend(os.path.join(NUMPY_STORE_DIRECTORY, collection))
+                else:
+                    vector_store[collection] = ChromaBackend(collection, PERSIST_DIRECTORY, EMBEDDING)
     return vector_store[collection]
 
 
-def ingest_json_service(passages: list[dict[str, Any]], collection:str = COLLECTION) -> int:
-
-    db_instance = get_vector_store(collection)
-    docs = [
-        Document(
-            page_content=passage["text"],
-            metadata=passage.get("metadata") or {}
-        )
-        for passage in passages
-    ]
-    ids = [passage["id"] for passage in passages]
-
-    db_instance.add_documents(docs, ids=ids)
-    return len(passages)
-
-def ingest_text(text:str) -> int:
+def get_lexical_index(collection: str = COLLECTION) -> BM25Index:
+
+    with _lexical_lock:
+        # Registered before loading, so writes that land meanwhile queue up behind the load
+        index = lexical_indexes.setdefault(collection, BM25Index())
+    if not index.loaded:
+        with index.loading():
+            if not index.loaded:
+                _load_lexical_index(index, collection)
+                index.loaded = True
+    return index
+
+
+def _load_lexical_index(index: BM25Index, collection: str) -> None:
+    store = get_vector_store(collection)
+    offset = 0
+    while True:
+        found = store.get(include=("documents",), limit=LEXICAL_LOAD_BATCH, offset=offset)
+        for doc_id, text in zip(found["ids"], found["documents"]):
+            index.upsert(doc_id, text or "")
+        if len(found["ids"]) < LEXICAL_LOAD_BATCH:
+            return
+        offset += LEXICAL_LOAD_BATCH
+
+
+def _index_lexical(collection: str, ids: list[str], texts: list[str] | None = None) -> None:
+    # An index that hasn't been loaded yet will read these documents from the store anyway
+    index = lexical_indexes.get(collection)
+    if index is None:
+        return
+    if texts is None:
+        for doc_id in ids:
+            index.delete(doc_id)
+    else:
+        for doc_id, text in zip(ids, texts):
+            index.upsert(doc_id, text)
+
+
+def bump_collection_version(collection: str) -> None:
+    collection_versions[collection] = collection_versions.get(collection, 0) + 1
+    for listener in collection_write_listeners:
+        listener(collection)
+
+
+def tag_entities(passages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Add NER entities to each passage's metadata; on NER failure the passages are returned untagged"""
+    if not INDEX_ENTITIES_AT_INGEST or not passages:
+        return passages
+    try:
+        groups = extract_entities_many([passage["text"] for passage in passages])
+    except Exception as error:
+        _record_ner_failure(error)
+        return passages
+    return [_with_entities(passage, entities) for passage, entities in zip(passages, groups)]
+
+async def atag_entities(passages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Async tag_entities - concurrent passages share NER batches"""
+    if not INDEX_ENTITIES_AT_INGEST or not passages:
+        return passages
+    try:
+        groups = await asyncio.gather(*(aextract_entities(passage["text"]) for passage in passages))
+    except Exception as error:
+        _record_ner_failure(error)
+        return passages
+    return [_with_entities(passage, entities) for passage, entities in zip(passages, groups)]
+
+def _with_entities(passage: dict[str, Any], entities: dict[str, list[str]]) -> dict[str, Any]:
+    return {**passage, "metadata": {**(passage.get("metadata") or {}), **entity_metadata(entities)}}
+
+def _record_ner_failure(error: Exception) -> None:
+    entity_index.stats["ner_failures"] += 1
+    entity_index.last_error = str(error)
+
+def _index_entities(collection: str, ids: list[str], metadatas: list[dict[str, Any] | None]) -> None:
+    # Chunks written without entities still replace (i.e. clear) any stale index rows
+    entity_index.replace(collection, {
+        chunk_id: entities_from_metadata(metadata) or {}
+        for chunk_id, metadata in zip(ids, metadatas)
+    })
 
-    text = text.strip()
-    if not text:
-        return 0
+def ingest_json_service(passages: list[dict[str, Any]], collection:str = COLLECTION) -> int:
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=100,
-        separators=["\n\n", "\n", " ", ""]
+    passages = tag_entities(passages)
+    texts = [passage["text"] for passage in passages]
+    upsert_embedded(
+        collection,
+        [passage["id"] for passage in passages],
+        texts,
+        EMBEDDING.embed_documents(texts),
+        [passage.get("metadata") or {} for passage in passages]
     )
+    return len(passages)
 
-    chunks = splitter.split_text(text)
+def filterable_metadata(metadata: dict[str, Any] | None) -> dict[str, Any]:
+    """
+    Give the fields search filters use one type in every collection: an
+    integer journal_id, and a created_at_ts (epoch seconds) next to any
+    ISO created_at, which range filters compare against.
+    """
+    metadata = dict(metadata or {})
+    journal_id = metadata.get("journal_id")
+    if isinstance(journal_id, str) and journal_id.strip().isdigit():
+        metadata["journal_id"] = int(journal_id)
+    if "created_at_ts" not in metadata and isinstance(metadata.get("created_at"), str):
+        try:
+            metadata["created_at_ts"] = datetime.fromisoformat(metadata["created_at"]).timestamp()
+        except ValueError:
+            pass
+    return metadata
+
+def upsert_embedded(
+        collection: str,
+        ids: list[str],
+        texts: list[str],
+        embeddings: list[list[float]],
+        metadatas: list[dict[str, Any]]
+) -> None:
+    """Write documents whose embeddings were already computed, skipping the store's own embedding call"""
+    metadatas = [filterable_metadata(metadata) for metadata in metadatas]
+    get_vector_store(collection).upsert(ids, texts, embeddings, metadatas)
+    _index_entities(collection, ids, metadatas)
+    _index_lexical(collection, ids, texts)
+    bump_collection_version(collection)
+
+def delete_embedded(collection: str, ids: list[str]) -> None:
+    """Remove documents (and their entity index rows) by ID"""
+    if not ids:
+        return
+    get_vector_store(collection).delete(ids)
+    entity_index.remove(collection, ids)
+    _index_lexical(collection, ids)
+    bump_collection_version(collection)
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_id(chunk_hash: str, document_id: str | None = None, occurrence: int = 0) -> str:
+    """
+    Full-width chunk ID. Chunks of a document are keyed by the document too,
+    so the same text in two documents is two entries rather than one
+    silently overwriting the other; the occurrence number keeps repeated
+    text within one document apart.
+    """
+    if document_id is None:
+        return f"chunk_{chunk_hash}"
+    raw = f"{document_id}\0{chunk_hash}\0{occurrence}"
+    return f"chunk_{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+def chunk_text(
+        text: str,
+        start_index: int = 0,
+        document_id: str | None = None,
+        chunking: dict[str, Any] | None = None,
+        occurrences: dict[str, int] | None = None
+) -> list[dict[str, Any]]:
+    """
+    Split raw text into passages ready for ingestion (freewriting chunking
+    unless `chunking` is given). A document chunked piece by piece passes
+    the same `occurrences` dict to every call, so text repeated across
+    pieces still gets distinct IDs.
+    """
+
+    chunking = chunking or chunking_for("freewriting")
+    chunks = split_text(text, chunking)
 
     passages = []
-
-    for index, chunk in enumerate(chunks):
-
-        content_hash = hashlib.md5(chunk.encode("utf-8")).hexdigest()[:8]
-        chunk_id = f"chunk_{content_hash}"
+    occurrences = {} if occurrences is None else occurrences
+    # Raw text has no date of its own, so its chunks are dated by when they were ingested
+    created_at = datetime.now()
+
+    for index, chunk in enumerate(chunks, start=start_index):
+
+        chunk_hash = content_hash(chunk)
+        occurrence = occurrences.get(chunk_hash, 0)
+        occurrences[chunk_hash] = occurrence + 1
+
+        metadata = {
+            "chunk_index": index,
+            "content_hash": chunk_hash,
+            "chunker": chunker_name(chunking),
+            "source":"raw_text_ingestion",
+            "created_at": created_at.isoformat(),
+            "created_at_ts": created_at.timestamp()
+        }
+        if document_id is not None:
+            metadata["document_id"] = document_id
 
         passages.append({
-            "id": chunk_id,
+            "id": chunk_id(chunk_hash, document_id, occurrence),
             "text": chunk,
-            "metadata": {
-                "chunk_index": index,
-                "source":"raw_text_ingestion"
-            }
+            "metadata": metadata
         })
 
-    return ingest_json_service(passages, collection="freewriting")
-
-def search(query: str, k: int = 10, collection:str = COLLECTION) -> list[dict[str, Any]]:
-
-    db_instance = get_vector_store(collection)
+    return passages
+
+def ingest_document(
+        text: str,
+        document_id: str | None = None,
+        collection: str = "freewriting",
+        chunking: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """
+    Ingest a whole document, or a new version of one.
+
+    The text is chunked and diffed against the chunks stored for the
+    document: unchanged chunks are skipped (chunks that only moved get
+    their chunk_index updated), chunks that disappeared are deleted, and
+    only new chunks are written. A new chunk whose text is already stored
+    elsewhere in the collection reuses that vector; the rest are embedded.
+    Without a document_id the document is identified by its content.
+    """
+    chunking = chunking or chunking_for(collection)
+    text = text.strip()
+    document_id = document_id or f"doc_{content_hash(text)}"
+    report = {
+        "document_id": document_id,
+        "version": 0,
+        "chunker": chunker_name(chunking),
+        "chunks": 0,
+        "embedded": 0,
+        "reused": 0,
+        "skipped": 0,
+        "deleted": 0
+    }
+    if not text:
+        return report
+
+    with _document_lock:
+        stored = document_index.get(collection, document_id)
+        previous = document_index.chunks(collection, document_id)
+        passages = chunk_text(text, document_id=document_id, chunking=chunking)
+        current = {passage["id"] for passage in passages}
+
+        new = [passage for passage in passages if passage["id"] not in previous]
+        moved = [
+            passage for passage in passages
+            if passage["id"] in previous and previous[passage["id"]][1] != passage["metadata"]["chunk_index"]
+        ]
+        removed = [doc_id for doc_id in previous if doc_id not in current]
+
+        if removed:
+            delete_embedded(collection, removed)
+        if moved:
+            # Position-only changes keep their vectors and entities
+            get_vector_store(collection).update_metadata(
+                [passage["id"] for passage in moved],
+                [{"chunk_index": passage["metadata"]["chunk_index"]} for passage in moved]
+            )
+            bump_collection_version(collection)
+        if new:
+            report["reused"] = _write_new_chunks(collection, new)
+
+        changed = bool(new or moved or removed) or stored is None
+        version = (stored["version"] if stored else 0) + (1 if changed else 0)
+        if changed:
+            document_index.replace(
+                collection,
+                document_id,
+                version,
+                content_hash(text),
+                [(passage["id"], passage["metadata"]["content_hash"], passage["metadata"]["chunk_index"]) for passage in passages]
+            )
+
+    report.update({
+        "version": version,
+        "chunks": len(passages),
+        "embedded": len(new) - report["reused"],
+        "skipped": len(passages) - len(new),
+        "deleted": len(removed)
+    })
+    return report
+
+def record_document(
+        collection: str,
+        document_id: str,
+        document_hash: str,
+        chunks: list[tuple[str, str, int]]
+) -> dict[str, Any]:
+    """
+    Record a document whose chunks were already written (by a bulk upload)
+    as its next version, deleting the chunks of the previous version that
+    are no longer part of it.
+    """
+    with _document_lock:
+        stored = document_index.get(collection, document_id)
+        previous = document_index.chunks(collection, document_id)
+        current = {chunk[0]: (chunk[1], chunk[2]) for chunk in chunks}
+        removed = [doc_id for doc_id in previous if doc_id not in current]
+
+        if removed:
+            delete_embedded(collection, removed)
+        changed = previous != current or stored is None
+        version = (stored["version"] if stored else 0) + (1 if changed else 0)
+        if changed:
+            document_index.replace(collection, document_id, version, document_hash, chunks)
+
+    return {"document_id": document_id, "version": version, "deleted": len(removed)}
+
+def _write_new_chunks(collection: str, passages: list[dict[str, Any]]) -> int:
+    """Write chunks, copying vector and entities from an identical stored chunk where there is one"""
+    existing = document_index.find_content(collection, [passage["metadata"]["content_hash"] for passage in passages])
+    stored = {}
+    if existing:
+        found = get_vector_store(collection).get(ids=list(set(existing.values())), include=("embeddings", "metadatas"))
+        stored = {
+            doc_id: (embedding, metadata or {})
+            for doc_id, embedding, metadata in zip(found["ids"], found["embeddings"], found["metadatas"])
+        }
 
-    results = db_instance.similarity_search_with_score(query, k=k)
+    embeddings: list[Any] = []
+    to_embed = []
+    for position, passage in enumerate(passages):
+        source = stored.get(existing.get(passage["metadata"]["content_hash"]))
+        if source is None:
+            embeddings.append(None)
+            to_embed.append(position)
+            continue
+        embeddings.append(list(source[0]))
+        entities = entities_from_metadata(source[1])
+        if entities is not None:
+            passages[position] = _with_entities(passage, entities)
+
+    if to_embed:
+        for position, embedding in zip(to_embed, EMBEDDING.embed_documents([passages[position]["text"] for position in to_embed])):
+            embeddings[position] = embedding
+        for position, passage in zip(to_embed, tag_entities([passages[position] for position in to_embed])):
+            passages[position] = passage
+
+    upsert_embedded(
+        collection,
+        [passage["id"] for passage in passages],
+        [passage["text"] for passage in passages],
+        embeddings,
+        [passage["metadata"] for passage in passages]
+    )
+    return len(passages) - len(to_embed)
+
+def ingest_text(
+        text: str,
+        document_id: str | None = None,
+        collection: str = "freewriting",
+        strategy: str | None = None,
+        chunk_size: int | None = None,
+        chunk_overlap: int | None = None
+) -> dict[str, Any]:
+    """Ingest raw text with the collection's chunking, optionally overridden for this request"""
+    chunking = chunking_for(collection, strategy=strategy, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return ingest_document(text, document_id, collection, chunking)
+
+def search(
+        query: str,
+        k: int = 10,
+        collection:str = COLLECTION,
+        mode: str | None = None,
+        filters: dict[str, Any] | None = None
+) -> list[dict[str, Any]]:
+    """
+    Retrieve the top k chunks. "score" is the vector distance (lower is closer) in
+    vector mode, the BM25 score in lexical mode and the fused RRF score in hybrid mode.
+    If the embedding call fails, lexical results are returned instead.
+    `filters` (see metadata_where) restrict every retriever to the matching chunks.
+    """
+    mode = _retrieval_mode(mode)
+    where = metadata_where(filters)
+    if mode == "lexical":
+        return _lexical_search(query, k, collection, where)
+
+    try:
+        vector = _vector_search(query, k if mode == "vector" else k * HYBRID_CANDIDATES, collection, where=where)
+    except Exception:
+        retrieval_stats["lexical_fallbacks"] += 1
+        return _lexical_search(query, k, collection, where)
+
+    if mode == "vector":
+        return vector
+    return _fuse(collection, vector, _lexical_hits(query, k * HYBRID_CANDIDATES, collection, where), k)
+
+def _retrieval_mode(mode: str | None) -> str:
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    retrieval_stats[mode] += 1
+    return mode
+
+def metadata_where(filters: dict[str, Any] | None) -> dict[str, Any] | None:
+    """
+    Turn search filters into a vector-store `where`. Accepted filters:
+    journal_id, source (e.g. "raw_text_ingestion"), created_from /
+    created_to (datetimes or epoch seconds, inclusive, on created_at_ts)
+    and entities (labels such as "PERSON" that every result must mention).
+    """
+    if not filters:
+        return None
+    conditions = []
+    if filters.get("journal_id") is not None:
+        conditions.append({"journal_id": {"$eq": int(filters["journal_id"])}})
+    if filters.get("source"):
+        conditions.append({"source": {"$eq": filters["source"]}})
+    for key, operator in (("created_from", "$gte"), ("created_to", "$lte")):
+        value = filters.get(key)
+        if value is not None:
+            conditions.append({"created_at_ts": {operator: value.timestamp() if isinstance(value, datetime) else float(value)}})
+    for label in filters.get("entities") or ():
+        normalized = normalize_label(label)
+        if normalized is None:
+            raise ValueError(f"Unknown entity label: {label}")
+        conditions.append({f"has_{normalized.lower()}": {"$eq": True}})
+
+    if not conditions:
+        return None
+    retrieval_stats["filtered"] += 1
+    # Chroma wants at least two conditions under "$and"
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def _vector_search(
+        query: str,
+        k: int,
+        collection: str,
+        embedding: list[float] | None = None,
+        where: dict[str, Any] | None = None
+) -> list[dict[str, Any]]:
+    # A precomputed query embedding lets several collections share a single embedding call
+    if embedding is None:
+        embedding = EMBEDDING.embed_query(query)
+    return get_vector_store(collection).query(embedding, k, where)
+
+def _lexical_hits(query: str, k: int, collection: str, where: dict[str, Any] | None = None) -> list[tuple[str, float]]:
+    """BM25 (ID, score) hits, scored only among the chunks matching `where`"""
+    allowed = None
+    if where:
+        allowed = set(get_vector_store(collection).get(where=where, include=())["ids"])
+        if not allowed:
+            return []
+    return get_lexical_index(collection).search(query, k, allowed)
+
+def _lexical_search(query: str, k: int, collection: str, where: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+    hits = _lexical_hits(query, k, collection, where)
+    chunks = {chunk["id"]: chunk for chunk in get_chunks([doc_id for doc_id, _ in hits], collection)}
+    return [{**chunks[doc_id], "score": score} for doc_id, score in hits if doc_id in chunks]
+
+def _fuse(collection: str, vector: list[dict[str, Any]], lexical: list[tuple[str, float]], k: int) -> list[dict[str, Any]]:
+    """Reciprocal rank fusion of the vector results and the lexical (ID, score) hits"""
+    fused: dict[str, float] = {}
+    for ranking in ([result["id"] for result in vector], [doc_id for doc_id, _ in lexical]):
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (RRF_K + rank)
+
+    top = heapq.nlargest(k, fused.items(), key=lambda item: item[1])
+    # Texts of lexical-only hits still have to be read from the store
+    known = {result["id"]: result for result in vector}
+    known.update({chunk["id"]: chunk for chunk in get_chunks([doc_id for doc_id, _ in top if doc_id not in known], collection)})
+    return [{**known[doc_id], "score": score} for doc_id, score in top if doc_id in known]
+
+def get_chunks(ids: list[str], collection: str = COLLECTION) -> list[dict[str, Any]]:
+    """Fetch chunks by ID (in the given order), without a similarity search"""
+    if not ids:
+        return []
+    found = get_vector_store(collection).get(ids=ids, include=("documents", "metadatas"))
+    by_id = {
+        chunk_id: {"id": chunk_id, "text": text, "metadata": metadata}
+        for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+    }
+    return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+def get_embeddings(ids: list[str], collection: str = COLLECTION) -> dict[str, list[float]]:
+    """Stored vectors by ID, so reranking retrieved chunks needs no embedding calls"""
+    if not ids:
+        return {}
+    found = get_vector_store(collection).get(ids=ids, include=("embeddings",))
+    return dict(zip(found["ids"], found["embeddings"]))
+
+async def asearch(
+        query: str,
+        k: int = 10,
+        collection: str = COLLECTION,
+        mode: str | None = None,
+        embedding: list[float] | None = None,
+        filters: dict[str, Any] | None = None
+) -> list[dict[str, Any]]:
+    """
+    Async search - runs the blocking vector-store and BM25 queries on the search executor.
+    In hybrid mode both retrievers run side by side; vector retrieval that fails or
+    takes longer than VECTOR_TIMEOUT_SECONDS falls back to lexical results.
+    """
+    results, _ = await _asearch_timed(query, k, collection, mode, embedding, filters)
+    return results
+
+async def _asearch_timed(
+        query: str,
+        k: int,
+        collection: str,
+        mode: str | None,
+        embedding: list[float] | None,
+        filters: dict[str, Any] | None
+) -> tuple[list[dict[str, Any]], str]:
+    mode = _retrieval_mode(mode)
+    where = metadata_where(filters)
+    with timed(retrieval_seconds, "retrieval", "search", mode=mode, collection=collection):
+        return await _asearch(query, k, collection, mode, embedding, where)
+
+async def _asearch(
+        query: str,
+        k: int,
+        collection: str,
+        mode: str,
+        embedding: list[float] | None,
+        where: dict[str, Any] | None = None
+) -> tuple[list[dict[str, Any]], str]:
+    """The results and the mode that produced them, which is "lexical" after a fallback"""
+    loop = asyncio.get_running_loop()
+    if mode == "lexical":
+        return await loop.run_in_executor(search_executor, partial(_lexical_search, query, k, collection, where)), "lexical"
+
+    candidates = k if mode == "vector" else k * HYBRID_CANDIDATES
+    vector_future = loop.run_in_executor(search_executor, partial(_vector_search, query, candidates, collection, embedding, where))
+    lexical_future = None
+    if mode == "hybrid":
+        lexical_future = loop.run_in_executor(search_executor, partial(_lexical_hits, query, candidates, collection, where))
+
+    try:
+        vector = await asyncio.wait_for(vector_future, VECTOR_TIMEOUT_SECONDS)
+    except Exception:
+        retrieval_stats["lexical_fallbacks"] += 1
+        return await loop.run_in_executor(search_executor, partial(_lexical_search, query, k, collection, where)), "lexical"
+
+    if lexical_future is None:
+        return vector, mode
+    lexical = await lexical_future
+    return await loop.run_in_executor(search_executor, partial(_fuse, collection, vector, lexical, k)), mode
+
+async def asearch_collections(
+        query: str,
+        k: int,
+        collections: list[str],
+        mode: str | None = None,
+        filters: dict[str, Any] | None = None
+) -> list[dict[str, Any]]:
+    """
+    Search several collections concurrently and merge the results.
+
+    The query is embedded once and that vector is reused for every
+    collection, so the call takes as long as the slowest collection search.
+    Results are deduplicated by content hash, tagged with their collection
+    and ranked by a "relevance" in [0, 1] that is comparable across collections.
+    Each collection's scores are normalized by the mode that actually produced
+    them, so one that fell back to lexical search doesn't skew the ranking.
+    """
+    mode = mode or RETRIEVAL_MODE
+    embedding = None
+    if mode != "lexical":
+        try:
+            embedding = await asyncio.wait_for(EMBEDDING.aembed_query(query), VECTOR_TIMEOUT_SECONDS)
+        except Exception:
+            retrieval_stats["lexical_fallbacks"] += 1
+            mode = "lexical"
+
+    per_collection = await asyncio.gather(
+        *(_asearch_timed(query, k, collection, mode, embedding, filters) for collection in collections)
+    )
 
-    return [
-        {
-            "text": result[0].page_content,
-            "metadata": result[0].metadata,
-            "score": result[1]
-        }
-        for result in results
-    ]
+    merged: dict[str, dict[str, Any]] = {}
+    for collection, (results, used_mode) in zip(collections, per_collection):
+        for result, relevance in zip(results, _relevance(used_mode, results)):
+            text_hash = content_hash(result["text"])
+            if text_hash not in merged or relevance > merged[text_hash]["relevance"]:
+                merged[text_hash] = {**result, "collection": collection, "relevance": relevance}
+
+    return heapq.nlargest(k, merged.values(), key=lambda result: result["relevance"])
+
+def _relevance(mode: str, results: list[dict[str, Any]]) -> list[float]:
+    """Map mode-specific scores onto [0, 1], higher is better"""
+    if mode == "vector":
+        # Every collection uses the same embedding model and metric, so distances compare directly
+        return [1 / (1 + result["score"]) for result in results]
+    if mode == "hybrid":
+        # RRF scores are rank-based; a document ranked first by both retrievers scores 2 / (RRF_K + 1)
+        return [result["score"] * (RRF_K + 1) / 2 for result in results]
+    # BM25 scores depend on each collection's term statistics, so scale by the collection's best
+    best = max((result["score"] for result in results), default=0.0)
+    return [result["score"] / best if best else 0.0 for result in results]
+
+def search_batch(queries: list[dict[str, Any]]) -> list[list[dict[str, Any]] | Exception]:
+    """
+    Search several queries at once, each a dict with "query" and optionally
+    "k", "collection", "mode" and "filters" (the arguments of search).
+
+    The texts of every non-lexical query are embedded in one call and each
+    collection is queried once for all of its queries, after which hybrid
+    queries are fused with their BM25 hits one by one. Queries whose
+    embedding or vector lookup fails get lexical results, as in search.
+    Results come back in input order; a query that fails on its own gets
+    its exception in its place instead of failing the batch.
+    """
+    results: list[list[dict[str, Any]] | Exception | None] = [None] * len(queries)
+    requests = []
+    for position, query in enumerate(queries):
+        try:
+            requests.append((
+                position,
+                query["query"],
+                query.get("k", 10),
+                query.get("collection") or COLLECTION,
+                _retrieval_mode(query.get("mode")),
+                metadata_where(query.get("filters"))
+            ))
+        except Exception as error:
+            results[position] = error
+
+    vector_requests = [request for request in requests if request[4] != "lexical"]
+    embeddings: dict[int, list[float]] = {}
+    if vector_requests:
+        try:
+            vectors = EMBEDDING.embed_documents([request[1] for request in vector_requests])
+            embeddings = {request[0]: vector for request, vector in zip(vector_requests, vectors)}
+        except Exception:
+            retrieval_stats["lexical_fallbacks"] += len(vector_requests)
+
+    # Queries of one collection with the same filter share a vector-store query
+    by_collection: dict[tuple[str, str], list[tuple]] = {}
+    for request in vector_requests:
+        if request[0] in embeddings:
+            by_collection.setdefault((request[3], json.dumps(request[5], sort_keys=True)), []).append(request)
+    vector: dict[int, list[dict[str, Any]]] = {}
+    for (collection, _), batch in by_collection.items():
+        try:
+            found = get_vector_store(collection).query_many(
+                [embeddings[request[0]] for request in batch],
+                [request[2] if request[4] == "vector" else request[2] * HYBRID_CANDIDATES for request in batch],
+                batch[0][5]
+            )
+            vector.update((request[0], hits) for request, hits in zip(batch, found))
+        except Exception:
+            retrieval_stats["lexical_fallbacks"] += len(batch)
+
+    for position, query, k, collection, mode, where in requests:
+        try:
+            if position not in vector:
+                results[position] = _lexical_search(query, k, collection, where)
+            elif mode == "vector":
+                results[position] = vector[position]
+            else:
+                lexical = _lexical_hits(query, k * HYBRID_CANDIDATES, collection, where)
+                results[position] = _fuse(collection, vector[position], lexical, k)
+        except Exception as error:
+            results[position] = error
+    return results
+
+async def search_many(
+        queries: list[dict[str, Any]],
+        batch_size: int = SEARCH_MANY_BATCH
+) -> AsyncIterator[tuple[int, list[dict[str, Any]] | Exception]]:
+    """
+    Async search_batch over any number of queries, yielding (index, results)
+    in input order as each batch of `batch_size` finishes. The next batch
+    is already being embedded and searched while the current one is consumed.
+    """
+    loop = asyncio.get_running_loop()
+    batches = [queries[start:start + batch_size] for start in range(0, len(queries), batch_size)]
+    if not batches:
+        return
+
+    def run(batch: list[dict[str, Any]]) -> asyncio.Future:
+        return loop.run_in_executor(search_executor, search_batch, batch)
+
+    pending = run(batches[0])
+    for number in range(len(batches)):
+        with timed(retrieval_seconds, "retrieval", "search_many", mode="batch", collection="*"):
+            results = await pending
+        if number + 1 < len(batches):
+            pending = run(batches[number + 1])
+        for offset, result in enumerate(results):
+            yield number * batch_size + offset, result
 
 # def extract_entities(text:str):
 #
@@ -102,40 +777,3 @@ def search(query: str, k: int = 10, collection:str = COLLECTION) -> list[dict[st
 #     ]
 #
 #     return entities
-
-# Load NER pipeline once at module level
-# Use aggregation_strategy instead of grouped_entities
-ner_pipeline = pipeline("ner", model="dslim/bert-base-NER", aggregation_strategy="simple")
-
-def extract_entities(text: str) -> dict:
-    """Extract named entities using transformers"""
-    entities_list = ner_pipeline(text)
-
-    entities = {
-        "PERSON": [],
-        "ORG": [],
-        "LOC": [],
-        "DATE": [],
-        "OTHER": []
-    }
-
-    for entity in entities_list:
-        entity_type = entity.get("entity_group", "")
-        entity_text = entity.get("word", "")
-
-        if entity_type in ["PER", "PERSON"]:
-            entities["PERSON"].append(entity_text)
-        elif entity_type in ["ORG", "ORGANIZATION"]:
-            entities["ORG"].append(entity_text)
-        elif entity_type in ["LOC", "LOCATION"]:
-            entities["LOC"].append(entity_text)
-        elif entity_type in ["DATE"]:
-            entities["DATE"].append(entity_text)
-        else:
-            entities["OTHER"].append(f"{entity_text} ({entity_type})")
-
-    # Remove duplicates while preserving order
-    for key in entities:
-        entities[key] = list(dict.fromkeys(entities[key]))
-
-    return entities
\ No newline at end of file
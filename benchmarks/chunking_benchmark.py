@@ -0,0 +1,142 @@
+"""
+Chunking benchmark: for every chunking configuration, how many chunks a corpus
+turns into, what embedding them costs, and how well the chunks answer a
+labeled query set.
+
+A query counts as answered when one of its top-k chunks (by cosine similarity)
+contains the query's answer text. Without --corpus/--queries a synthetic
+journal with planted facts is generated. --embeddings hashing runs offline;
+--embeddings ollama measures the real embedding model.
+
+    python -m benchmarks.chunking_benchmark --strategies recursive,sentence,paragraph \\
+        --sizes 300,500,800 --overlaps 0,100 --embeddings hashing --output chunking.json
+
+Query files are JSON lists of {"query": "...", "answer": "..."}.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from app.services.chunking_service import CHUNK_STRATEGIES, chunker_name, split_text
+from benchmarks.corpus import synthetic_corpus
+from benchmarks.fakes import HashingEmbeddings
+
+CHARS_PER_TOKEN = 4
+
+
+def load_corpus(pattern: str) -> list[str]:
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as source:
+            texts.append(source.read())
+    return texts
+
+
+# =========MEASUREMENT=========
+
+def measure(texts: list[str], queries: list[dict[str, str]], query_vectors: np.ndarray, config: dict, embeddings, k: int) -> dict:
+    started = time.perf_counter()
+    chunks = [chunk for text in texts for chunk in split_text(text, config)]
+    chunk_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matrix = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    embed_seconds = time.perf_counter() - started
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    hits = 0
+    reciprocal_ranks = 0.0
+    context_chars = 0
+    for query, scores in zip(queries, query_vectors @ matrix.T):
+        top = np.argsort(-scores)[:k]
+        context_chars += sum(len(chunks[index]) for index in top)
+        answer = query["answer"].lower()
+        for rank, index in enumerate(top, start=1):
+            if answer in chunks[index].lower():
+                hits += 1
+                reciprocal_ranks += 1 / rank
+                break
+
+    embedded_chars = sum(len(chunk) for chunk in chunks)
+    return {
+        "chunker": chunker_name(config),
+        **config,
+        "chunks": len(chunks),
+        "mean_chunk_chars": round(embedded_chars / len(chunks), 1) if chunks else 0.0,
+        # Overlap makes this larger than the corpus; it is what the embedding model is billed for
+        "embedded_tokens": embedded_chars // CHARS_PER_TOKEN,
+        "chunk_seconds": round(chunk_seconds, 4),
+        "embed_seconds": round(embed_seconds, 4),
+        f"recall_at_{k}": round(hits / len(queries), 4) if queries else None,
+        "mrr": round(reciprocal_ranks / len(queries), 4) if queries else None,
+        # Retrieved text per query at k, i.e. what the prompt would carry before context packing
+        "context_tokens_at_k": (context_chars // len(queries)) // CHARS_PER_TOKEN if queries else None
+    }
+
+
+def build_embeddings(kind: str, model: str):
+    if kind == "hashing":
+        return HashingEmbeddings()
+    from langchain_ollama import OllamaEmbeddings
+    return OllamaEmbeddings(model=model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strategies", default=",".join(CHUNK_STRATEGIES))
+    parser.add_argument("--sizes", default="300,500,800")
+    parser.add_argument("--overlaps", default="0,100")
+    parser.add_argument("--corpus", help="glob of text files, one document each (default: synthetic)")
+    parser.add_argument("--queries", help="JSON file of {query, answer} pairs (required with --corpus)")
+    parser.add_argument("--documents", type=int, default=50, help="synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embeddings", choices=["hashing", "ollama"], default="hashing")
+    parser.add_argument("--model", default="nomic-embed-text", help="Ollama embedding model")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    if args.corpus:
+        if not args.queries:
+            parser.error("--queries is required with --corpus")
+        texts = load_corpus(args.corpus)
+        with open(args.queries, encoding="utf-8") as source:
+            queries = json.load(source)
+    else:
+        texts, queries = synthetic_corpus(args.documents, args.seed)
+
+    embeddings = build_embeddings(args.embeddings, args.model)
+    query_vectors = np.asarray(embeddings.embed_documents([query["query"] for query in queries]), dtype=np.float32)
+    query_vectors /= np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+
+    results = []
+    for strategy in args.strategies.split(","):
+        for size in map(int, args.sizes.split(",")):
+            for overlap in map(int, args.overlaps.split(",")):
+                if overlap >= size:
+                    continue
+                config = {"strategy": strategy, "chunk_size": size, "chunk_overlap": overlap}
+                results.append(measure(texts, queries, query_vectors, config, embeddings, args.k))
+
+    report = {
+        "documents": len(texts),
+        "corpus_tokens": sum(len(text) for text in texts) // CHARS_PER_TOKEN,
+        "queries": len(queries),
+        "k": args.k,
+        "embeddings": args.embeddings if args.embeddings == "hashing" else args.model,
+        "results": results
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Synthetic journal corpora for the benchmarks: deterministic for a given seed,
+with one planted fact per document and a labeled query that asks for it.
+"""
+import random
+
+FIRST_NAMES = ["Ada", "Basil", "Cleo", "Dorian", "Edith", "Felix", "Greta", "Hugo", "Iris", "Jonah", "Kit", "Lena"]
+LAST_NAMES = ["Marsh", "Quill", "Thorne", "Vale", "Wren", "Ashby", "Crane", "Hollis"]
+PLACES = ["lighthouse", "night market", "old observatory", "ferry dock", "rose garden", "train depot",
+          "bookbinder's shop", "salt flats", "chapel ruins", "rooftop cafe"]
+TOPICS = ["comets", "my grandmother's recipes", "the war", "tarot", "sailing", "unfinished novels", "bees", "insomnia"]
+FILLER = ("the morning was grey and I wrote slowly while the kettle hissed and the street below "
+          "filled with bicycles and rain and I kept thinking about nothing in particular").split()
+
+
+def synthetic_corpus(documents: int, seed: int) -> tuple[list[str], list[dict[str, str]]]:
+    """Journal-like documents with one planted fact each, and a query per fact"""
+    rng = random.Random(seed)
+    people = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    rng.shuffle(people)
+    texts, queries = [], []
+    for number in range(documents):
+        person = people[number % len(people)]
+        place, topic = rng.choice(PLACES), rng.choice(TOPICS)
+        paragraphs = []
+        for _ in range(rng.randint(3, 7)):
+            sentences = [
+                " ".join(rng.choice(FILLER) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                for _ in range(rng.randint(2, 6))
+            ]
+            paragraphs.append(" ".join(sentences))
+        fact = f"Today I met {person} at the {place} and we talked about {topic}."
+        spot = rng.randrange(len(paragraphs))
+        paragraphs[spot] = f"{paragraphs[spot]} {fact}"
+        texts.append("\n\n".join(paragraphs))
+        queries.append({"query": f"Where did I meet {person}, and what did we talk about?", "answer": f"{person} at the {place}"})
+    return texts, queries
@@ -0,0 +1,147 @@
+"""
+Offline stand-ins for the Ollama and NER models, so benchmarks run without a
+model server or model weights. Each fake can be given a latency so the numbers
+keep the shape of the real system's.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_CAPITALIZED = re.compile(r"\b[A-Z][a-z]+\b")
+_WORD_SPANS = re.compile(r"\S+")
+CHARS_PER_TOKEN = 4
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings: each word is hashed into one of
+    `size` buckets. Texts sharing words get similar vectors, which is enough
+    for relative comparisons (e.g. between chunking settings) offline.
+    `latency_seconds` is slept once per call, like an embedding request.
+    """
+
+    def __init__(self, size: int = 256, latency_seconds: float = 0.0):
+        self.size = size
+        self.latency_seconds = latency_seconds
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.size
+        for word in _TOKEN.findall(text.lower()):
+            bucket = int.from_bytes(hashlib.md5(word.encode("utf-8")).digest()[:4], "little")
+            vector[bucket % self.size] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeChatOllama(BaseChatModel):
+    """
+    Chat model that answers with filler after a delay shaped like a local LLM:
+    a fixed first-token latency, prompt prefill at `prefill_tokens_per_second`,
+    then `answer_tokens` tokens generated at `tokens_per_second`.
+    """
+
+    first_token_seconds: float = 0.05
+    prefill_tokens_per_second: float = 2000.0
+    tokens_per_second: float = 40.0
+    answer_tokens: int = 32
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-ollama"
+
+    def _prefill_seconds(self, messages: list[BaseMessage]) -> float:
+        prompt_tokens = sum(len(str(message.content)) for message in messages) / CHARS_PER_TOKEN
+        return self.first_token_seconds + prompt_tokens / self.prefill_tokens_per_second
+
+    def _tokens(self) -> list[str]:
+        return [f"verse{index} " for index in range(self.answer_tokens)]
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._tokens())))])
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._prefill_seconds(messages) + self.answer_tokens / self.tokens_per_second)
+        return self._result()
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._prefill_seconds(messages) + self.answer_tokens / self.tokens_per_second)
+        return self._result()
+
+    async def _astream(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._prefill_seconds(messages))
+        for token in self._tokens():
+            await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class FakeNERPipeline:
+    """Tags every capitalized word as a person, sleeping `latency_seconds` per batch"""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+
+    def __call__(self, texts: str | list[str], **kwargs: Any):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if isinstance(texts, str):
+            return self._tag(texts)
+        return [self._tag(text) for text in texts]
+
+    @staticmethod
+    def _tag(text: str) -> list[dict[str, Any]]:
+        return [
+            {"entity_group": "PER", "word": match.group(), "start": match.start(), "end": match.end(), "score": 0.9}
+            for match in _CAPITALIZED.finditer(text)
+        ]
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer with the offset mapping the NER segmenter reads"""
+
+    def __call__(self, text: str, return_offsets_mapping: bool = False, add_special_tokens: bool = True, **kwargs: Any):
+        offsets = [(match.start(), match.end()) for match in _WORD_SPANS.finditer(text)]
+        return {"input_ids": list(range(len(offsets))), "offset_mapping": offsets}
+
+
+def install_fakes(
+        embedding_latency: float = 0.0,
+        ner_latency: float = 0.0,
+        chat: FakeChatOllama | None = None
+) -> None:
+    """
+    Swap the fakes in for every lazily-loaded model. Imports the app, so the
+    working directory should already be wherever the stores may be written.
+    """
+    from app.services import ner_service
+    from app.services.model_registry import models
+    # Importing the graphs registers the chat model
+    import app.services.langgraph_service  # noqa: F401
+    import app.services.vector_langgraph_service  # noqa: F401
+
+    models["embeddings"].override(HashingEmbeddings(latency_seconds=embedding_latency))
+    models["chat_llm"].override(chat or FakeChatOllama())
+    models["ner_tokenizer"].override(FakeTokenizer())
+    # NER runs on an in-process thread, reading the worker-side pipeline global
+    ner_service._worker_pipeline = FakeNERPipeline(ner_latency)
+    models["ner"].override(ThreadPoolExecutor(max_workers=1, thread_name_prefix="ner"))
@@ -0,0 +1,249 @@
+"""
+Retrieval and RAG benchmark: latency percentiles, throughput under concurrency
+and memory for ingestion, search, NER and the three compiled graphs.
+
+Every model is replaced by an offline fake (benchmarks/fakes.py), with
+configurable embedding/NER latency and a chat model with a configurable
+first-token latency, prefill rate and token rate, so the suite runs without
+Ollama or model weights. Stores are written to a fresh temporary directory.
+Results are JSON, so runs on two commits can be diffed.
+
+    python -m benchmarks.rag_benchmark --documents 200 --requests 200 --concurrency 8 --output rag.json
+
+Scenarios (--scenarios, comma-separated, default all): ingest_json, ingest_text,
+extract_entities, search_vector, search_lexical, search_hybrid, chat_graph,
+search_text_graph, ner_graph.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.corpus import synthetic_corpus  # noqa: E402
+from benchmarks.fakes import FakeChatOllama, install_fakes  # noqa: E402
+
+SCENARIOS = (
+    "ingest_json", "ingest_text", "extract_entities",
+    "search_vector", "search_lexical", "search_hybrid",
+    "chat_graph", "search_text_graph", "ner_graph"
+)
+
+
+# =========MEASUREMENT=========
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_load(call: Callable[[int], Awaitable[Any]], requests: int, concurrency: int, trace_memory: bool) -> dict[str, Any]:
+    """Run `call(0..requests-1)` with at most `concurrency` in flight and summarize the latencies"""
+    latencies: list[float] = []
+    errors: list[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(number: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call(number)
+            except Exception as error:
+                errors.append(f"{type(error).__name__}: {error}")
+                return
+            latencies.append(time.perf_counter() - started)
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(number) for number in range(requests)))
+    wall = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    report: dict[str, Any] = {"requests": requests, "concurrency": concurrency, "errors": len(errors)}
+    if latencies:
+        report.update({
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+            "max_ms": round(max(latencies) * 1000, 3),
+            "qps": round(len(latencies) / wall, 2) if wall else None
+        })
+    report["wall_s"] = round(wall, 3)
+    if peak is not None:
+        report["peak_alloc_mb"] = round(peak / (1024 * 1024), 2)
+    report["max_rss_mb"] = max_rss_mb()
+    if errors:
+        report["first_error"] = errors[0]
+    return report
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =========SCENARIOS=========
+
+def build_scenarios(texts: list[str], queries: list[dict[str, str]], args) -> dict[str, tuple[Callable[[int], Awaitable[Any]], int]]:
+    """Scenario name -> (one request, number of requests)"""
+    from app.services.langgraph_service import langgraph
+    from app.services.ner_service import extract_entities
+    from app.services.vector_langgraph_service import search_text_graph, ner_search_graph
+    from app.services.vectordb_service import asearch, ingest_json_service, ingest_text
+
+    batch = args.ingest_batch
+
+    def query(number: int) -> str:
+        # A distinct suffix per request keeps the embedding and answer caches from answering for us
+        return f"{queries[number % len(queries)]['query']} #{number}"
+
+    def thread(name: str, number: int) -> dict[str, Any]:
+        return {"configurable": {"thread_id": f"bench:{name}:{number}"}}
+
+    async def ingest_json(number: int):
+        records = [
+            {"id": f"bench_{number}_{offset}", "text": text, "metadata": {"source": "benchmark"}}
+            for offset, text in enumerate(texts[number * batch:(number + 1) * batch])
+        ]
+        await asyncio.to_thread(ingest_json_service, records)
+
+    async def ingest_document(number: int):
+        await asyncio.to_thread(ingest_text, texts[number], f"bench-doc-{number}")
+
+    async def entities(number: int):
+        await asyncio.to_thread(extract_entities, texts[number % len(texts)])
+
+    def search(mode: str, collection: str):
+        async def run(number: int):
+            await asearch(query(number), k=args.k, collection=collection, mode=mode)
+        return run
+
+    async def chat(number: int):
+        await langgraph.ainvoke({"query": query(number), "mode": None}, config=thread("chat", number))
+
+    async def search_text(number: int):
+        await search_text_graph.ainvoke({"query": query(number), "k": args.k}, config=thread("search_text", number))
+
+    async def ner(number: int):
+        await ner_search_graph.ainvoke({"query": query(number), "k": args.k}, config=thread("ner", number))
+
+    return {
+        "ingest_json": (ingest_json, -(-len(texts) // batch)),
+        "ingest_text": (ingest_document, len(texts)),
+        "extract_entities": (entities, args.requests),
+        "search_vector": (search("vector", "freewriting"), args.requests),
+        "search_lexical": (search("lexical", "freewriting"), args.requests),
+        "search_hybrid": (search("hybrid", "freewriting"), args.requests),
+        "chat_graph": (chat, args.graph_requests),
+        "search_text_graph": (search_text, args.graph_requests),
+        "ner_graph": (ner, args.graph_requests)
+    }
+
+
+async def run_all(args) -> dict[str, Any]:
+    texts, queries = synthetic_corpus(args.documents, args.seed)
+    install_fakes(
+        embedding_latency=args.embedding_latency_ms / 1000,
+        ner_latency=args.ner_latency_ms / 1000,
+        chat=FakeChatOllama(
+            first_token_seconds=args.first_token_ms / 1000,
+            prefill_tokens_per_second=args.prefill_tokens_per_second,
+            tokens_per_second=args.tokens_per_second,
+            answer_tokens=args.answer_tokens
+        )
+    )
+    scenarios = build_scenarios(texts, queries, args)
+
+    results = {}
+    for name in args.scenarios.split(","):
+        call, requests = scenarios[name]
+        # Ingestion runs at the configured concurrency too; it is what fills the collections the searches read
+        results[name] = await run_load(call, requests, args.concurrency, args.trace_memory)
+        print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+
+    from app.services.context_service import context_info
+    from app.services.vectordb_service import retrieval_stats, EMBEDDING
+    return {
+        "scenarios": results,
+        "retrieval_stats": dict(retrieval_stats),
+        "embedding_cache": dict(EMBEDDING.stats),
+        "context": context_info()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--documents", type=int, default=200, help="synthetic journal entries to ingest")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--requests", type=int, default=200, help="requests per search/NER scenario")
+    parser.add_argument("--graph-requests", type=int, default=50, help="requests per graph scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ingest-batch", type=int, default=16, help="documents per ingest_json_service call")
+    parser.add_argument("--embedding-latency-ms", type=float, default=5.0)
+    parser.add_argument("--ner-latency-ms", type=float, default=10.0)
+    parser.add_argument("--first-token-ms", type=float, default=50.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--answer-tokens", type=int, default=32)
+    parser.add_argument("--trace-memory", action="store_true", help="report peak Python allocations (slows the run)")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    output = os.path.abspath(args.output) if args.output else None
+
+    # The app keeps its stores under relative paths; point them at a scratch directory
+    workdir = tempfile.mkdtemp(prefix="walt-bench-")
+    os.makedirs(os.path.join(workdir, "app"), exist_ok=True)
+    os.chdir(workdir)
+    os.environ.setdefault("WALT_NER_WORKERS", "0")
+
+    started = time.perf_counter()
+    measured = asyncio.run(run_all(args))
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        **measured
+    }
+
+    print(json.dumps(report, indent=2))
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w") as destination:
+            json.dump(report, destination, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Startup benchmark: how long importing the API takes, and how long each
+model takes to load and warm up afterwards.
+
+Every measurement runs in a fresh interpreter so module caches don't hide
+the real cold-start cost.
+
+    python -m benchmarks.startup_benchmark --runs 3 --output startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+IMPORT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({"import_seconds": time.perf_counter() - started}))
+"""
+
+WARMUP_SCRIPT = """
+import json, sys, time
+import app.main
+from app.services.model_registry import warmup
+started = time.perf_counter()
+models = warmup(sys.argv[1].split(","))
+print(json.dumps({"warmup_seconds": time.perf_counter() - started, "models": models}))
+"""
+
+
+def run(script: str, *args: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", script, *args],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--models", default="embeddings,route_prototypes,chat_llm,ner_tokenizer,ner")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    import_times = [run(IMPORT_SCRIPT)["import_seconds"] for _ in range(args.runs)]
+    warmups = [run(WARMUP_SCRIPT, args.models) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "import_seconds": {
+            "min": min(import_times),
+            "median": statistics.median(import_times),
+            "max": max(import_times)
+        },
+        "warmup_seconds": {
+            "median": statistics.median(warmup["warmup_seconds"] for warmup in warmups)
+        },
+        # Per-model load/warm times from the last run
+        "models": warmups[-1]["models"]
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
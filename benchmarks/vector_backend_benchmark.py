@@ -0,0 +1,204 @@
+"""
+Vector backend benchmark: loads the same vectors into the Chroma and NumPy
+backends, checks that both return the same top-k (parity), and measures
+query latency percentiles, batched query_many throughput, latency of
+queries filtered to one journal, write throughput and NumPy compaction.
+
+Vectors are synthetic: normalized points scattered around --clusters
+centers, the rough shape of a journal's embeddings, and each query is a
+stored vector plus noise. Stores are written to a fresh temporary directory.
+
+    python -m benchmarks.vector_backend_benchmark --vectors 3000 --dimension 768 --queries 1000 --output backends.json
+
+Parity is the mean overlap of the two backends' top-k ID sets; Chroma's HNSW
+index is approximate, so it can fall slightly below 1. The exit status is 1
+when it is under --min-parity.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from app.services.vector_backends import ChromaBackend, NumpyBackend  # noqa: E402
+from benchmarks.fakes import HashingEmbeddings  # noqa: E402
+from benchmarks.rag_benchmark import git_commit, max_rss_mb, percentile  # noqa: E402
+
+
+def synthetic_vectors(count: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    generator = np.random.default_rng(seed)
+    centers = generator.normal(size=(clusters, dimension))
+    vectors = centers[generator.integers(0, clusters, count)] + 0.5 * generator.normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def summarize(latencies: list[float], wall: float) -> dict:
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "qps": round(len(latencies) / wall, 1) if wall else None
+    }
+
+
+# =========MEASUREMENT=========
+
+def load(backend, ids: list[str], vectors: np.ndarray, batch: int, journals: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(ids), batch):
+        chunk = ids[start:start + batch]
+        backend.upsert(
+            chunk,
+            [f"text of {doc_id}" for doc_id in chunk],
+            vectors[start:start + batch].tolist(),
+            [
+                {"source": "benchmark", "position": start + offset, "journal_id": (start + offset) % journals}
+                for offset in range(len(chunk))
+            ]
+        )
+    return time.perf_counter() - started
+
+
+def run_queries(backend, queries: np.ndarray, k: int, concurrency: int, journals: int = 0) -> tuple[list[list[dict]], dict]:
+    """Query one at a time; with `journals`, query i is filtered to journal i % journals"""
+    latencies: list[float] = []
+
+    def one(position: int) -> list[dict]:
+        where = {"journal_id": {"$eq": position % journals}} if journals else None
+        started = time.perf_counter()
+        results = backend.query(queries[position].tolist(), k, where)
+        latencies.append(time.perf_counter() - started)
+        return results
+
+    # One warm-up query, so neither backend is billed for opening its files
+    backend.query(queries[0].tolist(), k)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(len(queries))))
+    return results, summarize(latencies, time.perf_counter() - started)
+
+
+def run_batches(backend, queries: np.ndarray, k: int, batch: int, expected: list[list[dict]]) -> dict:
+    """query_many over `batch` queries at a time; results must match one-at-a-time queries"""
+    started = time.perf_counter()
+    results = []
+    for start in range(0, len(queries), batch):
+        chunk = queries[start:start + batch]
+        results.extend(backend.query_many(chunk.tolist(), [k] * len(chunk)))
+    wall = time.perf_counter() - started
+    return {
+        "batch": batch,
+        "qps": round(len(queries) / wall, 1) if wall else None,
+        "matches_single": all(
+            [result["id"] for result in left] == [result["id"] for result in right]
+            for left, right in zip(results, expected)
+        )
+    }
+
+
+def parity(chroma: list[list[dict]], numpy_results: list[list[dict]], k: int) -> dict:
+    overlaps = []
+    top1 = 0
+    score_gaps = []
+    for left, right in zip(chroma, numpy_results):
+        left_ids = [result["id"] for result in left]
+        right_ids = [result["id"] for result in right]
+        overlaps.append(len(set(left_ids) & set(right_ids)) / max(1, min(k, len(right_ids))))
+        top1 += bool(left_ids and right_ids and left_ids[0] == right_ids[0])
+        right_scores = {result["id"]: result["score"] for result in right}
+        score_gaps.extend(abs(result["score"] - right_scores[result["id"]]) for result in left if result["id"] in right_scores)
+    return {
+        "mean_topk_overlap": round(float(np.mean(overlaps)), 4),
+        "top1_agreement": round(top1 / len(chroma), 4),
+        "max_score_difference": round(max(score_gaps, default=0.0), 6)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=3000, help="stored vectors, roughly a journal's chunk count")
+    parser.add_argument("--dimension", type=int, default=768, help="768 matches nomic-embed-text")
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=1000, help="vectors per upsert")
+    parser.add_argument("--query-batch", type=int, default=64, help="queries per query_many call")
+    parser.add_argument("--journals", type=int, default=50, help="journal_id values spread over the vectors, for filtered queries")
+    parser.add_argument("--delete-fraction", type=float, default=0.3, help="share of vectors deleted to measure compaction")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-parity", type=float, default=0.95)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.vectors, args.dimension, args.clusters, args.seed)
+    generator = np.random.default_rng(args.seed + 1)
+    queries = vectors[generator.integers(0, args.vectors, args.queries)] + 0.05 * generator.normal(size=(args.queries, args.dimension)).astype(np.float32)
+    # Ollama's embeddings come back normalized, and Chroma scores the query as given
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    ids = [f"vec_{index}" for index in range(args.vectors)]
+
+    workdir = tempfile.mkdtemp(prefix="walt-backends-")
+    backends = {
+        "chroma": ChromaBackend("benchmark", os.path.join(workdir, "chroma"), HashingEmbeddings(size=args.dimension)),
+        "numpy": NumpyBackend(os.path.join(workdir, "numpy"))
+    }
+
+    report = {"commit": git_commit(), "config": vars(args), "backends": {}}
+    results = {}
+    filtered = {}
+    for name, backend in backends.items():
+        load_seconds = load(backend, ids, vectors, args.batch, args.journals)
+        results[name], latency = run_queries(backend, queries, args.k, args.concurrency)
+        filtered[name], filtered_latency = run_queries(backend, queries, args.k, args.concurrency, args.journals)
+        report["backends"][name] = {
+            "load_s": round(load_seconds, 3),
+            "load_vectors_per_s": round(args.vectors / load_seconds, 1),
+            "query": latency,
+            "query_many": run_batches(backend, queries, args.k, args.query_batch, results[name]),
+            "filtered_query": filtered_latency
+        }
+        print(f"{name}: {json.dumps(report['backends'][name])}", file=sys.stderr)
+
+    report["parity"] = parity(results["chroma"], results["numpy"], args.k)
+    report["filtered_parity"] = parity(filtered["chroma"], filtered["numpy"], args.k)
+
+    # Tombstone a share of the rows, compact, then check the survivors still answer the same
+    numpy_backend = backends["numpy"]
+    deleted = ids[:int(args.vectors * args.delete_fraction)]
+    backends["chroma"].delete(deleted)
+    started = time.perf_counter()
+    numpy_backend.delete(deleted)
+    if numpy_backend.info()["dead_rows"]:
+        numpy_backend.compact()
+    compact_seconds = time.perf_counter() - started
+    after_numpy, after_latency = run_queries(numpy_backend, queries, args.k, args.concurrency)
+    after_chroma, _ = run_queries(backends["chroma"], queries, args.k, args.concurrency)
+    report["after_delete"] = {
+        "deleted": len(deleted),
+        "delete_and_compact_s": round(compact_seconds, 3),
+        "numpy": numpy_backend.info(),
+        "numpy_query": after_latency,
+        "parity": parity(after_chroma, after_numpy, args.k)
+    }
+    report["max_rss_mb"] = max_rss_mb()
+    report["parity_ok"] = min(report["parity"]["mean_topk_overlap"], report["after_delete"]["parity"]["mean_topk_overlap"]) >= args.min_parity
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as destination:
+            json.dump(report, destination, indent=2)
+    sys.exit(0 if report["parity_ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
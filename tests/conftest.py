@@ -0,0 +1,33 @@
+"""
+Every model is replaced by the offline fakes in benchmarks/fakes.py, and the
+app's stores (kept under relative paths) go to a scratch directory, so the
+suite runs without Ollama, model weights or the repository's own data.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix="walt-tests-")
+os.makedirs(os.path.join(WORKDIR, "app"), exist_ok=True)
+os.chdir(WORKDIR)
+os.environ.setdefault("WALT_NER_WORKERS", "0")
+os.environ.setdefault("WALT_WARMUP_MODELS", "")
+
+from benchmarks.fakes import install_fakes  # noqa: E402
+
+install_fakes()
+
+
+async def body_of(*chunks: bytes):
+    """An async request body delivering `chunks` one at a time"""
+    for chunk in chunks:
+        await asyncio.sleep(0)
+        yield chunk
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
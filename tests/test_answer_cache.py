@@ -0,0 +1,36 @@
+import asyncio
+
+from app.services import answer_cache as answer_cache_module
+from app.services.answer_cache import AnswerCache
+from app.services.ollama_client import OllamaUnavailable
+
+
+class FailingEmbeddings:
+    async def aembed_query(self, text: str) -> list[float]:
+        raise OllamaUnavailable("nomic-embed-text", "circuit_open", 30.0)
+
+
+def test_embedding_outage_makes_semantic_lookups_miss_instead_of_failing(monkeypatch):
+    monkeypatch.setattr(answer_cache_module, "EMBEDDING", FailingEmbeddings())
+    cache = AnswerCache(8, semantic=True, similarity=0.9)
+
+    async def scenario():
+        missed = await cache.get("chat", "who was Walt Whitman?", ["chunk_a"], "freewriting")
+        await cache.put("chat", "who was Walt Whitman?", ["chunk_a"], "freewriting", "A poet.")
+        # Stored without an embedding, the entry still serves exact lookups
+        exact = await cache.get("chat", "Who was Walt Whitman", ["chunk_a"], "freewriting")
+        reworded = await cache.get("chat", "tell me about Whitman", ["chunk_b"], "freewriting")
+        return missed, exact, reworded
+
+    assert asyncio.run(scenario()) == (None, "A poet.", None)
+    info = cache.info()
+    assert (info["hits"], info["misses"], info["embedding_failures"]) == (1, 2, 3)
+
+
+def test_entries_without_an_embedding_are_skipped_once_embedding_recovers(monkeypatch):
+    monkeypatch.setattr(answer_cache_module, "EMBEDDING", FailingEmbeddings())
+    cache = AnswerCache(8, semantic=True, similarity=0.0)
+    asyncio.run(cache.put("chat", "who was Walt Whitman?", ["chunk_a"], "freewriting", "A poet."))
+
+    monkeypatch.undo()
+    assert asyncio.run(cache.get("chat", "tell me about Whitman", ["chunk_b"], "freewriting")) is None
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import bulk_ingest_service
+from app.services.bulk_ingest_service import iter_ndjson_records, iter_text_passages
+from conftest import body_of, collect
+
+
+# =========NDJSON=========
+
+def test_ndjson_records_split_across_chunks():
+    body = '{"id": 1, "text": "Café au lait"}\n{"id": "b", "text": "second", "metadata": {"journal_id": 2}}\n'.encode("utf-8")
+    # Byte-wise delivery cuts lines, JSON tokens and the two-byte "é" apart
+    records = asyncio.run(collect(iter_ndjson_records(body_of(*(body[i:i + 1] for i in range(len(body)))))))
+    assert records == [
+        {"id": "1", "text": "Café au lait", "metadata": {}},
+        {"id": "b", "text": "second", "metadata": {"journal_id": 2}}
+    ]
+
+
+def test_ndjson_last_line_without_newline_and_blank_lines():
+    records = asyncio.run(collect(iter_ndjson_records(body_of(b'\n{"id": "a", "te', b'xt": "x"}\n\n{"id": "b", "text": "y"}'))))
+    assert [record["id"] for record in records] == ["a", "b"]
+
+
+def test_ndjson_bad_lines_are_reported_by_line_number():
+    records = asyncio.run(collect(iter_ndjson_records(body_of(b'{"id": "a"\n[1, 2]\n{"id": "c", "text": "ok"}\n'))))
+    assert records[0]["error"].startswith("line 1: invalid JSON")
+    assert records[1]["error"] == "line 2: expected an object with 'id' and 'text'"
+    assert records[2]["id"] == "c"
+
+
+# =========RAW TEXT=========
+
+def test_text_multibyte_character_split_across_chunks():
+    body = "Café in the rain.\n\nNaïve déjà vu — 日本.".encode("utf-8")
+    passages = asyncio.run(collect(iter_text_passages(body_of(*(body[i:i + 1] for i in range(len(body)))))))
+    text = " ".join(passage["text"] for passage in passages)
+    assert "Café" in text and "Naïve déjà vu — 日本." in text
+
+
+def test_text_invalid_utf8_is_rejected():
+    with pytest.raises(UnicodeDecodeError):
+        asyncio.run(collect(iter_text_passages(body_of(b"valid start ", b"\xff\xfe broken"))))
+
+
+def test_text_truncated_character_at_end_is_rejected():
+    with pytest.raises(UnicodeDecodeError):
+        asyncio.run(collect(iter_text_passages(body_of("Caf".encode("utf-8") + "é".encode("utf-8")[:1]))))
+
+
+@pytest.mark.parametrize("separator", ["\n", ". ", " ", ""])
+def test_text_without_blank_lines_is_still_streamed(monkeypatch, separator):
+    monkeypatch.setattr(bulk_ingest_service, "TEXT_BUFFER_CHARS", 200)
+    sentence = "word" * 10 + separator
+    chunks = [sentence.encode("utf-8")] * 100
+    sent = 0
+
+    async def body():
+        nonlocal sent
+        for chunk in chunks:
+            sent += 1
+            yield chunk
+
+    async def first_passage_after():
+        async for _ in iter_text_passages(body()):
+            return sent
+
+    # Passages come out long before the body ends, instead of the whole upload being buffered
+    assert asyncio.run(first_passage_after()) < 20
+
+
+def test_text_cut_keeps_every_character(monkeypatch):
+    monkeypatch.setattr(bulk_ingest_service, "TEXT_BUFFER_CHARS", 50)
+    text = "".join(f"Sentence {index} ends here. " for index in range(40)).strip()
+    passages = asyncio.run(collect(iter_text_passages(body_of(text.encode("utf-8")))))
+    assert [passage["metadata"]["chunk_index"] for passage in passages] == list(range(len(passages)))
+    joined = " ".join(passage["text"] for passage in passages)
+    for index in range(40):
+        assert f"Sentence {index} ends here." in joined
+
+
+# =========ENDPOINTS=========
+
+def test_bulk_json_endpoint_streams_progress_events():
+    def body():
+        for index in range(45):
+            yield (json.dumps({"id": f"bulk_{index}", "text": f"bulk passage {index}"}) + "\n").encode("utf-8")
+        yield b"not json\n"
+
+    with TestClient(app) as client:
+        response = client.post("/vector-ops/ingest-json/bulk?collection=bulk_test&batch_size=20", content=body())
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(event["batch"] for event in events if event["event"] == "batch") == [1, 2, 3]
+    assert [event["event"] for event in events if event["event"] == "rejected"] == ["rejected"]
+    assert events[-1]["event"] == "summary"
+    assert events[-1]["ingested"] == 45 and events[-1]["rejected_records"] == 1
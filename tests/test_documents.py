@@ -0,0 +1,104 @@
+import asyncio
+import uuid
+
+from app.services.bulk_ingest_service import bulk_ingest_text
+from app.services.chunking_service import chunking_for
+from app.services.vectordb_service import chunk_id, chunk_text, content_hash, document_index, get_vector_store, ingest_document
+from conftest import body_of, collect
+
+PARAGRAPHS = ["First paragraph about the sea.", "Second paragraph about the hills.", "Third paragraph about the rain."]
+
+
+def _collection() -> str:
+    return f"docs_{uuid.uuid4().hex[:8]}"
+
+
+def _chunking(collection: str) -> dict:
+    # One chunk per paragraph, so edits map onto whole chunks
+    return chunking_for(collection, strategy="paragraph", chunk_size=40, chunk_overlap=0)
+
+
+def _stored(collection: str) -> dict[str, str]:
+    found = get_vector_store(collection).get()
+    return dict(zip(found["ids"], found["documents"]))
+
+
+# =========CHUNK IDS=========
+
+def test_chunk_id_is_keyed_by_document_and_occurrence():
+    chunk_hash = content_hash("same text")
+    assert chunk_id(chunk_hash) == f"chunk_{chunk_hash}"
+    assert chunk_id(chunk_hash, "doc_a") != chunk_id(chunk_hash, "doc_b")
+    assert chunk_id(chunk_hash, "doc_a", 0) != chunk_id(chunk_hash, "doc_a", 1)
+    assert chunk_id(chunk_hash, "doc_a", 1) == chunk_id(chunk_hash, "doc_a", 1)
+
+
+def test_repeated_text_in_one_document_gets_distinct_ids():
+    text = "\n\n".join([PARAGRAPHS[0], PARAGRAPHS[1], PARAGRAPHS[0]])
+    passages = chunk_text(text, document_id="doc_a", chunking=_chunking("freewriting"))
+    assert [passage["text"] for passage in passages] == [PARAGRAPHS[0], PARAGRAPHS[1], PARAGRAPHS[0]]
+    assert passages[0]["id"] != passages[2]["id"]
+
+
+# =========VERSIONING=========
+
+def test_reingesting_diffs_against_the_stored_version():
+    collection = _collection()
+    chunking = _chunking(collection)
+
+    first = ingest_document("\n\n".join(PARAGRAPHS), "journal", collection, chunking)
+    assert (first["version"], first["chunks"], first["embedded"]) == (1, 3, 3)
+
+    # The first paragraph moves to the end, the second is dropped and a new one arrives
+    edited = [PARAGRAPHS[2], "Fourth paragraph about the wind.", PARAGRAPHS[0]]
+    second = ingest_document("\n\n".join(edited), "journal", collection, chunking)
+    assert second["version"] == 2
+    assert (second["embedded"], second["skipped"], second["deleted"]) == (1, 2, 1)
+
+    stored = get_vector_store(collection).get(include=("documents", "metadatas"))
+    by_text = {text: metadata["chunk_index"] for text, metadata in zip(stored["documents"], stored["metadatas"])}
+    assert by_text == {edited[0]: 0, edited[1]: 1, edited[2]: 2}
+
+
+def test_unchanged_document_keeps_its_version():
+    collection = _collection()
+    chunking = _chunking(collection)
+    ingest_document("\n\n".join(PARAGRAPHS), "journal", collection, chunking)
+    again = ingest_document("\n\n".join(PARAGRAPHS), "journal", collection, chunking)
+    assert (again["version"], again["embedded"], again["skipped"]) == (1, 0, 3)
+
+
+def test_same_text_in_two_documents_is_stored_twice_and_reuses_the_vector():
+    collection = _collection()
+    chunking = _chunking(collection)
+    ingest_document(PARAGRAPHS[0], "doc_a", collection, chunking)
+    second = ingest_document(PARAGRAPHS[0], "doc_b", collection, chunking)
+    assert (second["embedded"], second["reused"]) == (0, 1)
+    assert list(_stored(collection).values()) == [PARAGRAPHS[0], PARAGRAPHS[0]]
+
+
+def test_bulk_text_upload_is_a_new_version_of_the_document():
+    collection = _collection()
+    chunking = _chunking(collection)
+
+    def upload(paragraphs: list[str]) -> dict:
+        body = body_of("\n\n".join(paragraphs).encode("utf-8"))
+        events = asyncio.run(collect(bulk_ingest_text(body, collection, "journal", chunking)))
+        return events[-1]
+
+    assert upload(PARAGRAPHS)["version"] == 1
+    summary = upload(PARAGRAPHS[:2])
+    assert (summary["document_id"], summary["version"], summary["deleted"]) == ("journal", 2, 1)
+    assert sorted(_stored(collection).values()) == sorted(PARAGRAPHS[:2])
+    assert document_index.get(collection, "journal")["chunks"] == 2
+
+
+def test_bulk_text_uploads_without_a_document_id_do_not_collide():
+    collection = _collection()
+    chunking = _chunking(collection)
+    summaries = [
+        asyncio.run(collect(bulk_ingest_text(body_of(PARAGRAPHS[0].encode("utf-8")), collection, chunking=chunking)))[-1]
+        for _ in range(2)
+    ]
+    assert summaries[0]["document_id"] != summaries[1]["document_id"]
+    assert len(_stored(collection)) == 2
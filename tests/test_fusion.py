@@ -0,0 +1,49 @@
+import uuid
+
+import pytest
+
+from app.services.vectordb_service import RRF_K, _fuse, ingest_json_service
+
+TEXTS = {"a": "sea and stars", "b": "hills in the rain", "c": "a quiet morning", "d": "letters to a friend"}
+
+
+@pytest.fixture
+def collection() -> str:
+    name = f"fusion_{uuid.uuid4().hex[:8]}"
+    ingest_json_service([{"id": doc_id, "text": text} for doc_id, text in TEXTS.items()], name)
+    return name
+
+
+def _vector(*ids: str) -> list[dict]:
+    return [{"id": doc_id, "text": TEXTS[doc_id], "metadata": {}, "score": 0.1 * rank} for rank, doc_id in enumerate(ids)]
+
+
+def test_scores_are_summed_reciprocal_ranks(collection):
+    fused = _fuse(collection, _vector("a", "b"), [("b", 7.0), ("c", 3.0)], 3)
+    assert [result["id"] for result in fused] == ["b", "a", "c"]
+    scores = {result["id"]: result["score"] for result in fused}
+    assert scores["b"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert scores["a"] == pytest.approx(1 / (RRF_K + 1))
+    assert scores["c"] == pytest.approx(1 / (RRF_K + 2))
+
+
+def test_raw_scores_do_not_matter_only_ranks(collection):
+    low = _fuse(collection, _vector("a"), [("c", 0.001), ("d", 0.0001)], 3)
+    high = _fuse(collection, _vector("a"), [("c", 900.0), ("d", 10.0)], 3)
+    assert [result["score"] for result in low] == [result["score"] for result in high]
+
+
+def test_lexical_only_hits_are_read_from_the_store(collection):
+    fused = _fuse(collection, [], [("d", 2.0), ("c", 1.0)], 2)
+    assert [(result["id"], result["text"]) for result in fused] == [("d", TEXTS["d"]), ("c", TEXTS["c"])]
+
+
+def test_fusion_keeps_the_top_k(collection):
+    fused = _fuse(collection, _vector("a", "b", "c"), [("c", 1.0), ("d", 0.5)], 2)
+    assert [result["id"] for result in fused] == ["c", "a"]
+
+
+def test_hits_missing_from_the_store_are_dropped(collection):
+    # e.g. deleted after the BM25 index was read
+    fused = _fuse(collection, _vector("a"), [("gone", 5.0), ("b", 1.0)], 3)
+    assert [result["id"] for result in fused] == ["a", "b"]
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.ollama_client import ModelGate, OllamaUnavailable
+
+RESET = 0.2
+
+
+def _gate(**overrides) -> ModelGate:
+    settings = {"max_concurrency": 2, "max_queue": 4, "queue_timeout": 1.0, "breaker_failures": 3, "breaker_reset": RESET}
+    return ModelGate("test-model", **{**settings, **overrides})
+
+
+def _ok() -> str:
+    return "ok"
+
+
+def _fail():
+    raise ConnectionError("connection refused")
+
+
+def _open(gate: ModelGate) -> None:
+    for _ in range(gate.breaker_failures):
+        with pytest.raises(OllamaUnavailable, match="call failed"):
+            gate.call(_fail)
+
+
+# =========CIRCUIT BREAKER=========
+
+def test_circuit_opens_after_consecutive_failures():
+    gate = _gate()
+    for _ in range(gate.breaker_failures - 1):
+        with pytest.raises(OllamaUnavailable):
+            gate.call(_fail)
+    assert gate.info()["circuit"] == "closed"
+
+    with pytest.raises(OllamaUnavailable):
+        gate.call(_fail)
+    info = gate.info()
+    assert (info["circuit"], info["circuit_opened"], info["consecutive_failures"]) == ("open", 1, 3)
+
+
+def test_a_success_resets_the_failure_count():
+    gate = _gate()
+    for _ in range(gate.breaker_failures - 1):
+        with pytest.raises(OllamaUnavailable):
+            gate.call(_fail)
+    assert gate.call(_ok) == "ok"
+    with pytest.raises(OllamaUnavailable):
+        gate.call(_fail)
+    assert gate.info()["circuit"] == "closed"
+
+
+def test_open_circuit_rejects_without_calling():
+    gate = _gate()
+    _open(gate)
+    called = []
+    with pytest.raises(OllamaUnavailable) as rejected:
+        gate.call(lambda: called.append(True))
+    assert rejected.value.reason == "circuit_open"
+    assert 0 < rejected.value.retry_after <= RESET
+    assert not called
+    assert gate.info()["rejected_circuit_open"] == 1
+
+
+def test_successful_probe_closes_the_circuit():
+    gate = _gate()
+    _open(gate)
+    time.sleep(RESET)
+    assert gate.info()["circuit"] == "half_open"
+    assert gate.call(_ok) == "ok"
+    info = gate.info()
+    assert (info["circuit"], info["consecutive_failures"]) == ("closed", 0)
+
+
+def test_failed_probe_reopens_the_circuit():
+    gate = _gate()
+    _open(gate)
+    time.sleep(RESET)
+    with pytest.raises(OllamaUnavailable, match="call failed"):
+        gate.call(_fail)
+    info = gate.info()
+    assert info["circuit"] == "open"
+    # Re-opening from half open is not a new opening
+    assert info["circuit_opened"] == 1
+    with pytest.raises(OllamaUnavailable, match="circuit_open"):
+        gate.call(_ok)
+
+
+def test_only_one_probe_runs_while_half_open():
+    gate = _gate()
+    _open(gate)
+    time.sleep(RESET)
+    probing, release = threading.Event(), threading.Event()
+
+    def slow_probe():
+        probing.set()
+        release.wait(1)
+        return "ok"
+
+    probe = threading.Thread(target=gate.call, args=(slow_probe,))
+    probe.start()
+    probing.wait(1)
+    with pytest.raises(OllamaUnavailable, match="circuit_open"):
+        gate.call(_ok)
+    release.set()
+    probe.join()
+    assert gate.info()["circuit"] == "closed"
+
+
+def test_async_calls_share_the_breaker():
+    gate = _gate()
+
+    async def fail():
+        raise ConnectionError("connection refused")
+
+    async def ok():
+        return "ok"
+
+    async def scenario():
+        for _ in range(gate.breaker_failures):
+            with pytest.raises(OllamaUnavailable):
+                await gate.acall(fail)
+        with pytest.raises(OllamaUnavailable, match="circuit_open"):
+            await gate.acall(ok)
+        await asyncio.sleep(RESET)
+        return await gate.acall(ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert gate.info()["circuit"] == "closed"
+
+
+# =========ADMISSION=========
+
+def test_full_queue_is_rejected_at_once():
+    gate = _gate(max_concurrency=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def busy():
+        started.set()
+        release.wait(1)
+
+    worker = threading.Thread(target=gate.call, args=(busy,))
+    worker.start()
+    started.wait(1)
+    with pytest.raises(OllamaUnavailable, match="queue_full"):
+        gate.call(_ok)
+    release.set()
+    worker.join()
+    assert gate.info()["in_flight"] == 0
@@ -0,0 +1,43 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from app.services import vectordb_service
+from app.services.vectordb_service import asearch_collections, ingest_json_service
+
+FAST = ["sea and stars at night", "stars over the quiet sea", "a letter to a friend"]
+SLOW = ["stars stars stars in a clear sky", "one star", "rain on the hills"]
+
+
+@pytest.fixture
+def collections(monkeypatch) -> tuple[str, str]:
+    fast, slow = (f"multi_{uuid.uuid4().hex[:8]}" for _ in range(2))
+    ingest_json_service([{"id": f"fast_{index}", "text": text} for index, text in enumerate(FAST)], fast)
+    ingest_json_service([{"id": f"slow_{index}", "text": text} for index, text in enumerate(SLOW)], slow)
+
+    real_vector_search = vectordb_service._vector_search
+
+    def vector_search(query, k, collection, *args, **kwargs):
+        if collection == slow:
+            time.sleep(0.3)
+        return real_vector_search(query, k, collection, *args, **kwargs)
+
+    monkeypatch.setattr(vectordb_service, "_vector_search", vector_search)
+    monkeypatch.setattr(vectordb_service, "VECTOR_TIMEOUT_SECONDS", 0.1)
+    return fast, slow
+
+
+@pytest.mark.parametrize("mode", ["vector", "hybrid"])
+def test_collection_that_fell_back_to_lexical_is_normalized_as_lexical(collections, mode):
+    fast, slow = collections
+    results = asyncio.run(asearch_collections("stars", 6, [fast, slow], mode=mode))
+
+    assert all(0 <= result["relevance"] <= 1 for result in results)
+    from_slow = [result for result in results if result["collection"] == slow]
+    # BM25 order survives: the best lexical hit of the slow collection is its most relevant result
+    assert from_slow[0]["id"] == "slow_0"
+    assert from_slow[0]["relevance"] == pytest.approx(1.0)
+    assert [result["relevance"] for result in from_slow] == sorted((result["relevance"] for result in from_slow), reverse=True)
+    assert any(result["collection"] == fast for result in results)
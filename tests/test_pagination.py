@@ -0,0 +1,115 @@
+import itertools
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+# Each test lists its own year, so rows made by other tests stay out of its pages
+_years = itertools.count(2101)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def year() -> int:
+    return next(_years)
+
+
+def _create_journals(client: TestClient, year: int, count: int) -> list[int]:
+    ids = []
+    for day in range(count):
+        created_at = datetime(year, 1, 1) + timedelta(days=day)
+        response = client.post("/journals/", json={"id": 1, "title": f"journal {uuid.uuid4().hex}", "created_at": created_at.isoformat()})
+        assert response.status_code == 201
+        ids.append(response.json()["inserted_journal"]["id"])
+    return ids
+
+
+def _window(year: int) -> dict[str, str]:
+    return {"created_from": datetime(year, 1, 1).isoformat(), "created_to": datetime(year, 12, 31).isoformat()}
+
+
+# =========CURSORS=========
+
+def test_cursor_walks_every_row_once_in_order(client, year):
+    ids = _create_journals(client, year, 5)
+    seen, pages, cursor = [], [], None
+    while True:
+        params = {**_window(year), "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/journals/", params=params)
+        assert response.status_code == 200
+        pages.append(len(response.json()))
+        seen.extend(int(journal_id) for journal_id in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert pages == [2, 2, 1]
+    assert seen == ids
+
+
+def test_created_to_is_inclusive(client, year):
+    ids = _create_journals(client, year, 3)
+    response = client.get("/journals/", params={"created_from": datetime(year, 1, 1).isoformat(), "created_to": datetime(year, 1, 2).isoformat()})
+    assert [int(journal_id) for journal_id in response.json()] == ids[:2]
+
+
+def test_invalid_cursor_is_a_400(client):
+    response = client.get("/journals/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json() == {"message": "Invalid cursor"}
+
+
+def test_fields_projects_each_row(client, year):
+    _create_journals(client, year, 1)
+    rows = client.get("/journals/", params={**_window(year), "fields": "title"}).json()
+    assert [set(row) for row in rows.values()] == [{"title"}]
+
+
+def test_passage_listing_pages_by_journal(client, year):
+    journal_id = _create_journals(client, year, 1)[0]
+    for index in range(3):
+        response = client.post(f"/passages/journals/{journal_id}/new_passage", json={
+            "id": 1,
+            "journal_id": journal_id,
+            "title": f"passage {index}",
+            "content": f"content {index}",
+            "created_at": datetime(year, 2, 1 + index).isoformat()
+        })
+        assert response.status_code == 201
+
+    first = client.get(f"/passages/journals/{journal_id}/passages/", params={"limit": 2})
+    second = client.get(f"/passages/journals/{journal_id}/passages/", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    titles = [row["title"] for row in [*first.json().values(), *second.json().values()]]
+    assert titles == ["passage 0", "passage 1", "passage 2"]
+    assert "X-Next-Cursor" not in second.headers
+
+
+# =========ETAGS=========
+
+def test_unchanged_page_is_a_304(client, year):
+    _create_journals(client, year, 2)
+    first = client.get("/journals/", params=_window(year))
+    etag = first.headers["ETag"]
+
+    again = client.get("/journals/", params=_window(year), headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_changed_page_gets_a_new_etag(client, year):
+    _create_journals(client, year, 1)
+    etag = client.get("/journals/", params=_window(year)).headers["ETag"]
+    _create_journals(client, year, 2)
+
+    response = client.get("/journals/", params=_window(year), headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()) == 3
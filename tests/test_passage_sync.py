@@ -0,0 +1,59 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from app.models.passage_model import PassageModel
+from app.services import passage_sync_service
+from app.services.passage_sync_service import PassageSyncQueue, passage_doc_id
+from app.services.vectordb_service import get_vector_store
+
+
+def _passage(passage_id: int) -> PassageModel:
+    return PassageModel(id=passage_id, journal_id=1, title="Harbor", content="Boats at dawn.", created_at=datetime(2026, 1, 1))
+
+
+def test_failed_batch_is_retried_without_another_edit(monkeypatch):
+    queue = PassageSyncQueue(f"sync_{uuid.uuid4().hex[:8]}", debounce_seconds=0.01, batch_size=8, retry_seconds=0.05)
+    real_upsert = passage_sync_service.upsert_embedded
+    calls = []
+
+    def flaky_upsert(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise ConnectionError("store unavailable")
+        return real_upsert(*args)
+
+    monkeypatch.setattr(passage_sync_service, "upsert_embedded", flaky_upsert)
+
+    async def scenario():
+        queue.start()
+        queue.enqueue_upsert(7, _passage(7))
+        try:
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                if get_vector_store(queue.collection).get(ids=[passage_doc_id(7)])["ids"]:
+                    return True
+            return False
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(scenario())
+    info = queue.info()
+    assert len(calls) == 2
+    assert (info["failed_batches"], info["upserted"], info["pending"], info["failed_rounds"]) == (1, 1, 0, 0)
+
+
+def test_backoff_doubles_up_to_the_cap():
+    queue = PassageSyncQueue("unused", debounce_seconds=0.01, batch_size=8, retry_seconds=1.0, retry_max_seconds=3.0)
+
+    async def delays():
+        loop = asyncio.get_running_loop()
+        queue._wakeup = asyncio.Event()
+        found = []
+        for _ in range(4):
+            queue._schedule_retry()
+            found.append(round(queue._retry.when() - loop.time(), 1))
+        queue._retry.cancel()
+        return found
+
+    assert asyncio.run(delays()) == [1.0, 2.0, 3.0, 3.0]
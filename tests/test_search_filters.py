@@ -0,0 +1,61 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.services.vectordb_service import ingest_json_service, metadata_where, search
+
+NEW_YEAR = datetime(2026, 1, 1)
+
+
+# =========WHERE CLAUSES=========
+
+def test_no_filters_means_no_where():
+    assert metadata_where(None) is None
+    assert metadata_where({}) is None
+    assert metadata_where({"source": "", "entities": []}) is None
+
+
+def test_single_filter_is_not_wrapped_in_and():
+    assert metadata_where({"journal_id": "3"}) == {"journal_id": {"$eq": 3}}
+
+
+def test_filters_combine_under_and():
+    where = metadata_where({
+        "journal_id": 3,
+        "source": "journal_passage",
+        "created_from": NEW_YEAR,
+        "created_to": 1767312000,
+        "entities": ["person", "LOC"]
+    })
+    assert where == {"$and": [
+        {"journal_id": {"$eq": 3}},
+        {"source": {"$eq": "journal_passage"}},
+        {"created_at_ts": {"$gte": NEW_YEAR.timestamp()}},
+        {"created_at_ts": {"$lte": 1767312000.0}},
+        {"has_person": {"$eq": True}},
+        {"has_loc": {"$eq": True}}
+    ]}
+
+
+def test_unknown_entity_label_is_rejected():
+    with pytest.raises(ValueError, match="Unknown entity label"):
+        metadata_where({"entities": ["PLANET"]})
+
+
+# =========FILTERED SEARCH=========
+
+def test_created_range_is_inclusive_at_both_ends():
+    collection = f"filters_{uuid.uuid4().hex[:8]}"
+    days = [datetime(2026, 1, day) for day in (1, 2, 3)]
+    ingest_json_service(
+        [
+            {"id": f"day_{day.day}", "text": f"a walk by the sea on day {day.day}", "metadata": {"created_at": day.isoformat()}}
+            for day in days
+        ],
+        collection
+    )
+
+    for mode in ("vector", "lexical", "hybrid"):
+        results = search("walk by the sea", 10, collection, mode=mode, filters={"created_from": days[1], "created_to": days[2]})
+        assert sorted(result["id"] for result in results) == ["day_2", "day_3"], mode